@@ -45,8 +45,14 @@
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
-    from actc.cli import Main                                                                                           # pylint:disable=E0611
-    Main()
+    import sys
+    from actc.client import connect                                                                                     # pylint:disable=E0611
+
+    # Thin client of a resident daemon (--connect SOCKET)?
+    if not connect(sys.argv[1:]):
+        from actc.cli import Main                                                                                       # pylint:disable=E0611
+        Main()
+    # end if
 # end if
 
 # ------------------------------------------------------------------------------
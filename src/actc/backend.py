@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.backend
+
+@brief   DoIt dependency backends
+
+The default json backend rewrites the whole dependency file on every DoIt run,
+its content staying loaded from a run to the next one. The sqlite and dbm
+backends only write the records of the executed tasks and can be shared by
+concurrent builds of several modules.
+
+@author  Ronan Le Gallic
+
+@date    2014/10/07
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from fcntl                      import LOCK_EX
+from fcntl                      import LOCK_UN
+from fcntl                      import flock
+from json                       import dumps
+from json                       import loads
+from os                         import stat
+from os.path                    import abspath
+from sqlite3                    import DatabaseError
+from sqlite3                    import connect
+
+from doit.dependency            import DatabaseException
+from doit.dependency            import DbmDB as _DbmDB
+from doit.dependency            import JsonDB as _JsonDB
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+def fileState(path):
+    '''
+    Get the state of a file
+
+    @param path [in] (str) file
+
+    @return (tuple) mtime, ctime, size, inode, None: missing
+    '''
+    try:
+        st = stat(path)
+    except OSError:
+        return None
+    # end try
+
+    return (st.st_mtime, st.st_ctime, st.st_size, st.st_ino)
+# end def fileState
+
+
+class JsonDB(_JsonDB):
+    '''
+    JSON dependency backend, loaded once by process
+
+    The content written by a DoIt run is kept in memory: the next runs (the
+    steps of a build, the builds of the daemon, see actc.daemon) only load
+    the file again when another process has written it. The content of a run
+    not dumped (interrupted) is dropped.
+    '''
+    desc = 'json, kept loaded'
+
+    # abspath --> (file state, content)
+    _RESIDENT = dict()
+
+    def __init__(self, name):
+        '''
+        Constructor
+
+        @param name [in] (str) database file
+        '''
+        path  = abspath(name)
+        state = fileState(name)
+        entry = self._RESIDENT.pop(path, None)
+
+        if (    (entry is not None)
+            and (state is not None)
+            and (entry[0] == state)):
+            self.name = name
+            self._db  = entry[1]
+        else:
+            super(JsonDB, self).__init__(name)
+        # end if
+    # end def __init__
+
+    def dump(self):
+        '''
+        @copydoc doit.dependency.JsonDB.dump
+        '''
+        super(JsonDB, self).dump()
+        self._RESIDENT[abspath(self.name)] = (fileState(self.name), self._db)
+    # end def dump
+
+    @classmethod
+    def preload(cls, name):
+        '''
+        Load a database file, unless already loaded
+
+        @param name [in] (str) database file
+        '''
+        state = fileState(name)
+
+        if (   (state is None)
+            or (cls._RESIDENT.get(abspath(name), (None,))[0] == state)):
+            return
+        # end if
+
+        cls._RESIDENT[abspath(name)] = (state, cls(name)._db)
+    # end def preload
+
+# end class JsonDB
+
+
+class SqliteDB(object):
+    '''
+    SQLite dependency backend: one row by task
+
+    The database is in WAL mode: readers never block, and concurrent writers
+    wait for each other (busy timeout) instead of overwriting each other's
+    records. Updated records are written by batch of FLUSH tasks, so that the
+    memory used is bounded and an interrupted build keeps most of its state.
+    '''
+    desc  = 'sqlite3 (WAL), incremental updates'
+
+    FLUSH = 1024
+
+    def __init__(self, name):
+        '''
+        Constructor
+
+        @param name [in] (str) database file
+        '''
+        self.name   = name
+        self._cache = dict()
+        self._dirty = set()
+
+        try:
+            self._conn = connect(name, timeout = 60, isolation_level = None)
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS doit ('
+                               '  task_id   TEXT NOT NULL PRIMARY KEY,'
+                               '  task_data TEXT)')
+        except DatabaseError as err:
+            raise DatabaseException('Dependency file %r: %s '
+                                    '(remove it to rebuild all targets)'
+                                    % (name, err))
+        # end try
+    # end def __init__
+
+    def _load(self, task_id):
+        '''
+        Load the record of a task
+
+        @param task_id [in] (str) task name
+
+        @return (dict) dependency --> value
+        '''
+        if (task_id not in self._cache):
+            row = self._conn.execute('SELECT task_data FROM doit WHERE task_id = ?',
+                                     (task_id,)).fetchone()
+            self._cache[task_id] = loads(row[0]) if row else dict()
+        # end if
+
+        return self._cache[task_id]
+    # end def _load
+
+    def _flush(self):
+        '''
+        Write the updated records in a single transaction
+        '''
+        if (not self._dirty):
+            return
+        # end if
+
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany('INSERT OR REPLACE INTO doit VALUES (?, ?)',
+                                   [(task_id, dumps(self._cache[task_id]))
+                                    for task_id in self._dirty])
+        except:
+            self._conn.execute('ROLLBACK')
+            raise
+        # end try
+        self._conn.execute('COMMIT')
+
+        # Written records are reloaded on demand
+        for task_id in self._dirty:
+            del self._cache[task_id]
+        # end for
+        self._dirty = set()
+    # end def _flush
+
+    def get(self, task_id, dependency):
+        '''
+        @copydoc doit.dependency.JsonDB.get
+        '''
+        return self._load(task_id).get(dependency, None)
+    # end def get
+
+    def set(self, task_id, dependency, value):
+        '''
+        @copydoc doit.dependency.JsonDB.set
+        '''
+        self._load(task_id)[dependency] = value
+        self._dirty.add(task_id)
+
+        if (len(self._dirty) >= self.FLUSH):
+            self._flush()
+        # end if
+    # end def set
+
+    def in_(self, task_id):
+        '''
+        @copydoc doit.dependency.JsonDB.in_
+        '''
+        return ((task_id in self._dirty)
+                or (self._conn.execute('SELECT 1 FROM doit WHERE task_id = ?',
+                                       (task_id,)).fetchone() is not None))
+    # end def in_
+
+    def dump(self):
+        '''
+        @copydoc doit.dependency.JsonDB.dump
+        '''
+        self._flush()
+        self._conn.close()
+    # end def dump
+
+    def remove(self, task_id):
+        '''
+        @copydoc doit.dependency.JsonDB.remove
+        '''
+        self._cache.pop(task_id, None)
+        self._dirty.discard(task_id)
+        self._conn.execute('DELETE FROM doit WHERE task_id = ?', (task_id,))
+    # end def remove
+
+    def remove_all(self):
+        '''
+        @copydoc doit.dependency.JsonDB.remove_all
+        '''
+        self._cache = dict()
+        self._dirty = set()
+        self._conn.execute('DELETE FROM doit')
+    # end def remove_all
+
+# end class SqliteDB
+
+
+class DbmDB(_DbmDB):
+    '''
+    DBM dependency backend
+
+    DBM files do not support concurrent writers: the database is locked from
+    the DoIt run start to its end, concurrent builds waiting for each other.
+    '''
+    desc = 'dbm, incremental updates, exclusive lock'
+
+    def __init__(self, name):
+        '''
+        Constructor
+
+        @param name [in] (str) database file
+        '''
+        self._lock = open(name + '.lock', 'a')
+        flock(self._lock, LOCK_EX)
+        try:
+            super(DbmDB, self).__init__(name)
+        except:
+            self._unlock()
+            raise
+        # end try
+    # end def __init__
+
+    def _unlock(self):
+        '''
+        Release the database lock
+        '''
+        flock(self._lock, LOCK_UN)
+        self._lock.close()
+    # end def _unlock
+
+    def dump(self):
+        '''
+        @copydoc doit.dependency.DbmDB.dump
+        '''
+        try:
+            super(DbmDB, self).dump()
+        finally:
+            self._unlock()
+        # end try
+    # end def dump
+
+# end class DbmDB
+
+
+##@name Backends
+##@{
+## name --> (DoIt backend, dependency file)
+BACKENDS = {'json'  : ('json',   '.actc.db'),
+            'sqlite': ('sqlite', '.actc.sqlite'),
+            'dbm'   : ('dbm',    '.actc.dbm')}
+
+## DoIt plugins (BACKEND section)
+PLUGINS  = {'json'  : 'actc.backend:JsonDB',
+            'sqlite': 'actc.backend:SqliteDB',
+            'dbm'   : 'actc.backend:DbmDB'}
+##@}
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.batch
+
+@brief   Batch build of several configurations
+
+@author  Ronan Le Gallic
+
+@date    2014/10/10
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from os                         import getcwd
+from os.path                    import dirname
+from shutil                     import rmtree
+
+from actc.dodo                  import AbstractDodo
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class Batch(AbstractDodo):
+    '''
+    Build several configurations (<module>.json) as a single task graph
+
+    Each step of the toolchain is run once for all the modules, sharing the
+    same jobs. The tasks are renamed <module>.<task>.
+
+    With an artifact cache (-c), the outputs identical for several modules
+    are restored from the cache once built (identical jobs running at the
+    same time may both build them).
+    '''
+
+    def __init__(self, modules, debug = False, verbose = False):
+        '''
+        Constructor
+
+        @param  modules [in] (list) Actc, one by configuration
+        @option debug   [in] (bool) print commands
+        @option verbose [in] (bool) print everything from a task
+        '''
+        # Configuration paths are relative to the configuration folder
+        if (len(set(dirname(module._json) for module in modules)) != 1):
+            raise ValueError('batch configurations must be in the same folder')
+        # end if
+
+        self._modules = modules
+
+        super(Batch, self).__init__(output = 'build', debug = debug, verbose = verbose)
+
+        # Same toolchain for all the modules
+        self._tasks   = modules[0]._tasks
+    # end def __init__
+
+    modules = property(lambda self: self._modules)
+
+    # --------------------------------------------------------------------------
+    # DoIt management
+    # --------------------------------------------------------------------------
+
+    def _roots(self):
+        '''
+        @copydoc actc.dodo.AbstractDodo._roots
+        '''
+        return [module._output for module in self._modules], getcwd()
+    # end def _roots
+
+    def clean(self):
+        '''
+        @copydoc actc.dodo.AbstractDodo.clean
+        '''
+        for module in self._modules:
+            rmtree(module._output, ignore_errors = True)
+        # end for
+
+        self._doIt('forget')
+    # end def clean
+
+
+    def _generators(self, tasks):
+        '''
+        @copydoc actc.dodo.AbstractDodo._generators
+        '''
+        return [(name, getattr(module, name))
+                for name, _ in tasks
+                for module in self._modules]
+    # end def _generators
+
+
+    def _generate(self, name, method):
+        '''
+        @copydoc actc.dodo.AbstractDodo._generate
+        '''
+        module = method.im_self
+        tasks  = module._generate(name, method)
+
+        # Hidden tasks (e.g. folder creation) are shared
+        rename = lambda task: task if task.startswith('_') else '%s.%s' % (module._module, task)
+
+        for task in tasks:
+            task.name        = rename(task.name)
+            task.task_dep    = [rename(dep) for dep in task.task_dep]
+            task.setup_tasks = [rename(dep) for dep in task.setup_tasks]
+        # end for
+
+        return tasks
+    # end def _generate
+
+# end class Batch
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
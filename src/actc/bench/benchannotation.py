@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.benchannotation
+
+@brief   Annotation parsing micro-benchmark
+
+Compares parseAnnotationContent with the regular expressions parser it
+replaces, on short, long (many parameters) and multiple protections
+annotations.
+
+Usage: python -m actc.bench.benchannotation [-n 2000]
+
+@author  Ronan Le Gallic
+
+@date    2014/10/28
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from time                       import time
+import re
+
+from actc.tools.annotation      import matchBrackets
+from actc.tools.annotation      import parseAnnotationContent
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+_RE_PROTECTION_TECHNIQUE = r'protection\s*\((.*?)\s*(?=\(|\)|,)'
+_RE_PROTECTION_ANNOTATION = r'protection\s*\(.*?(?=,\s*protection|$)'
+
+def referenceParse(annotation_content):
+    '''
+    Regular expressions parser, as parseAnnotationContent was implemented
+
+    @param annotation_content [in] (str) annotation
+
+    @return (list) (technique, annotation)
+    '''
+    ret = re.compile(_RE_PROTECTION_TECHNIQUE)
+    rea = re.compile(_RE_PROTECTION_ANNOTATION)
+
+    rv = []
+    annotations = rea.findall(annotation_content)
+    for annotation in annotations:
+        technique = ret.match(annotation).group(1)
+        annotation = matchBrackets(annotation)
+        rv.append((technique, annotation))
+    # end for
+
+    return rv
+# end def referenceParse
+
+## name --> annotation
+CASES = {'short'   : 'protection(xor, mask(constant(35)))',
+         'long'    : 'protection(obfuscations, enable_obfuscation(%s))'
+                     % (', '.join('opaque_predicates:percent_apply=%d' % (i,) for i in range(200)),),
+         'multiple': ', '.join('protection(%s, label(L%d), mask(constant(%d)))' % (technique, i, i)
+                               for i, technique in enumerate(['xor', 'softvm', 'anti_debugging',
+                                                              'call_stack_check', 'code_mobility'] * 10))}
+
+
+def main():
+    '''
+    Run the benchmark
+    '''
+    parser = ArgumentParser(description = 'Annotation parsing micro-benchmark')
+    parser.add_argument('-n', '--number',
+                        metavar = 'N',
+                        type    = int,
+                        default = 2000,
+                        help    = 'parses by case [%(default)s]')
+    args = parser.parse_args()
+
+    print('%-10s %8s %12s %12s %8s' % ('case', 'chars', 'regex (us)', 'scan (us)', 'speedup'))
+    for name in sorted(CASES):
+        content = CASES[name]
+        assert referenceParse(content) == parseAnnotationContent(content)
+
+        durations = []
+        for parse in (referenceParse, parseAnnotationContent):
+            begin = time()
+            for _ in xrange(args.number):
+                parse(content)
+            # end for
+            durations.append((time() - begin) / args.number * 1e6)
+        # end for
+
+        print('%-10s %8d %12.1f %12.1f %7.1fx' % (name, len(content), durations[0], durations[1],
+                                                  durations[0] / durations[1]))
+    # end for
+# end def main
+
+if __name__ == '__main__':
+    main()
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
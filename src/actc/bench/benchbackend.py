@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.benchbackend
+
+@brief   Dependency backend benchmark
+
+For each backend and number of tasks, measures:
+  - full:  first build, every task record written
+  - check: no-op build, every task record read
+  - touch: incremental build, 1% of the task records updated
+
+Usage: python -m actc.bench.benchbackend [-s 1000 10000 100000] [-b json sqlite dbm]
+
+@author  Ronan Le Gallic
+
+@date    2014/10/14
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from glob                       import glob
+from multiprocessing            import Process
+from multiprocessing            import Queue
+from os.path                    import getsize
+from os.path                    import join
+from resource                   import getrusage
+from resource                   import RUSAGE_SELF
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+from time                       import time
+
+from doit.dependency            import JsonDB
+
+from actc.backend               import BACKENDS
+from actc.backend               import DbmDB
+from actc.backend               import SqliteDB
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+## backend --> DoIt dependency database class
+CLASSES = {'json'  : JsonDB,
+           'sqlite': SqliteDB,
+           'dbm'   : DbmDB}
+
+## Dependencies by task (source, header, configuration)
+DEPS    = 3
+
+
+def _record(db, task):
+    '''
+    Write a task record, as DoIt does after a successful task
+
+    @param db   [in] (object) dependency database
+    @param task [in] (int)    task number
+    '''
+    name = 'COMPILE:build/BC08/file%06d.o' % (task,)
+    for dep in xrange(DEPS):
+        db.set(name, '/src/file%06d.%d' % (task, dep),
+               [1412000000.0 + task, 4096, '%032x' % (task * DEPS + dep,)])
+    # end for
+    db.set(name, '_values_:', {'_config_changed': '%064x' % (task,)})
+    db.set(name, 'checker:', 'MD5Checker')
+    db.set(name, 'deps:', ['/src/file%06d.%d' % (task, dep)
+                           for dep in xrange(DEPS)])
+# end def _record
+
+
+def _check(db, task):
+    '''
+    Read a task record, as DoIt does to check a task is up-to-date
+
+    @param db   [in] (object) dependency database
+    @param task [in] (int)    task number
+    '''
+    name = 'COMPILE:build/BC08/file%06d.o' % (task,)
+    for dep in xrange(DEPS):
+        db.get(name, '/src/file%06d.%d' % (task, dep))
+    # end for
+    db.get(name, '_values_:')
+    db.get(name, 'checker:')
+# end def _check
+
+
+def _run(backend, tasks, folder, queue):
+    '''
+    Run the 3 builds (in a dedicated process for the memory measurement)
+
+    @param backend [in] (str)   json, sqlite, dbm
+    @param tasks   [in] (int)   number of tasks
+    @param folder  [in] (str)   working folder
+    @param queue   [in] (Queue) results
+    '''
+    cls    = CLASSES[backend]
+    name   = join(folder, BACKENDS[backend][1])
+    result = dict()
+
+    for phase, action, step in (('full',  _record, 1),
+                                ('check', _check,  1),
+                                ('touch', _record, 100)):
+        start = time()
+        db    = cls(name)
+        for task in xrange(0, tasks, step):
+            action(db, task)
+        # end for
+        db.dump()
+        result[phase] = time() - start
+    # end for
+
+    result['size']   = sum(getsize(path) for path in glob(name + '*'))
+    result['maxrss'] = getrusage(RUSAGE_SELF).ru_maxrss
+    queue.put(result)
+# end def _run
+
+
+def main():
+    '''
+    Benchmark entry point
+    '''
+    parser = ArgumentParser(description = 'Dependency backend benchmark')
+
+    parser.add_argument('-s', '--sizes',
+                        metavar = 'N',
+                        type    = int,
+                        nargs   = '+',
+                        default = [1000, 10000, 100000],
+                        help    = 'numbers of tasks [%(default)s]')
+
+    parser.add_argument('-b', '--backends',
+                        nargs   = '+',
+                        choices = sorted(CLASSES),
+                        default = ['json', 'sqlite', 'dbm'],
+                        help    = 'backends [%(default)s]')
+
+    args = parser.parse_args()
+
+    print('%-8s %8s %9s %9s %9s %10s %10s'
+          % ('backend', 'tasks', 'full (s)', 'check (s)', 'touch (s)',
+             'size (KB)', 'rss (MB)'))
+
+    for tasks in args.sizes:
+        for backend in args.backends:
+            folder = mkdtemp(prefix = 'actc-bench-')
+            queue  = Queue()
+            try:
+                process = Process(target = _run,
+                                  args   = (backend, tasks, folder, queue))
+                process.start()
+                result = queue.get()
+                process.join()
+            finally:
+                rmtree(folder, ignore_errors = True)
+            # end try
+
+            print('%-8s %8d %9.3f %9.3f %9.3f %10d %10.1f'
+                  % (backend, tasks, result['full'], result['check'],
+                     result['touch'], result['size'] >> 10,
+                     result['maxrss'] / 1024.0))
+        # end for
+    # end for
+# end def main
+
+
+if __name__ == '__main__':
+    main()
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
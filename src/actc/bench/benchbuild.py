@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.benchbuild
+
+@brief   Synthetic project benchmark
+
+Generates a project of N C files, N' C++ files, M annotations by file and K
+headers, installs a stub (see actc.bench.stub) for every tool of the
+configuration (/opt/... --> <folder>/stubs/opt/...), then builds it with Actc
+(src2src and src2bin, the bin2bin steps using hard-coded /opt paths) and
+reports:
+  - the task generation time (graph),
+  - the scheduling overhead: wall time not spent in the tasks nor in their
+    generation,
+  - the files and bytes written in the build folder, the bytes read and
+    written by ACTC itself,
+  - the busy and wall times by stage (see actc.dodo.Tracer),
+  - the wall time of a no-op build.
+
+Usage: PYTHONPATH=$PWD/src python -m actc.bench.benchbuild [-n 100] [-x 0] [-m 2] [-k 10] [-j 1]
+
+The configuration loading changes the working directory: PYTHONPATH must be
+absolute.
+
+@author  Ronan Le Gallic
+
+@date    2014/10/15
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from json                       import dumps
+from json                       import load
+from os                         import chdir
+from os                         import chmod
+from os                         import environ
+from os                         import getcwd
+from os                         import makedirs
+from os                         import walk
+from os.path                    import abspath
+from os.path                    import dirname
+from os.path                    import getsize
+from os.path                    import isdir
+from os.path                    import join
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+from time                       import time
+import sys
+
+from actc.bench                 import stub
+from actc.config                import Config
+from actc.consts                import APP_VERSION
+from actc.core                  import Actc
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+## Tools used as installation folders: path --> content
+FOLDERS = {'/opt/3rd_party'          : ['curl/linux/include/',
+                                        'curl/linux/lib/',
+                                        'openssl/linux/include/',
+                                        'openssl/linux/lib/',
+                                        'libwebsockets/linux/include/',
+                                        'libwebsockets/linux/lib/'],
+           '/opt/ACCL'               : ['include/',
+                                        'src/accl.c'],
+           '/opt/ASCL'               : ['include/'],
+           '/opt/anti_debugging'     : ['obj/linux/'],
+           '/opt/client_server_splitter': ['process.sh*',
+                                        'code_transformation.sh*'],
+           '/opt/code_mobility'      : ['binder/obj/linux/',
+                                        'downloader/obj/linux/'],
+           '/opt/dcl'                : ['script/replace.sh*',
+                                        'wrapper/',
+                                        'dist/assets/armeabi-v7a/',
+                                        'dist/libs/armeabi-v7a/',
+                                        'dist/tool/AdminCmdGenerator-1.1.jar'],
+           '/opt/renewability'       : ['obj/linux/',
+                                        'scripts/create_new_application.sh*',
+                                        'scripts/set_application_policy.sh*']}
+
+## Annotations, cycled in each file
+ANNOTATIONS = ['protection(obfuscations, enable_obfuscation(opaque_predicates:percent_apply=25))',
+               'protection(xor, mask(constant(35)))',
+               'protection(guarded_region, label(r%(id)d))',
+               'protection(cf_tagging)']
+
+## Stages built, the other ones copying their inputs (traverse)
+STAGES = ['SLP01', 'SLP02', 'SLP04', 'SLP05', 'SLP08', 'SLP12']
+
+## Stages traversed
+TRAVERSED = ['SLP03', 'SLP06', 'SLP07', 'SLP09', 'SLP10', 'SLP11']
+
+## Steps of the stages built
+STEPS     = {'SLP05': ['_01', '_02']}
+
+## Stub launcher
+LAUNCHER = '''#!/bin/sh
+exec "%s" "%s" "$0" "$@"
+'''
+
+
+def _install(path, launcher):
+    '''
+    Install a stub tool
+
+    @param path     [in] (str) tool path, ends with '/' for a folder
+    @param launcher [in] (str) shell script, '' for a data file
+    '''
+    folder = dirname(path)
+    if (not isdir(folder)):
+        makedirs(folder)
+    # end if
+
+    if (path.endswith('/')):
+        return
+    # end if
+
+    with open(path, 'w') as fo:
+        fo.write(launcher)
+    # end with
+    chmod(path, 0755)
+# end def _install
+
+
+def installStubs(root):
+    '''
+    Install a stub of each tool under root
+
+    @param root [in] (str) stub installation folder
+
+    @return (dict) tools configuration
+    '''
+    launcher = LAUNCHER % (sys.executable, abspath(stub.__file__).replace('.pyc', '.py'))
+    tools    = dict()
+
+    for name, value in Config._getDefaults()['tools'].iteritems():            # pylint:disable=W0212
+        # [interpreter, script] --> script
+        value = value[-1] if isinstance(value, list) else value
+        path  = join(root, value.lstrip('/'))
+
+        if (value in FOLDERS):
+            for item in FOLDERS[value]:
+                _install(join(path, item.rstrip('*')),
+                         launcher if item.endswith('*') else '')
+            # end for
+        else:
+            _install(path, launcher)
+        # end if
+
+        tools[name] = path
+    # end for
+
+    return tools
+# end def installStubs
+
+
+def generateProject(root, cfiles, cppfiles, annotations, headers):
+    '''
+    Generate the sources of a synthetic project
+
+    @param root        [in] (str) project folder
+    @param cfiles      [in] (int) number of C files
+    @param cppfiles    [in] (int) number of C++ files
+    @param annotations [in] (int) annotated functions by file
+    @param headers     [in] (int) number of headers
+
+    @return (list) source patterns
+    '''
+    src = join(root, 'src')
+    makedirs(src)
+
+    for header in xrange(headers):
+        with open(join(src, 'h%04d.h' % (header,)), 'w') as fo:
+            fo.write('#define H%04d %d\nint g%04d(int x);\n' % (header, header, header))
+        # end with
+    # end for
+
+    number = 0
+    for index in xrange(cfiles + cppfiles):
+        name = 'f%04d.%s' % (index, 'c' if index < cfiles else 'cpp')
+        with open(join(src, name), 'w') as fo:
+            if (headers):
+                fo.write('#include "h%04d.h"\n\n' % (index % headers,))
+            # end if
+
+            for function in xrange(annotations):
+                content = ANNOTATIONS[number % len(ANNOTATIONS)] % {'id': number}
+                fo.write('_Pragma("ASPIRE begin %s")\n' % (content,))
+                fo.write('int f%04d_%d(int x)\n{\n  return x * %d + %d;\n}\n'
+                         % (index, function, function, index))
+                fo.write('_Pragma("ASPIRE end")\n\n')
+                number += 1
+            # end for
+
+            fo.write('int f%04d(int x)\n{\n  return x + %d;\n}\n' % (index, index))
+        # end with
+    # end for
+
+    with open(join(src, 'main.c'), 'w') as fo:
+        fo.write('int main(void)\n{\n  return 0;\n}\n')
+    # end with
+
+    return ['src/*.c', 'src/*.cpp', 'src/*.h']
+# end def generateProject
+
+
+def generateConfig(path, tools, sources):
+    '''
+    Generate the project configuration
+
+    @param path    [in] (str)  configuration file
+    @param tools   [in] (dict) tools configuration
+    @param sources [in] (list) source patterns
+    '''
+    config = {'platform': 'linux',
+              'tools'   : tools,
+              'SERVER'  : {'excluded': True},
+              'METRICS' : {'excluded': True},
+              'src2src' : {'excluded': False},
+              'src2bin' : {'excluded': False},
+              'bin2bin' : {'excluded': True}}
+
+    defaults = Config._getDefaults()['src2src']                                # pylint:disable=W0212
+
+    for stage in STAGES + TRAVERSED:
+        config['src2src'][stage] = {'excluded': False}
+
+        if ('traverse' in defaults[stage]):
+            config['src2src'][stage]['traverse'] = stage in TRAVERSED
+        # end if
+
+        for step in STEPS.get(stage, []):
+            config['src2src'][stage][step] = {'excluded': False}
+        # end for
+    # end for
+
+    config['src2src']['SLP01']['source'] = sources
+
+    with open(path, 'w') as fo:
+        fo.write('// ACTC %s\n%s\n' % (APP_VERSION, dumps(config, indent = 2)))
+    # end with
+# end def generateConfig
+
+
+def _volume(root):
+    '''
+    Measure the files of a folder
+
+    @param root [in] (str) folder
+
+    @return (tuple) files, bytes
+    '''
+    files = size = 0
+    for path, _, names in walk(root):
+        for name in names:
+            files += 1
+            size  += getsize(join(path, name))
+        # end for
+    # end for
+
+    return files, size
+# end def _volume
+
+
+def _io():
+    '''
+    Get the bytes read and written by the current process
+
+    @return (tuple) read, written (0, 0 if not available)
+    '''
+    try:
+        with open('/proc/self/io') as fo:
+            counters = dict(line.split(':') for line in fo)
+        # end with
+    except IOError:
+        return 0, 0
+    # end try
+
+    return int(counters['rchar']), int(counters['wchar'])
+# end def _io
+
+
+def build(actc, jobs, trace):
+    '''
+    Build, timing the task generation
+
+    @param actc  [in] (Actc) configuration
+    @param jobs  [in] (int)  1..N jobs at once
+    @param trace [in] (str)  trace file
+
+    @return (tuple) wall time, generation time
+    '''
+    generate = actc._generate                                                  # pylint:disable=W0212
+    spent    = [0.0]
+
+    def timed(name, method):
+        '''
+        Timed task generation
+        '''
+        start = time()
+        try:
+            return generate(name, method)
+        finally:
+            spent[0] += time() - start
+        # end try
+    # end def timed
+
+    actc._generate = timed                                                     # pylint:disable=W0212
+    start = time()
+    try:
+        actc.build(jobs = jobs, trace = trace)
+    finally:
+        del actc._generate                                                     # pylint:disable=W0212
+    # end try
+
+    return time() - start, spent[0]
+# end def build
+
+
+def main():
+    '''
+    Benchmark entry point
+    '''
+    parser = ArgumentParser(description = 'Synthetic project benchmark')
+
+    parser.add_argument('-n', '--c-files',     type = int, default = 100,
+                        help = 'number of C files [%(default)s]')
+    parser.add_argument('-x', '--cpp-files',   type = int, default = 0,
+                        help = 'number of C++ files [%(default)s]')
+    parser.add_argument('-m', '--annotations', type = int, default = 2,
+                        help = 'annotations by file [%(default)s]')
+    parser.add_argument('-k', '--headers',     type = int, default = 10,
+                        help = 'number of headers [%(default)s]')
+    parser.add_argument('-j', '--jobs',        type = int, default = 1,
+                        help = 'allow 1..N jobs at once [%(default)s]')
+    parser.add_argument('-s', '--sleep',       type = float, default = 0.0,
+                        help = 'tool run time (s) [%(default)s]')
+    parser.add_argument('-d', '--dir',         default = None,
+                        help = 'working folder, kept [temporary folder]')
+
+    args = parser.parse_args()
+
+    folder = abspath(args.dir) if args.dir else mkdtemp(prefix = 'actc-bench-')
+    cwd    = getcwd()
+    environ['ACTC_STUB_SLEEP'] = str(args.sleep)
+
+    try:
+        tools   = installStubs(join(folder, 'stubs'))
+        sources = generateProject(folder, args.c_files, args.cpp_files,
+                                  args.annotations, args.headers)
+        config  = join(folder, 'aspire.json')
+        trace   = join(folder, 'trace.json')
+        generateConfig(config, tools, sources)
+
+        start = time()
+        actc  = Actc(config, aid = 'BENCH')
+        load_ = time() - start
+
+        io             = _io()
+        wall, generate = build(actc, args.jobs, trace)
+        io             = [after - before for before, after in zip(io, _io())]
+        files, size    = _volume(join(folder, 'build'))
+
+        with open(trace) as fo:
+            tasks = sum(event['dur'] for event in load(fo)['traceEvents']) / 1e6
+        # end with
+
+        noop, _ = build(actc, args.jobs, join(folder, 'noop.json'))
+
+        print('')
+        print('configuration load      %10.3f s' % (load_,))
+        print('task generation         %10.3f s' % (generate,))
+        print('tasks (sum)             %10.3f s' % (tasks,))
+        print('scheduling overhead     %10.3f s' % (wall - generate - tasks / args.jobs,))
+        print('build                   %10.3f s' % (wall,))
+        print('no-op build             %10.3f s' % (noop,))
+        print('build folder            %10d files, %d KB' % (files, size >> 10))
+        print('ACTC read/written       %10d KB, %d KB' % (io[0] >> 10, io[1] >> 10))
+    finally:
+        chdir(cwd)
+        if (not args.dir):
+            rmtree(folder, ignore_errors = True)
+        # end if
+    # end try
+# end def main
+
+
+if __name__ == '__main__':
+    main()
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
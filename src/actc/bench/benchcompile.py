@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.benchcompile
+
+@brief   Compilation benchmark
+
+For each batch size (sources by frontend process, 0: a task and a process by
+source, see actc.tools.compiler.Compiler) and number of files, measures the
+objects by second of:
+  - full:  first build, every source compiled
+  - touch: incremental build, 1% of the sources changed
+
+Usage: python -m actc.bench.benchcompile [-s 1000] [-b 0 8 32] [-j 1] [-c gcc]
+
+@author  Ronan Le Gallic
+
+@date    2014/10/15
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from os                         import chdir
+from os                         import getcwd
+from os                         import makedirs
+from os.path                    import join
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+
+from actc.bench.benchcopy       import build
+from actc.dodo                  import AbstractDodo
+from actc.tools.compiler        import Compiler
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class CompileDodo(AbstractDodo):
+    '''
+    Single compilation stage
+    '''
+
+    def __init__(self, folder, program, batch):
+        '''
+        Constructor
+
+        @param folder  [in] (str) working folder (src/*.c, src/*.h)
+        @param program [in] (str) frontend
+        @param batch   [in] (int) sources by frontend process
+        '''
+        super(CompileDodo, self).__init__(output = join(folder, 'build'))
+
+        self._folder  = folder
+        self._program = program
+        self._batch   = batch
+    # end def __init__
+
+    def task_compile(self):
+        '''
+        src/*.c --> compiler --> build/BC08/*.o
+
+        @return (Task)
+        '''
+        src  = join(self._folder, 'src')
+
+        tool = Compiler(program = self._program,
+                        options = ['-I', src, '-O1', '-g'],
+                        outputs = (join(self._output, 'BC08'), '.o'),
+                        batch   = self._batch)
+        yield tool.tasks(join(src, '*.c'),
+                         header_files = [join(src, '*.h')])
+    # end def task_compile
+
+# end class CompileDodo
+
+
+def _write(folder, files, step = 1, value = 0):
+    '''
+    Write small generated sources (as the src2src outputs)
+
+    @param  folder [in] (str) working folder
+    @param  files  [in] (int) number of files
+    @option step   [in] (int) write every step-th file
+    @option value  [in] (int) returned value
+    '''
+    for i in xrange(0, files, step):
+        with open(join(folder, 'src', 'f%06d.c' % (i,)), 'w') as fo:
+            fo.write('#include "common.h"\n'
+                     'static int v%06d[] = { %d, %d, %d };\n'
+                     'int f%06d(int x) { return COMMON(x) + v%06d[x %% 3] + %d; }\n'
+                     % (i, i, i + 1, i + 2, i, i, value))
+        # end with
+    # end for
+# end def _write
+
+
+def run(files, program, batch, jobs):
+    '''
+    Run the 2 builds
+
+    @param files   [in] (int) number of files
+    @param program [in] (str) frontend
+    @param batch   [in] (int) sources by frontend process
+    @param jobs    [in] (int) 1..N jobs at once
+
+    @return (dict) phase --> wall time
+    '''
+    folder = mkdtemp(prefix = 'actc-bench-')
+    cwd    = getcwd()
+    result = dict()
+
+    try:
+        chdir(folder)
+        makedirs(join(folder, 'src'))
+        with open(join(folder, 'src', 'common.h'), 'w') as fo:
+            fo.write('#define COMMON(x) ((x) * 2)\n')
+        # end with
+        _write(folder, files)
+
+        dodo = CompileDodo(folder, program, batch)
+
+        result['full']  = build(dodo, jobs)
+
+        _write(folder, files, step = 100, value = 1)
+        result['touch'] = build(dodo, jobs)
+    finally:
+        chdir(cwd)
+        rmtree(folder, ignore_errors = True)
+    # end try
+
+    return result
+# end def run
+
+
+def main():
+    '''
+    Benchmark entry point
+    '''
+    parser = ArgumentParser(description = 'Compilation benchmark')
+
+    parser.add_argument('-s', '--sizes',
+                        metavar = 'N',
+                        type    = int,
+                        nargs   = '+',
+                        default = [1000],
+                        help    = 'numbers of files [%(default)s]')
+
+    parser.add_argument('-b', '--batches',
+                        metavar = 'N',
+                        type    = int,
+                        nargs   = '+',
+                        default = [0, 8, 32],
+                        help    = 'sources by frontend process [%(default)s]')
+
+    parser.add_argument('-j', '--jobs',
+                        type    = int,
+                        default = 1,
+                        help    = 'allow 1..N jobs at once [%(default)s]')
+
+    parser.add_argument('-c', '--compiler',
+                        default = 'gcc',
+                        help    = 'frontend [%(default)s]')
+
+    args = parser.parse_args()
+
+    print('%-6s %8s %9s %12s %9s %13s'
+          % ('batch', 'files', 'full (s)', 'full (obj/s)', 'touch (s)', 'touch (obj/s)'))
+
+    for files in args.sizes:
+        for batch in args.batches:
+            result = run(files, args.compiler, batch, args.jobs)
+            touched = len(xrange(0, files, 100))
+
+            print('%-6d %8d %9.3f %12.1f %9.3f %13.1f'
+                  % (batch, files, result['full'], files / result['full'],
+                     result['touch'], touched / result['touch']))
+        # end for
+    # end for
+# end def main
+
+
+if __name__ == '__main__':
+    main()
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.benchcopy
+
+@brief   Copy stage benchmark
+
+For each mode (a task by file, a task by folder: see actc.tools.utils.Copier)
+and number of files, measures the wall time of:
+  - full:  first build, every file copied
+  - check: no-op build
+  - touch: incremental build, 1% of the files changed
+
+Usage: python -m actc.bench.benchcopy [-s 1000 10000] [-j 1]
+
+@author  Ronan Le Gallic
+
+@date    2014/10/15
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from os                         import chdir
+from os                         import close
+from os                         import devnull
+from os                         import dup
+from os                         import dup2
+from os                         import getcwd
+from os                         import makedirs
+from os.path                    import join
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+from time                       import time
+import sys
+
+from actc.dodo                  import AbstractDodo
+from actc.tools                 import setLinkMode
+from actc.tools.utils           import Copier
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class CopyDodo(AbstractDodo):
+    '''
+    Single copy stage
+    '''
+
+    def __init__(self, folder, batch):
+        '''
+        Constructor
+
+        @param folder [in] (str)  working folder (src/*.c)
+        @param batch  [in] (bool) a task by folder
+        '''
+        super(CopyDodo, self).__init__(output = join(folder, 'build'))
+
+        self._folder = folder
+        self._batch  = batch
+    # end def __init__
+
+    def task_copy(self):
+        '''
+        src/*.c --> copy --> build/SC02/*.c
+
+        @return (Task)
+        '''
+        tool = Copier(outputs = (join(self._output, 'SC02'), ''),
+                      batch   = self._batch)
+        yield tool.tasks(join(self._folder, 'src', '*.c'))
+    # end def task_copy
+
+# end class CopyDodo
+
+
+def _write(folder, files, step = 1, content = 'int f%06d;\n'):
+    '''
+    Write source files
+
+    @param folder  [in] (str) working folder
+    @param files   [in] (int) number of files
+    @option step    [in] (int) write every step-th file
+    @option content [in] (str) % file number
+    '''
+    for i in xrange(0, files, step):
+        with open(join(folder, 'src', 'f%06d.c' % (i,)), 'w') as fo:
+            fo.write(content % (i,))
+        # end with
+    # end for
+# end def _write
+
+
+def build(dodo, jobs):
+    '''
+    Build, the task titles discarded
+
+    @param dodo [in] (CopyDodo) stage
+    @param jobs [in] (int)      1..N jobs at once
+
+    @return (float) wall time
+    '''
+    # DoIt writes to the original sys.stdout: redirect the descriptor
+    sys.stdout.flush()
+    stdout = dup(1)
+    start  = time()
+    with open(devnull, 'w') as fo:
+        dup2(fo.fileno(), 1)
+        try:
+            dodo.build(jobs = jobs)
+        finally:
+            sys.stdout.flush()
+            dup2(stdout, 1)
+            close(stdout)
+        # end try
+    # end with
+
+    return time() - start
+# end def build
+
+
+def run(files, batch, jobs):
+    '''
+    Run the 3 builds
+
+    @param files [in] (int)  number of files
+    @param batch [in] (bool) a task by folder
+    @param jobs  [in] (int)  1..N jobs at once
+
+    @return (dict) phase --> wall time
+    '''
+    folder = mkdtemp(prefix = 'actc-bench-')
+    cwd    = getcwd()
+    result = dict()
+
+    try:
+        chdir(folder)
+        makedirs(join(folder, 'src'))
+        _write(folder, files)
+
+        dodo = CopyDodo(folder, batch)
+
+        result['full']  = build(dodo, jobs)
+        result['check'] = build(dodo, jobs)
+
+        _write(folder, files, step = 100, content = 'int g%06d;\n')
+        result['touch'] = build(dodo, jobs)
+    finally:
+        chdir(cwd)
+        rmtree(folder, ignore_errors = True)
+    # end try
+
+    return result
+# end def run
+
+
+def main():
+    '''
+    Benchmark entry point
+    '''
+    parser = ArgumentParser(description = 'Copy stage benchmark')
+
+    parser.add_argument('-s', '--sizes',
+                        metavar = 'N',
+                        type    = int,
+                        nargs   = '+',
+                        default = [1000, 10000],
+                        help    = 'numbers of files [%(default)s]')
+
+    parser.add_argument('-j', '--jobs',
+                        type    = int,
+                        default = 1,
+                        help    = 'allow 1..N jobs at once [%(default)s]')
+
+    args = parser.parse_args()
+
+    # Scheduling overhead, not file system
+    setLinkMode('copy')
+
+    print('%-8s %8s %9s %9s %9s' % ('mode', 'files', 'full (s)', 'check (s)', 'touch (s)'))
+
+    for files in args.sizes:
+        for mode, batch in (('file', False), ('folder', True)):
+            result = run(files, batch, args.jobs)
+
+            print('%-8s %8d %9.3f %9.3f %9.3f'
+                  % (mode, files, result['full'], result['check'], result['touch']))
+        # end for
+    # end for
+# end def main
+
+
+if __name__ == '__main__':
+    main()
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
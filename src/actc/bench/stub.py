@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.bench.stub
+
+@brief   Stub of the protection tools (see actc.bench.benchbuild)
+
+A stub sleeps, then creates the outputs found on its command line:
+  - the path following an output option (-o, -MF, --extractor-output-file),
+  - the other paths (with a folder or an extension) not existing yet, in an
+    existing folder,
+  - the input files, in an output folder given by -o.
+
+An output is a copy of the first input file; a dependency file (-MF) lists
+the input files. The annotation extractor outputs the annotations found in
+its input, as JSON.
+
+Usage: stub.py <tool> [args...], the sleep time (s) being ACTC_STUB_SLEEP.
+
+@author  Ronan Le Gallic
+
+@date    2014/10/15
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from json                       import dump
+from os                         import getenv
+from os.path                    import basename
+from os.path                    import dirname
+from os.path                    import exists
+from os.path                    import isdir
+from os.path                    import isfile
+from os.path                    import join
+from shutil                     import copyfile
+from time                       import sleep
+import re
+import sys
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+## Options followed by an output path
+OUTPUTS = ('-o', '-MF', '--extractor-output-file')
+
+## Annotation (pragma or attribute)
+_RE_ANNOTATION = re.compile(r'ASPIRE\s*(?:begin\s+)?\(?\\?"?\s*(protection\s*\(.*?\))\s*\\?"?\)')
+
+
+def _extract(source, output):
+    '''
+    Extract the annotations of a source (annotation extractor stub)
+
+    @param source [in] (str) source file
+    @param output [in] (str) JSON file
+    '''
+    annotations = list()
+
+    with open(source) as fo:
+        for number, line in enumerate(fo, 1):
+            for content in _RE_ANNOTATION.findall(line):
+                annotations.append({'file_name'         : basename(source),
+                                    'line_number'       : number,
+                                    'annotation_type'   : 'code',
+                                    'annotation_content': content})
+            # end for
+        # end for
+    # end with
+
+    with open(output, 'w') as fo:
+        dump(annotations, fo, indent = 2)
+    # end with
+# end def _extract
+
+
+def main(tool, args):
+    '''
+    Stub entry point
+
+    @param tool [in] (str)  stubbed tool path
+    @param args [in] (list) tool arguments
+
+    @return (int) exit status
+    '''
+    sleep(float(getenv('ACTC_STUB_SLEEP', '0')))
+
+    inputs   = list()
+    outputs  = list()
+    depfiles = list()
+    folders  = list()
+
+    option = None
+    for arg in args:
+        if (option in OUTPUTS):
+            if (isdir(arg)):
+                folders.append(arg)
+            elif (option == '-MF'):
+                depfiles.append(arg)
+            else:
+                outputs.append(arg)
+            # end if
+
+        elif (isfile(arg)):
+            inputs.append(arg)
+
+        elif (    (not arg.startswith('-'))
+              and (not exists(arg))
+              and (('/' in arg) or ('.' in basename(arg)))
+              and isdir(dirname(arg) or '.')):
+            outputs.append(arg)
+        # end if
+
+        option = arg
+    # end for
+
+    for output in outputs:
+        if (tool.endswith('readAnnot.sh') and inputs):
+            _extract(inputs[0], output)
+        elif (inputs):
+            copyfile(inputs[0], output)
+        else:
+            open(output, 'a').close()
+        # end if
+    # end for
+
+    for depfile in depfiles:
+        with open(depfile, 'w') as fo:
+            fo.write('%s: %s\n' % ((outputs or ['stub'])[0], ' '.join(inputs)))
+        # end with
+    # end for
+
+    for folder in folders:
+        for path in inputs:
+            copyfile(path, join(folder, basename(path)))
+        # end for
+    # end for
+
+    return 0
+# end def main
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1], sys.argv[2:]))
+# end if
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -38,20 +38,36 @@
 # imports
 # ------------------------------------------------------------------------------
 from argparse           import ArgumentParser
+from cProfile           import Profile
+from pstats             import Stats
 from argparse           import RawDescriptionHelpFormatter
+from os                 import sysconf
 from os.path            import basename
 from os.path            import realpath
 from os.path            import dirname
 from os.path            import join
 from random             import randint
+from time               import time
 import sys
 
+from actc.backend       import BACKENDS
+from actc.batch         import Batch
+from actc.client        import connect
 from actc.core          import Actc
 from actc.config        import Config
 from actc.consts        import APP_BRIEF
 from actc.consts        import APP_VERSION
 from actc.consts        import CFG_NAME
 from actc.consts        import CFG_JOBS
+from actc.consts        import CFG_CACHE_MB
+from actc.consts        import CFG_BACKEND
+from actc.consts        import CFG_LINK
+from actc.tools         import LINK_MODES
+from actc.tools         import setLinkMode
+from actc.tools.cache   import ArtifactCache
+from actc.tools.cache   import setCache
+from actc.tools.compiler import setBatchCompile
+from actc.tools.utils   import setBatchCopy
 
 # ------------------------------------------------------------------------------
 # implementation
@@ -66,7 +82,67 @@ class Main(Actc):
         '''
         Constructor
         '''
+        parser = self.parser()
+        args   = parser.parse_args()
+        args.file = args.file or [CFG_NAME]
 
+        profile = Profile() if args.profile_startup else None
+        started = time()
+
+        try:
+            if profile is not None:
+                profile.enable()
+            # end if
+
+            if args.generate is not None:
+                Config().generate(args.generate)
+                parser.exit(message="Configuration file '%s' created\n" % (basename(args.generate),))
+                sys.exit(0)
+            # end if
+
+            if args.update is not None:
+                Config().update(args.update)
+                parser.exit(message="Configuration file '%s' updated\n" % (basename(args.update),))
+                sys.exit(0)
+            # end if
+
+            if args.connect is not None:
+                connect(sys.argv[1:])
+            # end if
+
+            if args.daemon is not None:
+                # Only the daemon needs the socket server
+                from actc.daemon import Daemon
+                Daemon(args.daemon).serve()
+                sys.exit(0)
+            # end if
+
+            super(Main, self).__init__(args.file[0],
+                                       debug=args.debug, verbose=args.verbose, aid=args.aidfixed)
+
+            dodo = self.dodo(args, self)
+
+        except Exception as err:  # pylint:disable=W0703
+            parser.error(err.message)
+
+        finally:
+            if profile is not None:
+                profile.disable()
+                Main._profile(profile, time() - started)
+            # end if
+        # end try
+
+        self.run(parser, args, dodo)
+
+    # end def __init__
+
+    @staticmethod
+    def parser():
+        '''
+        Build the command line parser
+
+        @return (ArgumentParser)
+        '''
         parser = ArgumentParser(description     = APP_BRIEF,
                                 formatter_class = RawDescriptionHelpFormatter,
                                 epilog          = '''
@@ -87,6 +163,48 @@ ACTC v %s
                            default = CFG_JOBS,
                            help    = 'allow 1..N jobs at once [%(default)s]')
 
+        group.add_argument('-P', '--pipeline',
+                           action  = 'store_true',
+                           default = False,
+                           help    = 'stream files across consecutive steps')
+
+        group.add_argument('-c', '--cache',
+                           metavar = 'DIR',
+                           default = None,
+                           help    = 'restore unchanged outputs from the artifact cache DIR')
+
+        group.add_argument('--cache-size',
+                           metavar = 'MB',
+                           type    = int,
+                           default = CFG_CACHE_MB,
+                           help    = 'maximum artifact cache size [%(default)s]')
+
+        group.add_argument('-l', '--link',
+                           choices = LINK_MODES,
+                           default = CFG_LINK,
+                           help    = 'copy files as clones (reflink), hard links or plain copies [%(default)s]')
+
+        group.add_argument('--batch-copy',
+                           action  = 'store_true',
+                           default = False,
+                           help    = 'copy a folder by task (manifest of the copied files)')
+
+        group.add_argument('--batch-compile',
+                           metavar = 'N',
+                           type    = int,
+                           default = 0,
+                           help    = 'compile N sources by frontend process (0: one by source) [%(default)s]')
+
+        group.add_argument('-b', '--backend',
+                           choices = sorted(BACKENDS),
+                           default = CFG_BACKEND,
+                           help    = 'dependency file backend [%(default)s]')
+
+        group.add_argument('-t', '--trace',
+                           metavar = 'FILE',
+                           default = None,
+                           help    = 'write a Chrome trace of the build steps to FILE')
+
         group.add_argument('-d', '--debug',
                            action  = 'store_true',
                            default = False,
@@ -102,6 +220,11 @@ ACTC v %s
                            default = False,
                            help    = 'print everything from a task')
 
+        group.add_argument('--profile-startup',
+                           action  = 'store_true',
+                           default = False,
+                           help    = 'print a profile of the startup (configurations loading, tasks ordering)')
+
         group.add_argument('-a', '--aid',
                            action='store_true',
                            default=False,
@@ -113,15 +236,26 @@ ACTC v %s
                            default = None,
                            help = 'use fixed application id N (-1: generate automatically)')
 
+        group = parser.add_argument_group('Daemon')
+
+        group.add_argument('--daemon',
+                           metavar = 'SOCKET',
+                           default = None,
+                           help    = 'serve build/clean requests on the UNIX socket SOCKET')
+
+        group.add_argument('--connect',
+                           metavar = 'SOCKET',
+                           default = None,
+                           help    = 'send the request to the daemon listening on SOCKET')
+
         group = parser.add_argument_group('Configuration')
 
         group.add_argument('-f', '--file',
                            metavar = 'configName',
-                           action  = 'store',
+                           action  = 'append',
                            type    = str,
-                           default = CFG_NAME,
-                           nargs   = 1,
-                           help    = 'read configName [%(default)s]')
+                           default = None,
+                           help    = 'read configName, repeat for a batch build [%s]' % (CFG_NAME,))
 
         group.add_argument('-g', '--generate',
                            metavar = 'configName',
@@ -147,95 +281,75 @@ ACTC v %s
                             nargs   = '?',
                             help    = 'ACTC commands [%(default)s]')
 
-        args = parser.parse_args()
+        return parser
+    # end def parser
 
-        try:
-            if args.generate is not None:
-                Config().generate(args.generate)
-                parser.exit(message="Configuration file '%s' created\n" % (basename(args.generate),))
-                sys.exit(0)
-            # end if
+    @staticmethod
+    def dodo(args, actc):
+        '''
+        Get the dodo building the configurations
 
-            if args.update is not None:
-                Config().update(args.update)
-                parser.exit(message="Configuration file '%s' updated\n" % (basename(args.update),))
-                sys.exit(0)
-            # end if
+        @param args [in] (Namespace) command line arguments
+        @param actc [in] (Actc)      first configuration
 
-            super(Main, self).__init__(args.file[0] if isinstance(args.file, list) else args.file,
-                                       debug=args.debug, verbose=args.verbose, aid=args.aidfixed)
+        @return (Actc, Batch)
+        '''
+        # Batch: several configurations built as a single task graph
+        if (len(args.file) > 1):
+            return Batch([actc] + [Actc(path, debug=args.debug, verbose=args.verbose, aid=args.aidfixed)
+                                   for path in args.file[1:]],
+                         debug=args.debug, verbose=args.verbose)
+        # end if
+
+        return actc
+    # end def dodo
+
+    @staticmethod
+    def run(parser, args, dodo):
+        '''
+        Run the command
 
+        @param parser [in] (ArgumentParser) command line parser
+        @param args   [in] (Namespace)      command line arguments
+        @param dodo   [in] (Actc, Batch)    configurations
+        '''
+        try:
             if args.aid:
-                print('%s' % self._aid);
+                for actc in dodo.modules:
+                    print('%s' % actc._aid);
+                # end for
                 sys.exit(0)
             # end if
 
+            dodo.setBackend(args.backend)
+
             if args.cmd == 'build':
 
-                # Config version?
-                if APP_VERSION != self._config._version:
-                    print('=== Warning: Incompatible configuration file version: %s ===' % (self._config._version))
-                    print('Update to version %s using \'%s -u %s\'' % (APP_VERSION,
-                                                                       dirname(realpath(__file__)) + '.py',
-                                                                       self._config._path))
-                    cont = raw_input("Continue? (y/N): ")
-                    if(cont != 'y'):
-                        sys.exit(1)
-
-                # Config server ip check
-                if(not (self._config.SERVER.ip_address or self._config.SERVER.excluded)):
-                    print('=== Config error: SERVER.ip_address  empty ===')
-                    sys.exit(1)
-
-                # Config bytecode diversity seed check
-                if((not self._config.bin2bin.excluded) and
-                    not (str.isdigit(str(self._config.bin2bin.bytecode_diversity_seed))
-                        or self._config.bin2bin.bytecode_diversity_seed in 'RANDOM')
-                  ):
-                    print('=== Config error: bin2bin.bytecode_diversity_seed  empty, should be an int or \'RANDOM\' ===')
-                    sys.exit(1)
-
-                # Generate random seed
-                if(self._config.bin2bin.bytecode_diversity_seed in 'RANDOM'):
-                    new_seed = randint(-2 ** 31, 2 ** 31 - 1)
-                    self._config._update(self._config, {'bin2bin' : {'bytecode_diversity_seed' : str(new_seed)}})
-                    print '=========================================================================='
-                    print '= WARNING, random bytecode diversity seed used                           ='
-                    print '= Generated new bytecode diversity seed: %25d       =' % new_seed
-                    print '=========================================================================='
-                # end if
+                for actc in dodo.modules:
+                    Main._prepare(actc)
+                # end for
 
-                with open(join(self._output, 'bytecode_diversity_seed.txt'), 'w') as fo:
-                    fo.write(self._config.bin2bin.bytecode_diversity_seed)
-                # end with
-
-                # Config code_mobility diversity seed check
-                if((not self._config.bin2bin.excluded) and
-                    not (str.isdigit(str(self._config.bin2bin.code_mobility_diversity_seed))
-                        or self._config.bin2bin.code_mobility_diversity_seed in 'RANDOM')
-                  ):
-                    print('=== Config error: bin2bin.code_mobility_diversity_seed  empty, should be an int or \'RANDOM\' ===')
-                    sys.exit(1)
-
-                # Generate random seed
-                if(self._config.bin2bin.code_mobility_diversity_seed in 'RANDOM'):
-                    new_seed = randint(-2 ** 31, 2 ** 31 - 1)
-                    self._config._update(self._config, {'bin2bin' : {'code_mobility_diversity_seed' : str(new_seed)}})
-                    print '=========================================================================='
-                    print '= WARNING, random code mobility diversity seed used                           ='
-                    print '= Generated new code mobility diversity seed: %25d       =' % new_seed
-                    print '=========================================================================='
+                cache = None
+                if (args.cache):
+                    cache = ArtifactCache(args.cache, args.cache_size << 20)
                 # end if
+                setCache(cache)
+                setLinkMode(args.link)
+                setBatchCopy(args.batch_copy)
+                setBatchCompile(args.batch_compile)
 
-                with open(join(self._output, 'code_mobility_diversity_seed.txt'), 'w') as fo:
-                    fo.write(self._config.bin2bin.code_mobility_diversity_seed)
-                # end with
+                dodo.build(jobs=args.jobs, pipeline=args.pipeline, trace=args.trace)
 
-                self.build(jobs=args.jobs)
+                if (cache is not None):
+                    print('=== Cache: %(hits)d hits, %(misses)d misses, '
+                          '%(stores)d stores, %(evictions)d evictions ===' % cache.stats())
+                # end if
 
                 if (args.process):
                     try:
-                        self.processDot()
+                        for actc in dodo.modules:
+                            actc.processDot()
+                        # end for
                     except OSError:
                         parser.exit(message='actc.py: failed: generate process graph (missing "dot" tool?)\n',
                                     status=1)
@@ -243,7 +357,7 @@ ACTC v %s
                 # end if
 
             elif args.cmd == 'clean':
-                self.clean()
+                dodo.clean()
 
             else:
                 parser.error('Unknown command: %s' % (args.cmd,))
@@ -253,7 +367,105 @@ ACTC v %s
             parser.error(err.message)
         # end try
 
-    # end def __init__
+    # end def run
+
+    @staticmethod
+    def _profile(profile, elapsed):
+        '''
+        Print the startup profile on stderr
+
+        The modules imports are timed from the interpreter start: the profiler
+        is only enabled once the command line is parsed.
+
+        @param profile [in] (Profile) startup profile
+        @param elapsed [in] (float)   startup duration (s)
+        '''
+        imports = None
+        try:
+            # Process start time, in clock ticks since boot
+            with open('/proc/self/stat') as fi:
+                start = float(fi.read().rsplit(')', 1)[1].split()[19])
+            # end with
+            with open('/proc/uptime') as fi:
+                uptime = float(fi.read().split()[0])
+            # end with
+            imports = uptime - start / sysconf('SC_CLK_TCK') - elapsed
+        except (IOError, IndexError, ValueError):
+            pass
+        # end try
+
+        sys.stderr.write('=== Startup: %.3f s%s ===\n'
+                         % (elapsed,
+                            '' if imports is None else ' (+ %.3f s interpreter and imports)' % (imports,)))
+        Stats(profile, stream = sys.stderr).sort_stats('cumulative').print_stats(20)
+    # end def _profile
+
+    @staticmethod
+    def _prepare(actc):
+        '''
+        Check configuration and generate the diversity seeds
+
+        @param actc [in] (Actc) configuration to build
+        '''
+        # Config version?
+        if APP_VERSION != actc._config._version:
+            print('=== Warning: Incompatible configuration file version: %s ===' % (actc._config._version))
+            print('Update to version %s using \'%s -u %s\'' % (APP_VERSION,
+                                                               dirname(realpath(__file__)) + '.py',
+                                                               actc._config._path))
+            cont = raw_input("Continue? (y/N): ")
+            if(cont != 'y'):
+                sys.exit(1)
+
+        # Config server ip check
+        if(not (actc._config.SERVER.ip_address or actc._config.SERVER.excluded)):
+            print('=== Config error: SERVER.ip_address  empty ===')
+            sys.exit(1)
+
+        # Config bytecode diversity seed check
+        if((not actc._config.bin2bin.excluded) and
+            not (str.isdigit(str(actc._config.bin2bin.bytecode_diversity_seed))
+                or actc._config.bin2bin.bytecode_diversity_seed in 'RANDOM')
+          ):
+            print('=== Config error: bin2bin.bytecode_diversity_seed  empty, should be an int or \'RANDOM\' ===')
+            sys.exit(1)
+
+        # Generate random seed
+        if(actc._config.bin2bin.bytecode_diversity_seed in 'RANDOM'):
+            new_seed = randint(-2 ** 31, 2 ** 31 - 1)
+            actc._config._update(actc._config, {'bin2bin' : {'bytecode_diversity_seed' : str(new_seed)}})
+            print '=========================================================================='
+            print '= WARNING, random bytecode diversity seed used                           ='
+            print '= Generated new bytecode diversity seed: %25d       =' % new_seed
+            print '=========================================================================='
+        # end if
+
+        with open(join(actc._output, 'bytecode_diversity_seed.txt'), 'w') as fo:
+            fo.write(actc._config.bin2bin.bytecode_diversity_seed)
+        # end with
+
+        # Config code_mobility diversity seed check
+        if((not actc._config.bin2bin.excluded) and
+            not (str.isdigit(str(actc._config.bin2bin.code_mobility_diversity_seed))
+                or actc._config.bin2bin.code_mobility_diversity_seed in 'RANDOM')
+          ):
+            print('=== Config error: bin2bin.code_mobility_diversity_seed  empty, should be an int or \'RANDOM\' ===')
+            sys.exit(1)
+
+        # Generate random seed
+        if(actc._config.bin2bin.code_mobility_diversity_seed in 'RANDOM'):
+            new_seed = randint(-2 ** 31, 2 ** 31 - 1)
+            actc._config._update(actc._config, {'bin2bin' : {'code_mobility_diversity_seed' : str(new_seed)}})
+            print '=========================================================================='
+            print '= WARNING, random code mobility diversity seed used                           ='
+            print '= Generated new code mobility diversity seed: %25d       =' % new_seed
+            print '=========================================================================='
+        # end if
+
+        with open(join(actc._output, 'code_mobility_diversity_seed.txt'), 'w') as fo:
+            fo.write(actc._config.bin2bin.code_mobility_diversity_seed)
+        # end with
+    # end def _prepare
 
 
 # end class Main
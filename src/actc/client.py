@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.client
+
+@brief   Thin client of the resident build daemon (see actc.daemon)
+
+Only the standard library is imported, the toolchain being loaded by the
+daemon.
+
+@author  Ronan Le Gallic
+
+@date    2014/10/06
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from argparse                   import ArgumentParser
+from json                       import dumps
+from os                         import getcwd
+from socket                     import AF_UNIX
+from socket                     import SOCK_STREAM
+from socket                     import socket
+from struct                     import calcsize
+from struct                     import pack
+from struct                     import unpack
+import sys
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+# Frames sent by the daemon: kind, payload size, payload
+OUTPUT = 'O'
+STATUS = 'S'
+
+_HEADER = '!cI'
+
+def frame(kind, payload):
+    '''
+    Build a frame sent by the daemon
+
+    @param kind    [in] (str) OUTPUT (tool output), STATUS (exit status, last)
+    @param payload [in] (str) bytes
+
+    @return (str)
+    '''
+    return pack(_HEADER, kind, len(payload)) + payload
+# end def frame
+
+
+def connect(argv):
+    '''
+    Send a request to the daemon, if required by the arguments
+
+    @param argv [in] (list) command line arguments
+
+    @return (bool) False if no daemon is required (--connect SOCKET), else exit
+    '''
+    parser = ArgumentParser(add_help = False)
+    parser.add_argument('--connect',
+                        metavar = 'SOCKET',
+                        default = None)
+    args, argv = parser.parse_known_args(argv)
+
+    if (args.connect is None):
+        return False
+    # end if
+
+    sock = socket(AF_UNIX, SOCK_STREAM)
+    sock.connect(args.connect)
+    sock.sendall(dumps({'cwd' : getcwd(),
+                        'argv': argv}) + '\n')
+
+    header = calcsize(_HEADER)
+    status = 1
+    data   = ''
+    while True:
+        chunk = sock.recv(1 << 16)
+
+        if (not chunk):
+            break
+        # end if
+
+        # Stream the output of the complete frames
+        data += chunk
+        while (len(data) >= header):
+            kind, size = unpack(_HEADER, data[:header])
+
+            if (len(data) < header + size):
+                break
+            # end if
+
+            payload = data[header:header + size]
+            data    = data[header + size:]
+
+            if (kind == STATUS):
+                status = int(payload)
+            else:
+                sys.stdout.write(payload)
+                sys.stdout.flush()
+            # end if
+        # end while
+    # end while
+
+    sock.close()
+
+    sys.exit(status)
+# end def connect
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
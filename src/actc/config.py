@@ -37,6 +37,8 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
+from hashlib                    import sha256
+from json                       import dumps
 from json                       import loads
 from os                         import chdir
 from os                         import getenv
@@ -90,7 +92,14 @@ class AttrDict(dict):
     A dictionary with attribute-style access.
 
     It maps attribute access to the real dictionary.
+
+    When traced, the path of each value read is recorded, a whole mapping
+    being recorded when it is iterated.
     '''
+
+    _prefix = ()
+    _reads  = None
+
     def __init__(self, mapping):
         '''
         Constructor
@@ -121,12 +130,111 @@ class AttrDict(dict):
         @return (item)
         '''
         value = super(AttrDict, self).__getitem__(key)
-        return AttrDict(value) if isinstance(value, dict) else value
+        path  = self._prefix + (key,)
+
+        if isinstance(value, dict):
+            value = AttrDict(value)
+            object.__setattr__(value, '_prefix', path)
+            object.__setattr__(value, '_reads',  self._reads)
+
+        elif (self._reads is not None):
+            self._reads.add(path)
+        # end if
+
+        return value
     # end def __getitem__
 
     __getattr__ = __getitem__
     __setattr__ = __setitem__
 
+    def _touch(self):
+        '''
+        Record the whole mapping as read
+        '''
+        if (self._reads is not None):
+            self._reads.add(self._prefix)
+        # end if
+    # end def _touch
+
+    def __iter__(self):
+        '''
+        Implement iter(self)
+
+        @return (iterator)
+        '''
+        self._touch()
+        return super(AttrDict, self).__iter__()
+    # end def __iter__
+
+    def keys(self):
+        '''
+        @copydoc dict.keys
+        '''
+        self._touch()
+        return super(AttrDict, self).keys()
+    # end def keys
+
+    def items(self):
+        '''
+        @copydoc dict.items
+        '''
+        self._touch()
+        return super(AttrDict, self).items()
+    # end def items
+
+    def iteritems(self):
+        '''
+        @copydoc dict.iteritems
+        '''
+        self._touch()
+        return super(AttrDict, self).iteritems()
+    # end def iteritems
+
+    def values(self):
+        '''
+        @copydoc dict.values
+        '''
+        self._touch()
+        return super(AttrDict, self).values()
+    # end def values
+
+    def get(self, key, default = None):
+        '''
+        @copydoc dict.get
+        '''
+        return self[key] if key in self else default
+    # end def get
+
+    def trace(self, reads):
+        '''
+        Record the paths of the values read
+
+        @param reads [in] (set, None) recorded paths (None: stop tracing)
+        '''
+        object.__setattr__(self, '_reads', reads)
+    # end def trace
+
+    def digest(self, paths):
+        '''
+        Compute the fingerprint of some values
+
+        @param paths [in] (set) paths, as recorded by trace
+
+        @return (str) hex digest
+        '''
+        values = dict()
+
+        for path in paths:
+            value = self
+            for key in path:
+                value = dict.get(value, key) if isinstance(value, dict) else None
+            # end for
+            values['.'.join(path)] = value
+        # end for
+
+        return sha256(dumps(values, sort_keys = True)).hexdigest()
+    # end def digest
+
 # end class AttrDict
 
 
@@ -256,6 +364,8 @@ class Config(AttrDict):
                   'excluded': excluded,
                   'options' : [],
                   'external': [],
+                  # annotation extractor: "external" (tools.read_annot) or "native"
+                  'extractor': 'external',
                   },
 
               'SLP05': {
@@ -876,11 +986,14 @@ class Config(AttrDict):
     "SLP04": {
       "excluded": %(EXCLUDED)s,
       "options" : %(OPTIONS)s,
-      "external": %(EXTERNAL)s
+      "external": %(EXTERNAL)s,
+      // "external" (tools.read_annot) or "native" (in process)
+      "extractor": %(EXTRACTOR)s
     },
-''' % {'EXCLUDED': self._item2json(self.src2src.SLP04.excluded),
-       'OPTIONS' : self._item2json(self.src2src.SLP04.options,  sort = True),
-       'EXTERNAL': self._item2json(self.src2src.SLP04.external, sort = True),
+''' % {'EXCLUDED' : self._item2json(self.src2src.SLP04.excluded),
+       'OPTIONS'  : self._item2json(self.src2src.SLP04.options,  sort = True),
+       'EXTERNAL' : self._item2json(self.src2src.SLP04.external, sort = True),
+       'EXTRACTOR': self._item2json(self.src2src.SLP04.extractor),
        })
 
         lines.append('''\
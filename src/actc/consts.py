@@ -54,6 +54,9 @@ APP_VERSION = '2.8.0'
 ##@{
 CFG_NAME      = 'aspire.json'
 CFG_JOBS      = cpu_count()
+CFG_CACHE_MB  = 1024
+CFG_BACKEND   = 'json'
+CFG_LINK      = 'auto'
 ##@}
 
 # ------------------------------------------------------------------------------
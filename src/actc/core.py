@@ -39,7 +39,6 @@
 # ------------------------------------------------------------------------------
 from glob                       import glob
 from glob                       import iglob
-from os                         import stat
 from os                         import getcwd
 from os                         import listdir
 from os                         import symlink
@@ -62,10 +61,13 @@ import hashlib
 from doit.action                import CmdAction
 from doit.tools                 import LongRunning
 from doit.tools                 import check_timestamp_unchanged
+from doit.tools                 import config_changed
 
 from actc.config                import Config
 from actc.consts                import CFG_JOBS
 from actc.dodo                  import AbstractDodo
+from actc.dodo                  import barrier
+from actc.dodo                  import deferred
 from actc.dodo                  import monoprocess
 
 from actc.tools                 import toList
@@ -75,6 +77,8 @@ from actc.tools.annotation      import filterAnnotations
 from actc.tools.annotation      import AnnotationPatcher
 from actc.tools.annotation      import AnnotationRewriter
 from actc.tools.annotation      import updateFolders
+from actc.tools.annotation      import NativeAnnotationExtractor
+from actc.tools.annotation      import Unannotated
 from actc.tools.codesurfer      import CodeSurferInitializer
 
 
@@ -139,6 +143,10 @@ class Actc(AbstractDodo):
         self._json   = abspath(path)
         self._config = Config(path)
 
+        # Configuration values read outside of the task generators
+        self._configReads = set()
+        self._config.trace(self._configReads)
+
         # .../aspire.json --> build/*
         # .../<module>.json --> build/<module>/*
         self._module = basename(path).split('.', 1)[0]
@@ -146,6 +154,9 @@ class Actc(AbstractDodo):
 
         super(Actc, self).__init__(output = output, debug = debug, verbose = verbose)
 
+        # build/.prebuilt: objects shared by the modules and the builds
+        self._prebuilt = abspath(join('build', '.prebuilt'))
+
         if aid is None:
             # Get the hardware address as a 48-bit positive integer.
             mac = getnode()
@@ -304,22 +315,57 @@ class Actc(AbstractDodo):
         if(self._caching):
             updateFolders(self._folders, self._config.src2src.SLP01.external_annotations, self._annotations_list)
 
+        # Files read by the constructor (see actc.daemon)
+        self._inputs = [self._json]
+        if (self._caching):
+            self._inputs.append(abspath(self._config.src2src.SLP01.external_annotations))
+        # end if
     # end def __init__
 
+    # Configurations built by self (see actc.batch.Batch)
+    modules = property(lambda self: [self])
+
+    # Files read by the constructor
+    inputs  = property(lambda self: self._inputs)
 
-    def build(self, jobs = CFG_JOBS):
+
+    def build(self, jobs = CFG_JOBS, pipeline = False, trace = None):
         '''
         @copydoc actc.dodo.AbstractDodo.build
         '''
-        # Force to rebuild after configuration file update
-        if (isfile(self._dep_file)):
-            if (stat(self._config.path).st_mtime > stat(self._dep_file).st_mtime):
-                self._doIt('forget')
+        # A configuration file update only rebuilds the tasks depending on
+        # the updated values (see _generate)
+        super(Actc, self).build(jobs = jobs, pipeline = pipeline, trace = trace)
+    # end def build
+
+    def _generate(self, name, method):
+        '''
+        @copydoc actc.dodo.AbstractDodo._generate
+
+        Each task is up-to-date while the configuration values read by its
+        generator are unchanged.
+        '''
+        reads = set()
+
+        self._config.trace(reads)
+        try:
+            tasks = super(Actc, self)._generate(name, method)
+        finally:
+            self._config.trace(self._configReads)
+        # end try
+
+        digest = self._config.digest(reads | self._configReads)
+
+        for task in tasks:
+
+            # Tasks without dependencies are always executed
+            if (task.file_dep or task.uptodate):
+                task.update_deps({'uptodate': [config_changed(digest)]})
             # end if
-        # end if
+        # end for
 
-        super(Actc, self).build(jobs = jobs)
-    # end def build
+        return tasks
+    # end def _generate
 
     # pylint:disable=W0212
 
@@ -358,11 +404,13 @@ class Actc(AbstractDodo):
 
         dst = join(self._output, output_folder)
 
-        tool = Copier(outputs = (dst, ''))
+        # Patched in place (see task_SLP01_patch)
+        tool = Copier(outputs = (dst, ''), inplace = True)
         yield tool.tasks(src)
     # end def task_SLP01
 
     # ==========================================================================
+    @barrier
     def task_SLP01_patch(self):
         '''
         SC02 --> Replace security requirement annotations  with unique ID placeholders using an ADSS patch file --> SC02
@@ -429,6 +477,7 @@ class Actc(AbstractDodo):
     # end def task_SPLIT_C
 
     # ==========================================================================
+    @barrier
     def task_PUBLIC_CPP_WBC_RENEWABILITY(self):
         '''
         SC012 --> check cpp files containing '_Pragma("ASPIRE begin protection(publicwbc,renewable)")'
@@ -641,10 +690,12 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = [join(dst, '*.h'),
+                   join(dst, '*.c')]
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP03'],
                         keep_placeholders=False,  # TXL based tools do not support multiple protections in a single annotation
                         replace_all=False,
@@ -702,6 +753,7 @@ class Actc(AbstractDodo):
     # end def task_SLP03_01_EXTRACT
 
     # ==========================================================================
+    @barrier
     def task_SLP03_01_XML(self):
         '''
         SLC03.01 --> XML generation from annotated files --> SLC03.02
@@ -741,6 +793,7 @@ class Actc(AbstractDodo):
     # end def task_SLP03_01_XML
 
     # ==========================================================================
+    @deferred
     def task_SLP03_01_PREPROCESS(self):
         '''
         SLC03.01 --> Preprocess not annotated files --> SC04
@@ -839,6 +892,7 @@ class Actc(AbstractDodo):
     # end def task_SLP03_02_LICENSE
 
     # ==========================================================================
+    @barrier
     def task_SLP03_02_WHITEBOX(self):
         '''
         SLC03.02 --> WBC tool --> SC04.01
@@ -901,6 +955,7 @@ class Actc(AbstractDodo):
     # end def task_SLP03_02_WHITEBOX
 
     # ==========================================================================
+    @deferred
     def task_SLP03_02_PREPROCESS(self):
         '''
         SC03.02 --> Preprocess not included files --> SC04
@@ -968,6 +1023,7 @@ class Actc(AbstractDodo):
     # end def task_SLP03_03
 
     # ==========================================================================
+    @barrier
     def task_SLP03_03_HEADER(self):
         '''
         SC03 + SC04.01 --> Header inclusion tool --> SC04.02
@@ -1002,6 +1058,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_SLP03_03_MERGE(self):
         '''
         SC04.01 \
@@ -1096,7 +1153,8 @@ class Actc(AbstractDodo):
                                     + self._config.src2bin.PREPROCESS.options
                                     + ['-I', join(self._output, include_folder),
                                        '-D', 'ASPIRE_AID=%s' % (self._aid,)],
-                            outputs = (dst, '.i'))
+                            outputs = (dst, '.i'),
+                            store   = join(self._output, '.preprocessed'))
 
         yield tool.tasks(src,
                          header_files=[join(self._output, input_folder, '*.h'), ])
@@ -1316,7 +1374,8 @@ class Actc(AbstractDodo):
                                     + ['-std=%s' % (c_standard)]
                                     + self._config.src2bin.PREPROCESS.options
                                     + ['-D', 'ASPIRE_AID=%s' % (self._aid,)],
-                            outputs = (dst, '.i'))
+                            outputs = (dst, '.i'),
+                            store   = join(self._output, '.preprocessed'))
 
         yield tool.tasks(src,
                          header_files=[join(self._output, input_folder, '*.h'), ])
@@ -1459,10 +1518,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP05'],
                         keep_placeholders=False,  # TXL based tools do not support multiple protections in a single annotation
                         replace_all=False,
@@ -1530,7 +1590,8 @@ class Actc(AbstractDodo):
                               options = self._config.src2src.SLP05._02.options,
                               outputs = [(path, '.obf') for path in dst])
 
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP05']))
 
         # ----------------------------------------------------------------------
         self._updateDot('SLP05_02_OBFUSCATE', input_folder, output_folder)
@@ -1571,6 +1632,7 @@ class Actc(AbstractDodo):
     # end def task_SLP05_02_COPY
 
     # ==========================================================================
+    @deferred
     def task_SLP05_02_PREPROCESS(self):
         '''
         SC05 --> preprocess generated files --> SC06
@@ -1599,7 +1661,8 @@ class Actc(AbstractDodo):
                                     + self._config.src2bin.PREPROCESS.options
                                     + ['-D', 'ASPIRE_AID=%s' % (self._aid,)]
                                     + ['-x', 'c'],
-                            outputs=(dst, '.i'))
+                            outputs=(dst, '.i'),
+                            store=join(self._output, '.preprocessed'))
 
         yield tool.tasks(src)
 
@@ -1706,10 +1769,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP06'],
                         keep_placeholders=True,
                         replace_all=False,
@@ -1759,6 +1823,7 @@ class Actc(AbstractDodo):
         self._updateDot('SLP06_01_PROCESS', input_folder, output_folder)
     # end def tastk_SLP06_01_PROCESS
 
+    @barrier
     def task_SLP06_02_CHECK(self):
         '''
         Check to continue code splitting
@@ -2012,10 +2077,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, input_folder, '.annotated')
+        dst = join(self._output, input_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP08'],
                         keep_placeholders=True,
                         replace_all=False,
@@ -2052,13 +2118,15 @@ class Actc(AbstractDodo):
                          ['-a', self._aid],
                          outputs = (dst,''))
 
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP08']))
 
         # ----------------------------------------------------------------------
         self._updateDot('task_SLP08_01', input_folder, output_folder)
     # end def task_SLP08_01
 
     # ==========================================================================
+    @deferred
     def task_SLP08_02_PREPROCESS(self):
         '''
         SC08 --> preprocess generated c files --> SC08
@@ -2190,10 +2258,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP09'],
                         keep_placeholders=True,
                         replace_all=False,
@@ -2231,7 +2300,8 @@ class Actc(AbstractDodo):
                                     #+ ['-a', self._aid],
                             outputs = (dst, ''))
 
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP09']))
 
         # ----------------------------------------------------------------------
         self._updateDot('SLP09_01_AC', input_folder, output_folder)
@@ -2369,10 +2439,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP10'],
                         keep_placeholders=True,
                         replace_all=False,
@@ -2408,7 +2479,8 @@ class Actc(AbstractDodo):
                             options=self._config.src2src.SLP10.options,
                             outputs=(dst, ''))
 
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP10']))
 
         # ----------------------------------------------------------------------
         self._updateDot('SLP10_01_REACTIONUNIT', input_folder, output_folder)
@@ -2549,10 +2621,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP11'],
                         keep_placeholders=True,
                         replace_all=False,
@@ -2589,7 +2662,8 @@ class Actc(AbstractDodo):
                                         options=self._config.src2src.SLP11.options,
                                         outputs=(dst, ''))
 
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP11']))
 
         # ----------------------------------------------------------------------
         self._updateDot('SLP11', input_folder, output_folder)
@@ -2669,6 +2743,7 @@ class Actc(AbstractDodo):
     # end def task_SLP11_03_COPY
 
     # ==========================================================================
+    @barrier
     def task_SLP11_04_GENKEY(self):
         '''
         Generate key (perso data) for DCL protection
@@ -2810,10 +2885,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                          filter=self._annotations_list['SLP12'],
                          keep_placeholders=True,
                          replace_all=False,
@@ -2855,7 +2931,8 @@ class Actc(AbstractDodo):
                                     + ['-a', '%s' % (self._aid)]
                                     + ['-rv', '%s' % (dst_be)],
                                   outputs=[(dst, ''), (dst_be, '')])
-        yield tool.tasks(src)
+        # Files without annotation of the stage: linked as is
+        yield tool.tasks(src, skip = Unannotated(self._annotations_list['SLP12']))
 
         # ----------------------------------------------------------------------
         self._updateDot('SLP12_01_CFT', input_folder, output_folder)
@@ -2875,6 +2952,7 @@ class Actc(AbstractDodo):
     # end task_SLP12_01_CFT
 
     # ==========================================================================
+    @deferred
     def task_SLP12_02_PREPROCESS(self):
         '''
         preprocess cft sources --> SC12
@@ -3024,10 +3102,11 @@ class Actc(AbstractDodo):
         # Get source code
         # ----------------------------------------------------------------------
         src = external_annotations
-        dst = join(self._output, output_folder, '.annotated')
+        dst = join(self._output, output_folder)
+        sources = join(dst, '*.i')
 
         tool = AnnotationRewriter(outputs=(dst, ''))
-        yield tool.tasks(src,
+        yield tool.tasks(src, sources,
                         filter=self._annotations_list['SLP07']
                                 + self._annotations_list['BLP04'],
                         keep_placeholders=True,
@@ -3061,9 +3140,13 @@ class Actc(AbstractDodo):
 
         dst = join(self._output, output_folder)
 
-        tool = AnnotationExtractor(program = self._config.tools.read_annot,
-                                   options = self._config.src2src.SLP04.options,
-                                   outputs = (dst, '.json'))
+        if (self._config.src2src.SLP04.extractor == 'native'):
+            tool = NativeAnnotationExtractor(outputs = (dst, '.json'))
+        else:
+            tool = AnnotationExtractor(program = self._config.tools.read_annot,
+                                       options = self._config.src2src.SLP04.options,
+                                       outputs = (dst, '.json'))
+        # end if
 
         yield tool.tasks(src)
 
@@ -3170,6 +3253,7 @@ class Actc(AbstractDodo):
     # end def task_SLP07_RA
 
     # ==========================================================================
+    @barrier
     def task_SLP04_PARSE(self):
         '''
         D01/annotations.json -> self._binary_annotations
@@ -3431,11 +3515,16 @@ class Actc(AbstractDodo):
                                     '-lz',
                                     '-fPIC']
 
-        tool = Compiler(program = frontends[self._config.platform],
-                        options = tool_options,
-                        outputs = (dst, '.o'))
+        # Objects shared by the modules and the builds: only compiled again
+        # for another frontend, endpoint, application id or ACCL sources
+        tool = Compiler(program  = frontends[self._config.platform],
+                        options  = tool_options,
+                        outputs  = (dst, '.o'),
+                        prebuilt = join(self._prebuilt, 'accl'))
 
-        yield tool.tasks(src)
+        yield tool.tasks(src,
+                         header_files = [join(self._config.tools.accl, 'src', '*.h'),
+                                         join(self.accl_headers, '*.h')])
 
         # ----------------------------------------------------------------------
         self._updateDot('COMPILE_ACCL', join(self._config.tools.accl, 'src'), output_folder)
@@ -3543,6 +3632,7 @@ class Actc(AbstractDodo):
     # end def task_BLP00_VANILLA_METRICS
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P10_SP(self):
         '''
         Server side management - code splitting (early deploy for self-profiling code)
@@ -3634,6 +3724,7 @@ class Actc(AbstractDodo):
         self._updateDot('task_BLP00_01', [input_folder, object_folder, annotations_folder], output_folder)
     # end def def task_BLP00_01_SP:
 
+    @barrier
     def task_BLP00_02_SP(self):
         '''
         BC02_SP --> collect runtime profile on target board --> BC02_SP/profiles
@@ -3773,6 +3864,7 @@ class Actc(AbstractDodo):
     # end def task_BLP01
 
     # ==========================================================================
+    @barrier
     def task_BLP01_EXTRACT(self):
         '''
         BC08 + BC02 + D01 --> extractor --> BLC02
@@ -3836,6 +3928,7 @@ class Actc(AbstractDodo):
     # end def task_BLP02
 
     # ==========================================================================
+    @barrier
     def task_BLP02_XTRANSLATE(self):
         '''
         BLC02 --> x-translator --> BC03
@@ -3912,6 +4005,7 @@ class Actc(AbstractDodo):
     # end def task_BLP02_COMPILE
 
         # ==========================================================================
+    @barrier
     def task_BLP02_COMPILE_VM(self):
         '''
         BC03/out_gen_vm --> compile VM --> BC03/out_gen_vm/out
@@ -4014,6 +4108,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_BLP03_LINK(self):                                                  # pylint:disable=R0912
         '''
         BC03 + BC08 + D01 --> linker --> BC04
@@ -4222,6 +4317,7 @@ class Actc(AbstractDodo):
     # end def task_BLP03_LINK
 
     # ==========================================================================
+    @barrier
     def task_BLP03_migrate_profile(self):
         # runtime profiles
         profile_folder = self._folders['BLP00']['out_sp'] + self._folders['BLP00']['suffix']  # BC02_SP
@@ -4261,6 +4357,7 @@ class Actc(AbstractDodo):
     # end def task_BLP04
 
     # ==========================================================================
+    @barrier
     def task_BLP04_OBFUSCATE(self):
         '''
         BC04 + D01 (+ BC08 + BC03 + BLC02 (+ BC02_SP/profiles)) --> obfuscation --> BC05
@@ -4380,6 +4477,7 @@ class Actc(AbstractDodo):
     # end def task_BLP04_DYN
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P20_SP(self):
         '''
         Server side management - code mobility (early deploy for self-profiling code)
@@ -4426,6 +4524,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P80_SP(self):
         '''
         Server side management - remote attestation (early deploy for self-profiling code)
@@ -4473,6 +4572,7 @@ class Actc(AbstractDodo):
     # end def task_SERVER_P80_SP
 
     # ==========================================================================
+    @barrier
     def task_BLP04_DYN_01(self):
         '''
         BC05 --> collect runtime profile on target board --> BC05/profiles
@@ -4521,6 +4621,7 @@ class Actc(AbstractDodo):
     # end def _task_BLP04_DYN_01
 
     # ==========================================================================
+    @barrier
     def task_BLP04_DYN_02(self):
         '''
         BC04 + BC05/profiles + D01 (+ BC08 + BC03 + BLC02 --> recompile using execution profile and calculate dynamic metrics--> BC05_DYN
@@ -4618,6 +4719,7 @@ class Actc(AbstractDodo):
     #end def task_CREATE_SYMLINKS
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P10(self):
         '''
         Server side management - code splitting
@@ -4660,6 +4762,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P20(self):
         '''
         Server side management - code mobility
@@ -4703,6 +4806,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_SERVER_P80(self):
         '''
         Server side management - remote attestation
@@ -4818,6 +4922,7 @@ class Actc(AbstractDodo):
     # end def task_SERVER_P80
 
     # ==========================================================================
+    @barrier
     def task_POST(self):
         '''
         Post processing
@@ -4850,6 +4955,7 @@ class Actc(AbstractDodo):
 
 
     # ==========================================================================
+    @barrier
     def task_M01_COLLECT(self):
         '''
         Gather static metrics
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.daemon
+
+@brief   Resident build daemon
+
+The daemon keeps the toolchain imported, the configurations loaded (AID,
+sorted task generators) and the json dependency files loaded (see
+actc.backend.JsonDB). Each request is served by a forked process,
+inheriting this state, its output being sent to the client (see
+actc.client).
+
+A configuration is loaded again when one of the files read by its
+constructor (configuration, external annotations) changes. The sources
+are not watched: their changes are found by the DoIt file_dep checks of
+the build. The folder listings of a build (see actc.tools.listFolder) are
+sent back to the daemon and reused by the next builds while the folder
+time stamps are unchanged.
+
+@author  Ronan Le Gallic
+
+@date    2014/10/06
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from SocketServer               import StreamRequestHandler
+from SocketServer               import UnixStreamServer
+from cStringIO                  import StringIO
+from json                       import loads
+from marshal                    import dump
+from marshal                    import load
+from os                         import _exit
+from os                         import chdir
+from os                         import close
+from os                         import dup2
+from os                         import fork
+from os                         import pipe
+from os                         import read
+from os                         import remove
+from os                         import waitpid
+from os                         import WEXITSTATUS
+from os                         import WIFEXITED
+from os.path                    import abspath
+from os.path                    import dirname
+from os.path                    import exists
+from os.path                    import join
+from tempfile                   import mkstemp
+import sys
+
+from actc.backend               import BACKENDS
+from actc.backend               import JsonDB
+from actc.backend               import fileState
+from actc.batch                 import Batch
+from actc.client                import OUTPUT
+from actc.client                import STATUS
+from actc.client                import frame
+from actc.consts                import CFG_NAME
+from actc.core                  import Actc
+from actc.tools                 import _LISTINGS
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class Daemon(object):
+    '''
+    Serve build/clean requests on a UNIX socket
+    '''
+
+    def __init__(self, path):
+        '''
+        Constructor
+
+        @param path [in] (str) socket
+        '''
+        self._path  = abspath(path)
+        self._cwd   = None
+        self._dodos = dict()
+    # end def __init__
+
+    def serve(self):
+        '''
+        Serve requests, one at a time, until interrupted
+        '''
+        if exists(self._path):
+            remove(self._path)
+        # end if
+
+        daemon = self
+
+        class Handler(StreamRequestHandler):
+            '''
+            Request handler
+            '''
+
+            def handle(self):
+                '''
+                @copydoc SocketServer.BaseRequestHandler.handle
+                '''
+                daemon._handle(self.connection, loads(self.rfile.readline()))
+            # end def handle
+
+        # end class Handler
+
+        server = UnixStreamServer(self._path, Handler)
+
+        print('=== ACTC daemon listening on %s ===' % (self._path,))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            remove(self._path)
+        # end try
+    # end def serve
+
+    def _actc(self, cwd, path, args):
+        '''
+        Get a loaded configuration, reloaded when updated
+
+        @param cwd  [in] (str)       working directory of the client
+        @param path [in] (str)       configuration file
+        @param args [in] (Namespace) command line arguments
+
+        @return (Actc)
+        '''
+        path = join(cwd, path)
+        key  = (path, args.aidfixed, args.debug, args.verbose)
+
+        if (   (key not in self._dodos)
+            or (self._dodos[key][0] != self._state(self._dodos[key][1]))):
+
+            # Configuration loading changes the working directory
+            chdir(cwd)
+            actc = Actc(path,
+                        debug   = args.debug,
+                        verbose = args.verbose,
+                        aid     = args.aidfixed)
+            self._dodos[key] = (self._state(actc), actc)
+        # end if
+
+        return self._dodos[key][1]
+    # end def _actc
+
+    @staticmethod
+    def _state(actc):
+        '''
+        Get the state of the files read by a configuration constructor
+
+        @param actc [in] (Actc) configuration
+
+        @return (list) file states
+        '''
+        return [fileState(path) for path in actc.inputs]
+    # end def _state
+
+    def _dodo(self, request):
+        '''
+        Get the loaded configurations of a request
+
+        @param request [in] (dict) cwd, argv
+
+        @return (tuple) parser, args, dodo (Actc, Batch)
+        '''
+        # Late import: actc.cli depends on this module
+        from actc.cli import Main
+
+        parser  = Main.parser()
+        args    = parser.parse_args(request['argv'])
+        args.file = args.file or [CFG_NAME]
+        modules = [self._actc(request['cwd'], path, args) for path in args.file]
+
+        # Working path is config path
+        chdir(dirname(modules[0]._json))
+
+        if (len(modules) > 1):
+            return parser, args, Batch(modules, debug = args.debug, verbose = args.verbose)
+        # end if
+
+        return parser, args, modules[0]
+    # end def _dodo
+
+    def _handle(self, connection, request):
+        '''
+        Serve a request
+
+        @param connection [in] (socket) to the client
+        @param request    [in] (dict)   cwd, argv
+        '''
+        # Load (or reload) the configurations, errors (and help) being reported
+        # by the child
+        stdout, stderr         = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            self._dodo(request)
+        except (SystemExit, Exception):                                     # pylint:disable=W0703
+            pass
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+        # end try
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        # Output of the child, sent in frames, then its folder listings
+        output, sink = pipe()
+        fd, listings = mkstemp(prefix = '.actc', suffix = '.listings')
+        close(fd)
+
+        pid = fork()
+
+        if (pid == 0):
+            # Child: output to the client
+            close(output)
+            dup2(sink, 1)
+            dup2(sink, 2)
+            close(sink)
+
+            status = 1
+            try:
+                from actc.cli import Main
+
+                Main.run(*self._dodo(request))
+                status = 0
+            except SystemExit as err:
+                status = err.code if isinstance(err.code, int) else 1
+            except Exception as err:                                        # pylint:disable=W0703
+                sys.stderr.write('actc.py: error: %s\n' % (err,))
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                try:
+                    with open(listings, 'wb') as fo:
+                        dump(_LISTINGS, fo)
+                    # end with
+                finally:
+                    _exit(status)
+                # end try
+            # end try
+        # end if
+
+        close(sink)
+
+        while True:
+            chunk = read(output, 1 << 16)
+
+            if (not chunk):
+                break
+            # end if
+
+            connection.sendall(frame(OUTPUT, chunk))
+        # end while
+        close(output)
+
+        _, code = waitpid(pid, 0)
+
+        connection.sendall(frame(STATUS, str(WEXITSTATUS(code) if WIFEXITED(code) else 1)))
+
+        # Folder listings of the child, reused by the next requests
+        try:
+            with open(listings, 'rb') as fi:
+                _LISTINGS.update(load(fi))
+            # end with
+        except (EOFError, ValueError, TypeError):
+            # Child interrupted
+            pass
+        finally:
+            remove(listings)
+        # end try
+
+        # Dependency files written by the child, loaded for the next request
+        for folder in set(dirname(actc._json) for _, actc in self._dodos.values()):
+            try:
+                JsonDB.preload(join(folder, BACKENDS['json'][1]))
+            except Exception:                                               # pylint:disable=W0703
+                # Reported by the next request
+                pass
+            # end try
+        # end for
+    # end def _handle
+
+# end class Daemon
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -37,19 +37,46 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from inspect                    import getmembers
-from inspect                    import ismethod
-from inspect                    import getsourcelines
+from functools                  import partial
+from json                       import dump
+from os                         import getcwd
+from os                         import getpid
+from os                         import wait4
+from os                         import WEXITSTATUS
+from os                         import WIFSIGNALED
+from os                         import WTERMSIG
 from os.path                    import abspath
+from resource                   import getrusage
+from resource                   import RUSAGE_CHILDREN
+from resource                   import RUSAGE_SELF
 from shutil                     import rmtree
+from subprocess                 import PIPE
+from subprocess                 import Popen
+from threading                  import Thread
+from time                       import time
+import re
 
 from doit.action                import CmdAction
-from doit.cmd_base              import ModuleTaskLoader
+from doit.exceptions            import TaskError
+from doit.exceptions            import TaskFailed
+from doit.cmd_base              import TaskLoader
 from doit.doit_cmd              import DoitMain
+from doit.loader                import generate_tasks
+from doit.task                  import DelayedLoader
+from doit.task                  import Task
 from doit.reporter              import ExecutedOnlyReporter
 from doit.tools                 import create_folder
+from six                        import StringIO
 
+from actc.backend               import BACKENDS
+from actc.backend               import PLUGINS
+from actc.consts                import CFG_BACKEND
 from actc.consts                import CFG_JOBS
+from actc.tools.cache           import getCache
+from actc.tools                 import clearPlannedTargets
+from actc.tools                 import planTargets
+from actc.tools                 import plannedBy
+from actc.tools                 import rewrites
 
 import sys
 
@@ -91,6 +118,347 @@ class DebugReporter(ExecutedOnlyReporter):
 # end class DebugReporter
 
 
+class ProbedCmdAction(CmdAction):
+    '''
+    "cmd-action" recording the resource usage of its command (wait4) in the
+    usage of its task (see _probeBegin)
+
+    The class of an action is derived from its own one and from this class
+    (see _probed): the execution of the command is the one of doit, its
+    process being reaped with wait4 before the usual wait.
+    '''
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        try:
+            action = self.expand_action()
+        except Exception as exc:                                                # pylint:disable=W0703
+            return TaskError('CmdAction Error creating command string', exc)
+        # end try
+
+        process = Popen(action,
+                        shell  = self.shell,
+                        stdout = PIPE,
+                        stderr = PIPE,
+                        **self.pkwargs)
+
+        output  = StringIO()
+        errput  = StringIO()
+        readers = [Thread(target = self._print_process_output,
+                          args   = (process, process.stdout, output, out)),
+                   Thread(target = self._print_process_output,
+                          args   = (process, process.stderr, errput, err))]
+        for reader in readers:
+            reader.start()
+        # end for
+        for reader in readers:
+            reader.join()
+        # end for
+
+        self.out    = output.getvalue()
+        self.err    = errput.getvalue()
+        self.result = self.out + self.err
+
+        # Reaped here: the wait of the process only reads its status
+        _, status, rusage  = wait4(process.pid, 0)
+        process.returncode = -WTERMSIG(status) if WIFSIGNALED(status) else WEXITSTATUS(status)
+
+        usage = getattr(self.task, 'usage', None)
+        if (usage is not None):
+            usage['maxrss']     = max(usage['maxrss'], rusage.ru_maxrss)
+            usage['processes'] += 1
+        # end if
+
+        if (process.returncode > 125):
+            return TaskError("Command error: '%s' returned %s" % (action, process.returncode))
+        # end if
+
+        if (process.returncode != 0):
+            return TaskFailed("Command failed: '%s' returned %s" % (action, process.returncode))
+        # end if
+
+        if self.save_out:
+            self.values[self.save_out] = self.out
+        # end if
+    # end def execute
+
+# end class ProbedCmdAction
+
+
+# Probed classes by action class
+_PROBED = dict()
+
+def _probed(action):
+    '''
+    Make an action record the resource usage of its command
+
+    The class of a "cmd-action" (e.g. CachedCmdAction) is replaced by a class
+    derived from it and from ProbedCmdAction: its own execute still runs
+    first (e.g. restoring from the cache), then the command is probed.
+
+    @param action [in] (BaseAction, str, list, tuple) action of a probed task
+
+    @return (BaseAction, tuple) action
+    '''
+    # Command (see doit.action.create_action)
+    if isinstance(action, basestring):
+        return ProbedCmdAction(action, shell = True)
+    # end if
+
+    if isinstance(action, list):
+        return ProbedCmdAction(action, shell = False)
+    # end if
+
+    cls = type(action)
+
+    if (    isinstance(action, CmdAction)
+        and not isinstance(action, ProbedCmdAction)):
+        if (cls is CmdAction):
+            _PROBED[cls] = ProbedCmdAction
+        elif (cls not in _PROBED):
+            _PROBED[cls] = type('Probed' + cls.__name__, (cls, ProbedCmdAction), dict())
+        # end if
+
+        action.__class__ = _PROBED[cls]
+    # end if
+
+    return action
+# end def _probed
+
+
+def _probeBegin(task):
+    '''
+    Record the resource usage of the worker before a task
+
+    The commands of the task (see ProbedCmdAction) add their peak RSS to its
+    usage.
+
+    @param task [in] (Task) being executed
+    '''
+    children = getrusage(RUSAGE_CHILDREN)
+    worker   = getrusage(RUSAGE_SELF)
+
+    task.usage = {'pid'      : getpid(),
+                  'begin'    : time(),
+                  'maxrss'   : 0,
+                  'processes': 0,
+                  'before'   : (children.ru_utime, children.ru_stime,
+                                worker.ru_utime + worker.ru_stime)}
+# end def _probeBegin
+
+
+def _probeEnd(task):
+    '''
+    Record the resource usage of the worker after a task
+
+    The usage dictionary is an attribute of the task: in multiprocess mode it
+    is sent back to the master with the other task values.
+
+    @param task [in] (Task) being executed
+    '''
+    children = getrusage(RUSAGE_CHILDREN)
+    worker   = getrusage(RUSAGE_SELF)
+    usage    = task.usage
+    before   = usage.pop('before')
+
+    usage.update({'end'   : time(),
+                  'utime' : children.ru_utime - before[0],
+                  'stime' : children.ru_stime - before[1],
+                  'python': worker.ru_utime + worker.ru_stime - before[2]})
+# end def _probeEnd
+
+
+# Failure of a command (see doit.action.CmdAction.execute)
+_RE_RETURNED = re.compile(r"' returned (-?\d+)$")
+
+def _exitStatus(exception):
+    '''
+    Get the exit status of a failed task
+
+    @param exception [in] (CatchedException) failure
+
+    @return (int) command exit status, None: not a command failure
+    '''
+    mo = _RE_RETURNED.search(exception.message) if exception else None
+
+    return int(mo.group(1)) if mo else None
+# end def _exitStatus
+
+
+class Tracer(object):
+    '''
+    Collect the executed tasks as Chrome trace events (chrome://tracing)
+
+    Each task is a complete event ("ph": "X") in the timeline of the worker
+    (tid) that executed it, with its status, the exit status of its failed
+    command, the CPU time of its commands and the largest peak RSS of its
+    commands (see ProbedCmdAction).
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self._origin = time()
+        self._starts = dict()
+        self._events = list()
+    # end def __init__
+
+    def start(self, task):
+        '''
+        Start a task
+
+        @param task [in] (Task) being executed
+        '''
+        self._starts[task.name] = time()
+    # end def start
+
+    def end(self, task, status, exception = None):
+        '''
+        End a task
+
+        @param  task      [in] (Task)             executed
+        @param  status    [in] (str)              success, failure
+        @option exception [in] (CatchedException) failure
+        '''
+        end   = time()
+        begin = self._starts.pop(task.name, end)
+        usage = getattr(task, 'usage', None) or dict()
+
+        # Prefer the times measured by the worker
+        if ('end' in usage):
+            begin = usage['begin']
+            end   = usage['end']
+        # end if
+
+        self._events.append({'name': task.name,
+                             'cat' : task.name.split(':')[0].split('.')[-1],
+                             'ph'  : 'X',
+                             'ts'  : int((begin - self._origin) * 1e6),
+                             'dur' : int((end - begin) * 1e6),
+                             'pid' : 1,
+                             'tid' : usage.get('pid', getpid()),
+                             'args': {'status'   : status,
+                                      'exit'     : 0 if (status == 'success') else _exitStatus(exception),
+                                      'utime'    : usage.get('utime', 0.0),
+                                      'stime'    : usage.get('stime', 0.0),
+                                      'python'   : usage.get('python', 0.0),
+                                      'maxrss'   : usage.get('maxrss', 0),
+                                      'processes': usage.get('processes', 0)}})
+    # end def end
+
+    def summary(self):
+        '''
+        Per stage summary
+
+        The busy time is the sum of the task durations, the wall time the span
+        from the start of the first task to the end of the last one.
+
+        @return (str) table: tasks, failures, busy time, wall time, CPU time, peak RSS
+        '''
+        stages = dict()
+        for event in self._events:
+            stage = stages.setdefault(event['cat'], [0, 0, 0, 0.0, 0, event['ts'], 0])
+            args  = event['args']
+            stage[0] += 1
+            stage[1] += args['status'] != 'success'
+            stage[2] += event['dur']
+            stage[3] += args['utime'] + args['stime'] + args['python']
+            stage[4]  = max(stage[4], args['maxrss'])
+            stage[5]  = min(stage[5], event['ts'])
+            stage[6]  = max(stage[6], event['ts'] + event['dur'])
+        # end for
+
+        lines = ['%-32s %6s %6s %10s %10s %10s %10s' % ('stage', 'tasks', 'failed',
+                                                        'busy (s)', 'wall (s)', 'cpu (s)',
+                                                        'rss (MB)')]
+        for name, stage in sorted(stages.iteritems(),
+                                  key = lambda item: -item[1][2]):
+            lines.append('%-32s %6d %6d %10.2f %10.2f %10.2f %10.1f'
+                         % (name, stage[0], stage[1], stage[2] / 1e6,
+                            (stage[6] - stage[5]) / 1e6, stage[3], stage[4] / 1024.0))
+        # end for
+
+        return '\n'.join(lines) + '\n'
+    # end def summary
+
+    def dump(self, path):
+        '''
+        Write the trace (JSON) and its summary (path.txt)
+
+        @param path [in] (str) trace file
+
+        @return (str) summary
+        '''
+        with open(path, 'w') as trace:
+            dump({'traceEvents'    : self._events,
+                  'displayTimeUnit': 'ms'}, trace)
+        # end with
+
+        summary = self.summary()
+        with open(path + '.txt', 'w') as table:
+            table.write(summary)
+        # end with
+
+        return summary
+    # end def dump
+
+# end class Tracer
+
+
+class TraceReporter(object):
+    '''
+    Reporter mixin recording the executed tasks in a Tracer
+
+    Hidden tasks (folder creation) and groups (without action) are skipped.
+    '''
+    tracer = None
+
+    @staticmethod
+    def _traced(task):
+        '''
+        @param task [in] (Task) task to report
+
+        @return (bool) task recorded
+        '''
+        return bool(task._actions) and (task.name[0] != '_')
+    # end def _traced
+
+    def execute_task(self, task):
+        '''
+        @copydoc doit.reporter.ConsoleReporter.execute_task
+        '''
+        if (self._traced(task)):
+            self.tracer.start(task)
+        # end if
+        super(TraceReporter, self).execute_task(task)
+    # end def execute_task
+
+    def add_success(self, task):
+        '''
+        @copydoc doit.reporter.ConsoleReporter.add_success
+        '''
+        if (self._traced(task)):
+            self.tracer.end(task, 'success')
+        # end if
+        super(TraceReporter, self).add_success(task)
+    # end def add_success
+
+    def add_failure(self, task, exception):
+        '''
+        @copydoc doit.reporter.ConsoleReporter.add_failure
+        '''
+        if (self._traced(task)):
+            self.tracer.end(task, 'failure', exception)
+        # end if
+        super(TraceReporter, self).add_failure(task, exception)
+    # end def add_failure
+
+# end class TraceReporter
+
+
 def monoprocess(task):
     '''
     Decorator to force monoprocess execution
@@ -104,6 +472,173 @@ def monoprocess(task):
 # end def monoprocess
 
 
+def barrier(task):
+    '''
+    Decorator to isolate a task in pipeline mode
+
+    A task must be isolated when its generation depends on the outputs of the
+    previous tasks (files read at generation time) or when it rewrites its
+    inputs in place.
+
+    @param task [in] (func) to decorate
+
+    @return (func)
+    '''
+    task.barrier = True
+    return task
+# end def barrier
+
+
+def deferred(task):
+    '''
+    Decorator to generate a task lazily in pipeline mode
+
+    The generation of a deferred task reads files not declared as targets
+    (e.g. the files written by a tool): the task is generated, with the next
+    ones, once the previous tasks are executed. Unlike a barrier, the next
+    tasks consume its files as soon as they are produced.
+
+    @param task [in] (func) to decorate
+
+    @return (func)
+    '''
+    task.deferred = True
+    return task
+# end def deferred
+
+
+class OrderedTaskLoader(TaskLoader):
+    '''
+    Load tasks from an ordered list of task generators
+
+    In pipeline mode, the targets of each generated task are declared as
+    planned before the next generator is called, so that it can consume
+    files not yet built. The files rewritten in place by a task (see
+    actc.tools.rewrites) are planned by this task: the next tasks reading
+    them wait for it.
+
+    The deferred generators (see deferred) are called by a placeholder task
+    depending on the tasks generated before.
+    '''
+
+    def __init__(self, tasks, config, generate, plan = False, probe = False):
+        '''
+        Constructor
+
+        @param  tasks    [in] (list) (name, generator) in execution order
+        @param  config   [in] (dict) DOIT_CONFIG
+        @param  generate [in] (func) (name, generator) --> list of Task
+        @option plan     [in] (bool) declare planned targets
+        @option probe    [in] (bool) measure the resource usage of each task
+        '''
+        super(OrderedTaskLoader, self).__init__()
+        self._tasks    = tasks
+        self._config   = config
+        self._generate = generate
+        self._plan     = plan
+        self._probe    = probe
+        self._names    = set()
+    # end def __init__
+
+    def load_tasks(self, cmd, opt_values, pos_args):
+        '''
+        @copydoc doit.cmd_base.TaskLoader.load_tasks
+        '''
+        self._names = set()
+
+        return self._load(0), self._config
+    # end def load_tasks
+
+    def _load(self, first):
+        '''
+        Generate the tasks, up to the next deferred generator
+
+        @param first [in] (int) index of the first generator
+
+        @return (list) Task, the last one being the placeholder of the next
+                       deferred generator, if any
+        '''
+        tasks = list()
+
+        clearPlannedTargets()
+
+        for index in range(first, len(self._tasks)):
+            name, method = self._tasks[index]
+
+            if (    self._plan
+                and (index > first)
+                and getattr(method, 'deferred', False)):
+                tasks.append(Task('_deferred_%d' % (index,), None,
+                                  task_dep = [task.name for task in tasks],
+                                  loader   = DelayedLoader(partial(self._deferred, index))))
+                break
+            # end if
+
+            for task in self._generate(name, method):
+
+                # Tasks shared by several generators (e.g. folder creation)
+                if (task.name in self._names):
+                    continue
+                # end if
+
+                self._names.add(task.name)
+                tasks.append(task)
+
+                if (self._plan):
+                    task.task_dep.extend(dep for dep in plannedBy(task.file_dep)
+                                         if  dep not in task.task_dep + [task.name])
+                    planTargets(task.targets, task.name)
+                    planTargets(rewrites(task), task.name)
+                # end if
+
+                if (self._probe and task._actions and (task.name[0] != '_')):
+                    task._actions = [_probed(action) for action in task._actions]
+                    task._actions.insert(0, (_probeBegin,))
+                    task._actions.append((_probeEnd,))
+                # end if
+            # end for
+        # end for
+
+        clearPlannedTargets()
+
+        return tasks
+    # end def _load
+
+    def _deferred(self, index):
+        '''
+        Generate the tasks of a deferred generator and of the next ones,
+        called by DoIt once the previous tasks are executed
+
+        @param index [in] (int) index of the deferred generator
+
+        @return (generator) Task, the placeholder (now depending on the
+                            generated tasks) being the last one
+        '''
+        tasks = self._load(index)
+
+        for task in tasks:
+            yield task
+        # end for
+
+        yield Task('_deferred_%d' % (index,), None,
+                   task_dep = [task.name for task in tasks])
+    # end def _deferred
+
+# end class OrderedTaskLoader
+
+
+def _firstLine(method):
+    '''
+    Line of the definition of a task method
+
+    @param  method [in] (instancemethod) task method
+
+    @return (int)
+    '''
+    return method.im_func.func_code.co_firstlineno
+# end def _firstLine
+
+
 class AbstractDodo(object):
     '''
     DoIt dodo
@@ -115,16 +650,17 @@ class AbstractDodo(object):
         self._output = abspath(output)
         create_folder(self._output)
 
-        self._tasks  = [(name, method)
-                        for name, method in getmembers(self, predicate = ismethod)
-                        if  name.startswith('task_')]
-
-        self._tasks.sort(cmp = lambda x,y: cmp(getsourcelines(x[1])[1],
-                                               getsourcelines(y[1])[1]))
+        # Tasks are run in declaration order: the line number is read from
+        # the code objects, not from the (5,000 lines) source files.
+        self._tasks  = sorted(((name, getattr(self, name))
+                               for name in dir(type(self))
+                               if  name.startswith('task_')),
+                              key = lambda item: _firstLine(item[1]))
 
-        self._dep_file  = '.actc.db'
+        self._backend, self._dep_file = BACKENDS[CFG_BACKEND]
         self._reporter  = DebugReporter if debug else ExecutedOnlyReporter
         self._verbosity = 2 if verbose else 1
+        self._tracer    = None
     # end def __init__
 
     # --------------------------------------------------------------------------
@@ -137,11 +673,88 @@ class AbstractDodo(object):
     # DoIt management
     # --------------------------------------------------------------------------
 
-    def build(self, jobs = CFG_JOBS):
+    def setBackend(self, backend):
+        '''
+        Select the dependency backend
+
+        Each backend has its own dependency file: switching backend rebuilds
+        all targets.
+
+        @param backend [in] (str) json, sqlite, dbm (see actc.backend)
+        '''
+        self._backend, self._dep_file = BACKENDS[backend]
+    # end def setBackend
+
+
+    def build(self, jobs = CFG_JOBS, pipeline = False, trace = None):
         '''
         Build targets
 
-        @option jobs [in] (int) 1..N jobs at once
+        @option jobs     [in] (int)  1..N jobs at once
+        @option pipeline [in] (bool) stream files across consecutive tasks
+        @option trace    [in] (str)  Chrome trace file of the executed tasks
+        '''
+        if (trace is None):
+            self._build(jobs, pipeline)
+            return
+        # end if
+
+        reporter       = self._reporter
+        self._tracer   = Tracer()
+        self._reporter = type('Trace' + reporter.__name__,
+                              (TraceReporter, reporter),
+                              {'tracer': self._tracer})
+        try:
+            self._build(jobs, pipeline)
+        finally:
+            self._reporter = reporter
+            sys.stdout.write(self._tracer.dump(trace))
+            self._tracer   = None
+        # end try
+    # end def build
+
+
+    def _roots(self):
+        '''
+        Folders not part of the artifact cache keys: the outputs of another
+        build folder or another module are restored from the cache
+
+        @return (tuple) output folders, build folder
+        '''
+        return [self._output], getcwd()
+    # end def _roots
+
+
+    def _build(self, jobs, pipeline):
+        '''
+        Build targets
+
+        @param jobs     [in] (int)  1..N jobs at once
+        @param pipeline [in] (bool) stream files across consecutive tasks
+        '''
+        cache = getCache()
+
+        if (cache is None):
+            self._run(jobs, pipeline)
+            return
+        # end if
+
+        cache.relocate(*self._roots())
+
+        try:
+            self._run(jobs, pipeline)
+        finally:
+            cache.save()
+        # end try
+    # end def _build
+
+
+    def _run(self, jobs, pipeline):
+        '''
+        Run the tasks
+
+        @param jobs     [in] (int)  1..N jobs at once
+        @param pipeline [in] (bool) stream files across consecutive tasks
         '''
         # Ideally, a build should be deterministic:
         #   module.in --> tool --> module.out
@@ -150,13 +763,61 @@ class AbstractDodo(object):
         # a tool can generate more or fewer files
         #
         # Tasks are then called the one after the other
+        if (pipeline):
+            self._pipeline(jobs)
+            return
+        # end if
+
         for name, method in self._tasks:
             self._doIt('run',
                        '--process', str(getattr(method, 'process', jobs)),
-                       tasks = {name: method})
+                       tasks = [(name, method)])
         # end for
 
-    # end def build
+    # end def _run
+
+
+    def _pipeline(self, jobs):
+        '''
+        Build targets, running consecutive tasks in a single DoIt run
+
+        Tasks are grouped in segments, split on barrier and monoprocess
+        tasks. Inside a segment, a file is processed by a task as soon as
+        its input is produced by the previous task, the deferred tasks being
+        generated once the previous tasks of the segment are executed.
+
+        @param jobs [in] (int) 1..N jobs at once
+        '''
+        segments = list()
+        segment  = list()
+
+        for name, method in self._tasks:
+            if (   getattr(method, 'barrier', False)
+                or hasattr(method, 'process')):
+                if (segment):
+                    segments.append(segment)
+                # end if
+                segments.append([(name, method)])
+                segment = list()
+            else:
+                segment.append((name, method))
+            # end if
+        # end for
+
+        if (segment):
+            segments.append(segment)
+        # end if
+
+        for segment in segments:
+            process = min([jobs] + [getattr(method, 'process', jobs)
+                                    for _, method in segment])
+            self._doIt('run',
+                       '--process', str(process),
+                       tasks    = segment,
+                       pipeline = True)
+        # end for
+
+    # end def _pipeline
 
 
     def clean(self):
@@ -168,6 +829,31 @@ class AbstractDodo(object):
     # end def clean
 
 
+    def _generators(self, tasks):
+        '''
+        Get the task generators to run
+
+        @param tasks [in] (list) (name, generator)
+
+        @return (list) (name, generator) in execution order
+        '''
+        return list(tasks)
+    # end def _generators
+
+
+    def _generate(self, name, method):
+        '''
+        Generate the tasks of a task generator
+
+        @param name   [in] (str)  task_<name>
+        @param method [in] (func) generator
+
+        @return (list) Task
+        '''
+        return generate_tasks(name[5:], method(), method.__doc__)
+    # end def _generate
+
+
     def _doIt(self, *args, **kwargs):
         '''
         DoIt wrapper
@@ -175,14 +861,18 @@ class AbstractDodo(object):
         @param args   [in] (list) arguments
         @param kwargs [in] (dict) keyword arguments
         '''
-        members = dict(kwargs.get('tasks', self._tasks))
-        members.update(DOIT_CONFIG = {'backend'   : 'json',
-                                      'dep_file'  : self._dep_file,
-                                      'reporter'  : self._reporter,
-                                      'verbosity' : self._verbosity,
-                                      'minversion': '0.27.0'})
-
-        status = DoitMain(ModuleTaskLoader(members)).run(args)
+        tasks  = kwargs.get('tasks', self._tasks)
+        config = {'backend'   : self._backend,
+                  'dep_file'  : self._dep_file,
+                  'reporter'  : self._reporter,
+                  'verbosity' : self._verbosity,
+                  'minversion': '0.27.0'}
+
+        loader = OrderedTaskLoader(self._generators(tasks), config, self._generate,
+                                   plan  = kwargs.get('pipeline', False),
+                                   probe = self._tracer is not None)
+
+        status = DoitMain(loader, extra_config = {'BACKEND': PLUGINS}).run(args)
         if status:
             sys.exit(status)
         # end if
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.test.testbackend
+
+@brief   Dependency backend tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/14
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from os.path                    import join
+
+from actc.backend               import JsonDB
+from actc.backend               import SqliteDB
+from actc.tools.test.basetest   import BaseTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class SqliteDBTestCase(BaseTestCase):
+    '''
+    SqliteDB tests
+    '''
+
+    def test_concurrent(self):
+        '''
+        Test: concurrent builds keep each other's records
+        '''
+        name   = join(self.tmpDir, 'deps.sqlite')
+        first  = SqliteDB(name)
+        second = SqliteDB(name)
+
+        first.set('foo', 'foo.c', 'md5-foo')
+        second.set('bar', 'bar.c', 'md5-bar')
+        second.dump()
+        first.dump()
+
+        db = SqliteDB(name)
+        self.assertEqual('md5-foo', db.get('foo', 'foo.c'))
+        self.assertEqual('md5-bar', db.get('bar', 'bar.c'))
+        db.dump()
+    # end def test_concurrent
+
+    def test_update(self):
+        '''
+        Test: an updated record keeps its other values
+        '''
+        name = join(self.tmpDir, 'deps.sqlite')
+
+        db = SqliteDB(name)
+        db.FLUSH = 1
+        db.set('foo', 'foo.c', 'md5-foo')
+        self.assertTrue(db.in_('foo'))
+        db.dump()
+
+        db = SqliteDB(name)
+        db.set('foo', 'ignore:', '1')
+        db.remove('bar')
+        db.dump()
+
+        db = SqliteDB(name)
+        self.assertEqual('md5-foo', db.get('foo', 'foo.c'))
+        self.assertEqual('1', db.get('foo', 'ignore:'))
+        self.assertFalse(db.in_('bar'))
+        db.dump()
+    # end def test_update
+
+# end class SqliteDBTestCase
+
+
+class JsonDBTestCase(BaseTestCase):
+    '''
+    JsonDB tests
+    '''
+
+    def test_resident(self):
+        '''
+        Test: file loaded again only when written by another process
+        '''
+        name = join(self.tmpDir, 'deps.json')
+
+        db = JsonDB(name)
+        db.set('foo', 'foo.c', 'md5-foo')
+        db.dump()
+        content = db._db
+
+        db = JsonDB(name)
+        self.assertTrue(db._db is content)
+        db.dump()
+
+        # Other process
+        self.createTmpFile('deps.json', '{"bar": {"bar.c": "md5-bar"}}')
+
+        db = JsonDB(name)
+        self.assertFalse(db.in_('foo'))
+        self.assertEqual('md5-bar', db.get('bar', 'bar.c'))
+
+        # Not dumped: loaded again
+        db.set('baz', 'baz.c', 'md5-baz')
+        self.assertFalse(JsonDB(name).in_('baz'))
+    # end def test_resident
+
+# end class JsonDBTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
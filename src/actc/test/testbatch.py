@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.test.testbatch
+
+@brief   Batch build tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/13
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from os                         import chdir
+from os                         import getcwd
+from os.path                    import isdir
+from os.path                    import join
+
+from actc.batch                 import Batch
+from actc.dodo                  import AbstractDodo
+from actc.tools.utils           import Copier
+from actc.tools.test.basetest   import BaseTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class Module(AbstractDodo):
+    '''
+    Minimal <module>.json toolchain
+    '''
+
+    def __init__(self, tmpDir, module):
+        '''
+        Constructor
+
+        @param tmpDir [in] (str) test folder
+        @param module [in] (str) name
+        '''
+        super(Module, self).__init__(output = join(tmpDir, 'build', module))
+
+        self._json   = join(tmpDir, module + '.json')
+        self._module = module
+        self._tmpDir = tmpDir
+    # end def __init__
+
+    def task_copy(self):
+        '''
+        Task: copy src to <module>
+
+        @return (Task)
+        '''
+        tool = Copier(outputs = (self._output, ''))
+        yield tool.tasks(join(self._tmpDir, self._module + '.c'))
+    # end def task_copy
+
+# end class Module
+
+
+class BatchTestCase(BaseTestCase):
+    '''
+    Batch tests
+    '''
+
+    def test_build(self):
+        '''
+        Test: several modules built in a single run
+        '''
+        self.createTmpFile('foo.c', 'foo')
+        self.createTmpFile('bar.c', 'bar')
+
+        batch = Batch([Module(self.tmpDir, 'foo'),
+                       Module(self.tmpDir, 'bar')])
+
+        # Build folder and dependency file in tmpDir
+        cwd = getcwd()
+        chdir(self.tmpDir)
+        try:
+            batch.build(jobs = 2)
+        finally:
+            chdir(cwd)
+        # end try
+
+        self.assertTmpFile('build/foo/foo.c', 'foo')
+        self.assertTmpFile('build/bar/bar.c', 'bar')
+
+        # No artifact cache without -c
+        self.assertFalse(isdir(join(self.tmpDir, 'build', '.cache')))
+    # end def test_build
+
+    def test_folder(self):
+        '''
+        Test: configurations from several folders
+        '''
+        self.assertRaises(ValueError, Batch, [Module(self.tmpDir, 'foo'),
+                                              Module(join(self.tmpDir, 'bar'), 'bar')])
+    # end def test_folder
+
+# end class BatchTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.test.testclient
+
+@brief   Daemon client tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/14
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from json                       import loads
+from os.path                    import join
+from socket                     import AF_UNIX
+from socket                     import SOCK_STREAM
+from socket                     import socket
+from threading                  import Thread
+import sys
+
+from actc.client                import OUTPUT
+from actc.client                import STATUS
+from actc.client                import connect
+from actc.client                import frame
+from actc.tools.test.basetest   import BaseTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class ClientTestCase(BaseTestCase):
+    '''
+    connect tests
+    '''
+
+    def _serve(self, argv, frames):
+        '''
+        Connect to a daemon sending frames
+
+        @param argv   [in] (list) command line arguments, without --connect
+        @param frames [in] (str)  sent to the client
+
+        @return (tuple) request, output, exit status
+        '''
+        path     = join(self.tmpDir, 'actc.sock')
+        requests = list()
+
+        server = socket(AF_UNIX, SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+
+        def serve():
+            '''
+            Serve one request
+            '''
+            connection, _ = server.accept()
+            requests.append(loads(connection.makefile().readline()))
+            connection.sendall(frames)
+            connection.close()
+        # end def serve
+
+        thread = Thread(target = serve)
+        thread.start()
+
+        class Output(object):
+            '''
+            Standard output of the client
+            '''
+            data = ''
+
+            def write(self, data):
+                '''
+                Write
+
+                @param data [in] (str) bytes
+                '''
+                self.data += data
+            # end def write
+
+            def flush(self):
+                '''
+                Flush
+                '''
+            # end def flush
+
+        # end class Output
+
+        stdout     = sys.stdout
+        sys.stdout = Output()
+        try:
+            connect(argv[:1] + ['--connect=' + path] + argv[1:])
+        except SystemExit as err:
+            status = err.code
+        finally:
+            output     = sys.stdout.data
+            sys.stdout = stdout
+            thread.join()
+            server.close()
+        # end try
+
+        return requests[0], output, status
+    # end def _serve
+
+    def test_local(self):
+        '''
+        Test: no daemon without --connect
+        '''
+        self.assertFalse(connect(['-f', 'foo.json', 'build']))
+    # end def test_local
+
+    def test_frames(self):
+        '''
+        Test: output with NUL bytes, then exit status
+        '''
+        request, output, status = self._serve(['-f', 'foo.json', 'build', '-j', '2'],
+                                              frame(OUTPUT, 'foo\0') + frame(OUTPUT, '\0bar') + frame(STATUS, '3'))
+
+        self.assertEqual(['-f', 'foo.json', 'build', '-j', '2'], request['argv'])
+        self.assertEqual('foo\0\0bar', output)
+        self.assertEqual(3, status)
+    # end def test_frames
+
+    def test_interrupted(self):
+        '''
+        Test: failure without exit status
+        '''
+        _, output, status = self._serve(['build'], frame(OUTPUT, 'foo') + frame(OUTPUT, 'bar')[:-1])
+
+        self.assertEqual('foo', output)
+        self.assertEqual(1, status)
+    # end def test_interrupted
+
+# end class ClientTestCase
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.test.testconfig
+
+@brief   Configuration tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/13
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from unittest                   import TestCase
+
+from actc.config                import Config
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class ConfigTestCase(TestCase):
+    '''
+    Config tests
+    '''
+
+    def test_trace(self):
+        '''
+        Test: only the values read are fingerprinted
+        '''
+        config = Config()
+        reads  = set()
+
+        config.trace(reads)
+        options = config.src2bin.PREPROCESS.options
+        for _ in config.METRICS.files:
+            pass
+        # end for
+        config.trace(None)
+
+        self.assertEqual(set([('src2bin', 'PREPROCESS', 'options'),
+                              ('METRICS', 'files')]), reads)
+
+        digest = config.digest(reads)
+
+        config._update(config, {'POST': {'brief': 'updated'}})
+        self.assertEqual(digest, config.digest(reads))
+
+        config._update(config, {'src2bin': {'PREPROCESS': {'options': options + ['-DX']}}})
+        self.assertNotEqual(digest, config.digest(reads))
+    # end def test_trace
+
+# end class ConfigTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2015 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A. nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.test.testdodo
+
+@brief   DoIt customization tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/13
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from json                       import load
+from os                         import remove
+from os.path                    import isfile
+from os.path                    import join
+import os
+import posix
+import sys
+
+from doit.task                  import Task
+
+from actc.dodo                  import deferred
+from actc.dodo                  import Tracer
+from actc.tools.utils           import Copier
+from actc.tools.test.basetest   import DoItTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class PipelineTestCase(DoItTestCase):
+    '''
+    Pipeline build tests
+    '''
+
+    def task_first(self):
+        '''
+        Task: copy src to FIRST
+
+        @return (Task)
+        '''
+        src = self.createTmpFile('bar.c', 'foo')
+        dst = join(self.tmpDir, 'FIRST')
+
+        tool = Copier(outputs = (dst, ''))
+        yield tool.tasks(src)
+    # end def task_first
+
+    def task_second(self):
+        '''
+        Task: copy FIRST/*.c (not yet built) to SECOND
+
+        @return (Task)
+        '''
+        src = join(self.tmpDir, 'FIRST', '*.c')
+        dst = join(self.tmpDir, 'SECOND')
+
+        tool = Copier(outputs = (dst, ''))
+        yield tool.tasks(src)
+    # end def task_second
+
+    def test_pipeline(self):
+        '''
+        Test: files planned by a task are consumed by the next one
+        '''
+        try:
+            self.build(jobs = 1, pipeline = True)
+        finally:
+            if isfile('.actc.db'):
+                remove('.actc.db')
+            # end if
+        # end try
+
+        self.assertTmpFile('FIRST/bar.c', 'foo')
+        self.assertTmpFile('SECOND/bar.c', 'foo')
+    # end def test_pipeline
+
+    def test_trace(self):
+        '''
+        Test: each executed task is a trace event, each stage a summary line
+        '''
+        trace = join(self.tmpDir, 'trace.json')
+        try:
+            self.build(jobs = 2, trace = trace)
+        finally:
+            if isfile('.actc.db'):
+                remove('.actc.db')
+            # end if
+        # end try
+
+        with open(trace) as fo:
+            events = load(fo)['traceEvents']
+        # end with
+
+        self.assertEqual(sorted(event['cat'] for event in events),
+                         ['first', 'second'])
+        for event in events:
+            self.assertEqual(event['ph'], 'X')
+            self.assertEqual(event['args']['status'], 'success')
+        # end for
+
+        with open(trace + '.txt') as fo:
+            self.assertEqual(len(fo.readlines()), 3)
+        # end with
+    # end def test_trace
+
+# end class PipelineTestCase
+
+
+class DeferredTestCase(DoItTestCase):
+    '''
+    Deferred generation tests
+    '''
+
+    def task_first(self):
+        '''
+        Task: write FIRST/*.c, not declared as targets
+
+        @return (Task)
+        '''
+        folder = join(self.tmpDir, 'FIRST')
+
+        def write():
+            os.mkdir(folder)
+            for name in ('foo.c', 'bar.c'):
+                with open(join(folder, name), 'w') as fo:
+                    fo.write(name)
+                # end with
+            # end for
+        # end def write
+
+        yield {'name'    : 'write',
+               'actions' : [write]}
+    # end def task_first
+
+    @deferred
+    def task_second(self):
+        '''
+        Task: copy FIRST/*.c (written by the previous task) to SECOND
+
+        @return (Task)
+        '''
+        tool = Copier(outputs = (join(self.tmpDir, 'SECOND'), ''))
+        yield tool.tasks(join(self.tmpDir, 'FIRST', '*.c'))
+    # end def task_second
+
+    def task_third(self):
+        '''
+        Task: copy SECOND/*.c (not yet built) to THIRD
+
+        @return (Task)
+        '''
+        tool = Copier(outputs = (join(self.tmpDir, 'THIRD'), ''))
+        yield tool.tasks(join(self.tmpDir, 'SECOND', '*.c'))
+    # end def task_third
+
+    def test_deferred(self):
+        '''
+        Test: a deferred generator is called once the previous tasks ran
+        '''
+        try:
+            self.build(jobs = 2, pipeline = True)
+        finally:
+            if isfile('.actc.db'):
+                remove('.actc.db')
+            # end if
+        # end try
+
+        self.assertTmpFile('THIRD/foo.c', 'foo.c')
+        self.assertTmpFile('THIRD/bar.c', 'bar.c')
+    # end def test_deferred
+
+# end class DeferredTestCase
+
+
+class TraceTestCase(DoItTestCase):
+    '''
+    Per task resource usage tests
+    '''
+
+    def task_large(self):
+        '''
+        Task: command using 64 MB
+
+        @return (Task)
+        '''
+        return {'actions': ['%s -c "x = 64 * 1024 * 1024 * \'a\'"' % (sys.executable,)]}
+    # end def task_large
+
+    def task_small(self):
+        '''
+        Task: command using a few MB
+
+        @return (Task)
+        '''
+        return {'actions': ['true']}
+    # end def task_small
+
+    def task_python(self):
+        '''
+        Task: python-action spawning a process
+
+        @return (Task)
+        '''
+        def spawn():
+            return (os.waitpid is posix.waitpid) and (os.system('true') == 0)
+        # end def spawn
+
+        return {'actions': [spawn]}
+    # end def task_python
+
+    def task_failed(self):
+        '''
+        Task: command failing
+
+        @return (Task)
+        '''
+        return {'actions': ['exit 3']}
+    # end def task_failed
+
+    def test_usage(self):
+        '''
+        Test: peak RSS of the commands of each task, exit status
+        '''
+        trace = join(self.tmpDir, 'trace.json')
+        try:
+            self.build(jobs = 1, trace = trace)
+        except SystemExit:
+            pass
+        finally:
+            if isfile('.actc.db'):
+                remove('.actc.db')
+            # end if
+        # end try
+
+        with open(trace) as fo:
+            events = dict((event['cat'], event['args']) for event in load(fo)['traceEvents'])
+        # end with
+
+        self.assertGreater(events['large']['maxrss'], 64 * 1024)
+        self.assertLess(events['small']['maxrss'], 32 * 1024)
+        self.assertEqual(1, events['small']['processes'])
+        self.assertEqual((0, 3), (events['small']['exit'], events['failed']['exit']))
+
+        # The processes of the python-actions are not reaped by the probe
+        self.assertEqual(('success', 0), (events['python']['status'], events['python']['processes']))
+    # end def test_usage
+
+    def test_summary(self):
+        '''
+        Test: busy time of the tasks of a stage, wall time from the first start to the last end
+        '''
+        tracer = Tracer()
+
+        for name, begin, end in (('stage:a', 0.0, 1.0), ('stage:b', 0.5, 1.5)):
+            task       = Task(name, None)
+            task.usage = {'begin': tracer._origin + begin,
+                          'end'  : tracer._origin + end}
+            tracer.end(task, 'success')
+        # end for
+
+        self.assertEqual(['stage', '2', '0', '2.00', '1.50'], tracer.summary().splitlines()[1].split()[:5])
+    # end def test_summary
+
+# end class TraceTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
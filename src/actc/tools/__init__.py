@@ -37,22 +37,35 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from glob                       import iglob
+from fcntl                      import ioctl
+from fnmatch                    import fnmatch
 from glob                       import glob
+from glob                       import has_magic
 from os                         import getenv
+from os                         import link
+from os                         import listdir
+from os                         import remove
 from os                         import pathsep
 from os                         import makedirs
+from os                         import sep
+from os                         import stat
 from os.path                    import abspath
 from os.path                    import basename
+from os.path                    import dirname
 from os.path                    import getsize
 from os.path                    import isdir
 from os.path                    import isfile
 from os.path                    import join
 from re                         import sub
+from shutil                     import copyfile
+from time                       import time
 
 from doit.action                import CmdAction
 from doit.tools                 import run_once
 
+from actc.consts                import CFG_LINK
+from actc.tools.cache           import CachedCmdAction
+
 import sys
 
 # ------------------------------------------------------------------------------
@@ -105,6 +118,263 @@ def createFolder(path):
     # end try
 # end def createFolder
 
+
+# Copy modes of linkFile
+LINK_MODES = ('auto', 'copy', 'hardlink', 'reflink')
+
+# Mode used by the copying tools (see setLinkMode)
+_LINK = [CFG_LINK]
+
+def setLinkMode(mode):
+    '''
+    Select how the tools copy files
+
+    @param mode [in] (str) see linkFile
+    '''
+    _LINK[0] = mode
+# end def setLinkMode
+
+
+def getLinkMode():
+    '''
+    Get how the tools copy files
+
+    @return (str) see linkFile
+    '''
+    return _LINK[0]
+# end def getLinkMode
+
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+def reflinkFile(src, dst):
+    '''
+    Clone a file (copy on write: the file systems sharing the blocks, e.g. btrfs, xfs)
+
+    @param src [in] (str) existing file
+    @param dst [in] (str) new file
+
+    @exception IOError not supported
+    '''
+    with open(src, 'rb') as fi:
+        with open(dst, 'wb') as fo:
+            try:
+                ioctl(fo.fileno(), FICLONE, fi.fileno())
+            except IOError:
+                fo.close()
+                remove(dst)
+                raise
+            # end try
+        # end with
+    # end with
+# end def reflinkFile
+
+
+def linkFile(src, dst, mode = None, inplace = False):
+    '''
+    Copy a file, sharing its content when possible
+
+    - reflink:  clone, else copy
+    - hardlink: hard link, else copy
+    - auto:     clone, else hard link, else copy
+    - copy
+
+    A hard link shares the file itself: the readers of dst must not update it in
+    place but rename a new file (as actc.tools.annotation.AnnotationRewriter).
+
+    @param  src     [in] (str)  existing file
+    @param  dst     [in] (str)  path (replaced)
+    @option mode    [in] (str)  see above, getLinkMode() by default
+    @option inplace [in] (bool) dst may be updated in place: no hard link
+    '''
+    mode = mode or getLinkMode()
+
+    # Never write through a previous link
+    if isfile(dst):
+        remove(dst)
+    # end if
+
+    if (mode in ('auto', 'reflink')):
+        try:
+            reflinkFile(src, dst)
+            return
+        except IOError:
+            pass
+        # end try
+    # end if
+
+    if (    (mode in ('auto', 'hardlink'))
+        and not inplace):
+        try:
+            link(src, dst)
+            return
+        except OSError:
+            pass
+        # end try
+    # end if
+
+    copyfile(src, dst)
+# end def linkFile
+
+
+def unlinkShared(paths):
+    '''
+    Remove the hard linked files (before a program writes them in place)
+
+    @param paths [in] (list) files
+    '''
+    for path in paths:
+        if (    isfile(path)
+            and (stat(path).st_nlink > 1)):
+            remove(path)
+        # end if
+    # end for
+# end def unlinkShared
+
+
+# Targets of the tasks already generated, but not yet executed (pipeline build)
+# path --> task name
+_PLANNED = dict()
+
+def planTargets(targets, task = None):
+    '''
+    Declare targets that will be created by already generated tasks
+
+    @param  targets [in] (list) paths
+    @option task    [in] (str)  name of the task creating them
+    '''
+    _PLANNED.update((abspath(target), task) for target in targets)
+# end def planTargets
+
+
+def plannedBy(paths):
+    '''
+    Get the tasks creating planned files
+
+    @param paths [in] (list) paths
+
+    @return (list) task names, sorted
+    '''
+    return sorted(set(_PLANNED[path] for path in map(abspath, paths)
+                      if _PLANNED.get(path) is not None))
+# end def plannedBy
+
+
+def rewrites(task):
+    '''
+    Get the files rewritten in place by a task (its 'rewrites' parameter)
+
+    In pipeline mode, the next tasks reading these files wait for the task.
+
+    @param task [in] (Task) task
+
+    @return (list) paths
+    '''
+    return [path for param in task.params if param['name'] == 'rewrites'
+                 for path in param['default']]
+# end def rewrites
+
+
+def clearPlannedTargets():
+    '''
+    Forget the planned targets
+    '''
+    _PLANNED.clear()
+# end def clearPlannedTargets
+
+
+# Folder listings, kept while the folder time stamp is unchanged (e.g. by the
+# daemon, see actc.daemon)
+# folder --> (time stamp, names)
+_LISTINGS = dict()
+
+def listFolder(folder):
+    '''
+    List a folder, the listing being reused until the folder changes
+
+    A listing taken in the second of the folder time stamp is not kept: an
+    entry added in the same second would not change it.
+
+    @param folder [in] (str) path
+
+    @return (list) names
+    '''
+    try:
+        mtime = stat(folder).st_mtime
+    except OSError:
+        return []
+    # end try
+
+    listing = _LISTINGS.get(folder)
+
+    if (   (listing is None)
+        or (listing[0] != mtime)):
+        listing = (mtime, listdir(folder))
+
+        if (time() - mtime > 1):
+            _LISTINGS[folder] = listing
+        else:
+            _LISTINGS.pop(folder, None)
+        # end if
+    # end if
+
+    return listing[1]
+# end def listFolder
+
+
+def expand(pattern):
+    '''
+    Expand a file pattern on existing and planned files
+
+    @param pattern [in] (str) glob pattern
+
+    @return (list) paths
+    '''
+    pattern = abspath(pattern)
+    folder  = dirname(pattern)
+    name    = basename(pattern)
+
+    if (    has_magic(name)
+        and not has_magic(folder)):
+        # Hidden files matched by an explicit dot only, as glob does
+        paths = [join(folder, entry) for entry in listFolder(folder)
+                 if (    fnmatch(entry, name)
+                     and (name.startswith('.') or not entry.startswith('.')))]
+    else:
+        paths = glob(pattern)
+    # end if
+
+    if (_PLANNED):
+        found = set(paths)
+        parts = pattern.split(sep)
+
+        for path in sorted(set(_PLANNED) - found):
+            names = path.split(sep)
+
+            if (    (len(names) == len(parts))
+                and all(fnmatch(name, part) for name, part in zip(names, parts))):
+                paths.append(path)
+            # end if
+        # end for
+    # end if
+
+    return paths
+# end def expand
+
+
+def isEmpty(path):
+    '''
+    Check if a file is empty (a planned file is not empty)
+
+    @param path [in] (str) file
+
+    @return (bool)
+    '''
+    return (abspath(path) not in _PLANNED) and not getsize(path)
+# end def isEmpty
+
+
 class AbstractTool(object):
     '''
     Tool interface
@@ -235,43 +505,59 @@ class AbstractBasicPythonTool(AbstractPythonTool):
         raise NotImplementedError
     # end def _python
 
-    def tasks(self, *args, **kwargs):
+    def _pairs(self, *args, **kwargs):
         '''
-        @copydoc actc.tools.AbstractPythonTool.tasks
-        '''
-        # Create Folders
-        yield super(AbstractBasicPythonTool, self).tasks(*args, **kwargs)
+        Match the input files with their targets
 
-        # Process Files
+        @param args   [in] (list) see tasks
+        @param kwargs [in] (dict) see tasks
+
+        @return (generator) (src, dst)
+        '''
         path, ext = self._outputs[0]
 
+        # Renaming
+        pattern = kwargs.get('pattern')
+        replace = kwargs.get('replace')
+
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
                 dst = join(path, basename(src) + ext)
 
-                # Renaming
-                pattern = kwargs.get('pattern')
-                replace = kwargs.get('replace')
-
                 if (    (pattern is not None)
                     and (replace is not None)):
                     dst = sub(pattern, replace, dst)
                 # end if
 
-                yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
-                       'title'   : self._title,
-                       'actions' : [self._python,],
-                       'targets' : [dst,],
-                       'file_dep': [src,],
-                       'task_dep': ['_createfolder_' + path]
-                       }
+                yield src, dst
             # end for
         # end for
+    # end def _pairs
+
+    def tasks(self, *args, **kwargs):
+        '''
+        @copydoc actc.tools.AbstractPythonTool.tasks
+        '''
+        # Create Folders
+        yield super(AbstractBasicPythonTool, self).tasks(*args, **kwargs)
+
+        # Process Files
+        path, _ = self._outputs[0]
+
+        for src, dst in self._pairs(*args, **kwargs):
+            yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
+                   'title'   : self._title,
+                   'actions' : [self._python,],
+                   'targets' : [dst,],
+                   'file_dep': [src,],
+                   'task_dep': ['_createfolder_' + path]
+                   }
+        # end for
     # end def tasks
 
 # end class AbstractBasicPythonTool
@@ -279,6 +565,9 @@ class AbstractBasicPythonTool(AbstractPythonTool):
 
 _PATHS = getenv('PATH').split(pathsep)
 
+# Programs already found
+_CHECKED = set()
+
 
 class AbstractCmdTool(AbstractTool):
     '''
@@ -320,14 +609,20 @@ class AbstractCmdTool(AbstractTool):
 
         for name in programs:
 
+            if (name in _CHECKED):
+                continue
+            # end if
+
             # Current Working Directory?
             if isfile(name):
+                _CHECKED.add(name)
                 continue
             # end if
 
             # PATH?
             for path in _PATHS:
                 if isfile(join(path, name)):
+                    _CHECKED.add(name)
                     break
                 # end if
             else:
@@ -347,6 +642,9 @@ class AbstractCmdTool(AbstractTool):
 
     _ACTION = None
 
+    # Targets fully describe the outputs (see actc.tools.cache)
+    _CACHEABLE = False
+
     def _cmd(self, task):
         '''
         Build "cmd-action" arguments
@@ -358,9 +656,77 @@ class AbstractCmdTool(AbstractTool):
         raise NotImplementedError
     # end def _cmd
 
+    def _action(self, skip = None):
+        '''
+        Build "cmd-action"
+
+        @option skip [in] (callable) input file --> pass it through unchanged?
+
+        @return (CmdAction)
+        '''
+        if (skip is not None):
+            return PassThroughCmdAction(self._cmd,
+                                        self._program if self._CACHEABLE else None,
+                                        skip)
+        # end if
+
+        if (self._CACHEABLE):
+            return CachedCmdAction(self._cmd, self._program)
+        # end if
+
+        return CmdAction(self._cmd)
+    # end def _action
+
 # end class AbstractCmdTool
 
 
+class PassThroughCmdAction(CachedCmdAction):
+    '''
+    "cmd-action" linking its input to its target when the program has nothing
+    to do with it (e.g. a source file without the annotations of a stage)
+
+    Decided at run time: the inputs do not exist when the tasks are generated.
+    '''
+
+    def __init__(self, action, program, skip, **kwargs):
+        '''
+        Constructor
+
+        @param action  [in] (str, list, callable) command
+        @param program [in] (list, None) executable [script], None: not cached
+        @param skip    [in] (callable) input file --> pass it through unchanged?
+        @param kwargs  [in] (dict) see doit.action.CmdAction
+        '''
+        super(PassThroughCmdAction, self).__init__(action, program, **kwargs)
+        self._skip = skip
+    # end def __init__
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        file_dep = list(self.task.file_dep)
+
+        if (    (len(file_dep) == 1)
+            and (len(self.task.targets) == 1)
+            and self._skip(file_dep[0])):
+            linkFile(file_dep[0], self.task.targets[0])
+            return None
+        # end if
+
+        # Target linked by a previous build
+        unlinkShared(self.task.targets)
+
+        if (self._program is None):
+            return CmdAction.execute(self, out = out, err = err)
+        # end if
+
+        return super(PassThroughCmdAction, self).execute(out = out, err = err)
+    # end def execute
+
+# end class PassThroughCmdAction
+
+
 class AbstractBasicCmdTool(AbstractCmdTool):
     '''
     Basic Command Tool
@@ -378,7 +744,11 @@ class AbstractBasicCmdTool(AbstractCmdTool):
     def tasks(self, *args, **kwargs):
         '''
         @copydoc actc.tools.AbstractCmdTool.tasks
+
+        @option skip [in] (callable) input file --> pass it through unchanged?
         '''
+        skip = kwargs.pop('skip', None)
+
         # Create Folders
         yield super(AbstractBasicCmdTool, self).tasks(*args, **kwargs)
 
@@ -386,9 +756,9 @@ class AbstractBasicCmdTool(AbstractCmdTool):
         path, ext = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
@@ -400,7 +770,7 @@ class AbstractBasicCmdTool(AbstractCmdTool):
 
                 yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
                        'title'   : self._title,
-                       'actions' : [CmdAction(self._cmd),],
+                       'actions' : [self._action(skip),],
                        'targets' : [dst,],
                        'file_dep': [src,],
                        'task_dep': ['_createfolder_' + path]
@@ -37,26 +37,41 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from glob                       import glob
+from argparse                   import ArgumentParser
+from difflib                    import unified_diff
+from fnmatch                    import fnmatch
 from json                       import dump
+from json                       import dumps
 from json                       import load
+from os                         import devnull
+from os                         import fdopen
+from os                         import remove
+from os                         import rename
+from os                         import stat
+from os                         import walk
 from os.path                    import abspath
 from os.path                    import basename
 from os.path                    import dirname
 from os.path                    import join
 from os.path                    import isfile
+from os.path                    import relpath
+from multiprocessing            import Pool
+from shutil                     import copymode
+from tempfile                   import mkstemp
 
-
+from actc.consts                import CFG_JOBS
 from actc.tools                 import AbstractBasicCmdTool
+from actc.tools                 import AbstractBasicPythonTool
 from actc.tools                 import AbstractCmdTool
 from actc.tools                 import AbstractPythonTool
+from actc.tools                 import expand
 from actc.tools                 import toList
 
-from actc.tools.utils           import make_hash
+from actc.tools.cache           import digest
+from actc.tools.utils           import make_digest
 
 from doit.action                import CmdAction
 
-import fileinput
 import re
 import sys
 
@@ -67,6 +82,9 @@ import sys
 
 READ_ANNOT = '/opt/annotation_extractor/readAnnot.sh'
 
+# Source files scanned by generateTreeAnnotations
+SOURCE_PATTERNS = ('*.c', '*.h', '*.cpp', '*.hpp', '*.cc')
+
 class AnnotationExtractor(AbstractBasicCmdTool):
     '''
     annotation extraction
@@ -109,6 +127,22 @@ class AnnotationExtractor(AbstractBasicCmdTool):
 
 # end class AnnotationExtractor
 
+class NativeAnnotationExtractor(AbstractBasicPythonTool):
+    '''
+    annotation extraction, in process (see extractAnnotations)
+    '''
+
+    _ACTION = 'extract annot'
+
+    def _python(self, task):
+        '''
+        @copydoc actc.tools.AbstractPythonTool._python
+        '''
+        extractAnnotations(list(task.file_dep)[0], task.targets[0])
+    # end def _python
+
+# end class NativeAnnotationExtractor
+
 class AnnotationMerger(AbstractPythonTool):
     '''
     Merger annotation files
@@ -116,28 +150,118 @@ class AnnotationMerger(AbstractPythonTool):
 
     _ACTION = 'merge'
 
+    # Sidecar index: digest and byte range of each input in the merged file
+    _OFFSETS = '.offsets'
+
+    # Copy buffer size
+    _CHUNK = 1 << 20
+
     def _python(self, task):
         '''
         @copydoc actc.tools.AbstractPythonTool._python
-        '''
-        annotations = list()
-
-        for annotation in list(task.file_dep):
 
-            with open(annotation, 'r') as fo:
-                annotations.extend(load(fo))
+        The merged file is written entry by entry. The byte range of each input
+        is kept in a sidecar index with the content digest of the input, so the
+        next merge only re-serializes the inputs that changed and copies the
+        other segments.
+        '''
+        target = task.targets[0]
+        inputs = sorted(task.file_dep)
+
+        # Previous merge, if the merged file was not modified since
+        segments = dict()
+        try:
+            with open(target + self._OFFSETS, 'r') as fi:
+                index = load(fi)
             # end with
-        # end for
+            info = stat(target)
+            if [info.st_mtime, info.st_size] == index['target']:
+                segments = dict((path, (state, start, end)) for path, state, start, end in index['inputs'])
+            # end if
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        # end try
+
+        records = []
+        tmp = target + '.tmp'
+        try:
+            with open(tmp, 'w') as fo:
+                with open(target, 'r') if segments else open(devnull, 'r') as previous:
+                    fo.write('[')
+                    first = True
+                    for path in inputs:
+                        state = digest(path)
+
+                        if segments.get(path, (None,))[0] == state:
+                            _, start, end = segments[path]
+                            if end > start:
+                                fo.write('\n' if first else ',\n')
+                                first = False
+                                offset = fo.tell()
+                                previous.seek(start)
+                                for size in self._chunks(end - start):
+                                    fo.write(previous.read(size))
+                                # end for
+                            else:
+                                offset = fo.tell()
+                            # end if
+
+                        else:
+                            with open(path, 'r') as fi:
+                                annotations = load(fi)
+                            # end with
+
+                            offset = None
+                            for annotation in annotations:
+                                fo.write('\n' if first else ',\n')
+                                first = False
+                                if offset is None:
+                                    offset = fo.tell()
+                                # end if
+                                fo.write('  ' + dumps(annotation,
+                                                      indent     = 2,
+                                                      separators = (',', ': '),
+                                                      sort_keys  = True).replace('\n', '\n  '))
+                            # end for
+                            if offset is None:
+                                offset = fo.tell()
+                            # end if
+                        # end if
+
+                        records.append([path, state, offset, fo.tell()])
+                    # end for
+                    fo.write(']' if first else '\n]')
+                # end with
+            # end with
+            rename(tmp, target)
+        except:
+            if isfile(tmp):
+                remove(tmp)
+            # end if
+            raise
+        # end try
 
-        with open(task.targets[0], 'w') as fo:
-            dump(annotations, fo,
-                 indent     = 2,
-                 separators = (',', ': '),
-                 sort_keys  = True)
+        info = stat(target)
+        with open(target + self._OFFSETS, 'w') as fo:
+            dump({'target': [info.st_mtime, info.st_size],
+                  'inputs': records}, fo)
         # end with
-
     # end def _python
 
+    def _chunks(self, size):
+        '''
+        Split a copy in buffer sized reads
+
+        @param size [in] (int) bytes to copy
+
+        @return (generator) read sizes
+        '''
+        while size > 0:
+            yield min(size, self._CHUNK)
+            size -= self._CHUNK
+        # end while
+    # end def _chunks
+
     def tasks(self, *args, **kwargs):
         '''
         @copydoc actc.tools.AbstractTool.tasks
@@ -148,7 +272,7 @@ class AnnotationMerger(AbstractPythonTool):
         src = list()
 
         for arg in toList(args[0]):
-            src.extend(glob(abspath(arg)))
+            src.extend(expand(arg))
         # end for
 
         dst = toList(args[1])
@@ -156,8 +280,9 @@ class AnnotationMerger(AbstractPythonTool):
         yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
                'title'   : self._title,
                'actions' : [self._python,],
-               'targets' : dst,
+               'targets' : dst + [dst[0] + self._OFFSETS],
                'file_dep': src,
+               'task_dep': ['_createfolder_' + self._outputs[0][0]]
                }
 
     # end def tasks
@@ -232,19 +357,28 @@ PRE_PRAGMA_REPLACE = '#pragma ASPIRE begin %s'
 class AnnotationRewriter(AbstractPythonTool):
     '''
     Replace security requirement annotations (see D5.01) with some "concrete annotations"
+
+    Each source file is rewritten in place by its own task: in pipeline mode, a file
+    is rewritten as soon as it is produced, the next tasks reading it waiting for the
+    rewrite (see actc.tools.rewrites).
     '''
     _ACTION = "annotate"
 
-    def _python(self, task, filter, keep_placeholders, replace_all, preprocessed):
+    def _python(self, task, filter, keep_placeholders, replace_all, preprocessed, rewrites):
         '''
         @copydoc actc.tools.AbstractPythonTool._python
         '''
+        source_file = rewrites[0]
 
         # Load annotations from json file
-        annotations_file = list(task.file_dep)[0]
+        annotations_file = [path for path in task.file_dep if path != source_file][0]
 
-        # Filter annotations based on protection filter
-        annotations = filterAnnotations(annotations_file, annotation_filter=filter, filtered_only=not replace_all)
+        # Filter annotations of the source file based on protection filter
+        source_name = basename(source_file)
+        if(preprocessed):
+            source_name = source_name[:-len('.i')]
+        annotations = filterAnnotations(annotations_file, annotation_filter=filter, filtered_only=not replace_all,
+                                        source_name=source_name)
 
         # Check which annotations have been changed since previous run (and get line number and line hash metadata)
         applied_annotations = task.targets[0]
@@ -253,12 +387,10 @@ class AnnotationRewriter(AbstractPythonTool):
 #         print 'updated annotations'
 #         print annotations
 
-        # Replace placeholders with annotation content for the updated annotations (inefficiently)
+        # The source file is rewritten once
+        contents = []
         for annotation in updated_annotations:
 
-            source_file = join(dirname(applied_annotations), basename(annotation['file name']))
-            if(preprocessed):
-                source_file += '.i'
             annotation_id = annotation['id']
 
             protections = annotation['filtered'].values() if annotation['filtered'] else []
@@ -267,79 +399,13 @@ class AnnotationRewriter(AbstractPythonTool):
             content = ", ".join(protections)
 
             print('Rewriting annotation %s in file %s with %s\n' % (annotation_id, source_file, content))
-            # Look for these:
-            # __attribute__((ASPIRE("placeHolder(0)")))
-            # _Pragma("ASPIRE begin placeHolder(2)")
-
-
-            replace_by_content = False
-            # Replace by line Hash in applied_annotations file
-            if(annotation.has_key('line_number') and annotation.has_key('line_hash') and annotation.has_key('content')):
-                print 'replace by content match'
-#                 print str(annotation)
-                placeholder = re.escape(annotation['content'])
-                replace_by_content = True
-            # Replace by matching against placeholder protection
-            else:
-                print 'replace by placeholder ID match'
-                placeholder = (r'protection\s*\(\s*placeHolder\s*,\s*id\s*\(\s*' + str(annotation_id) + r'\s*\)\s*\)')
-            # end if
-            attribute_match_r = re.compile(_RE_ATTRIBUTE_MATCH % placeholder)
-            attribute_replace = ATTRIBUTE_REPLACE % content
-            pragma_match_r = re.compile(_RE_PRAGMA_MATCH % placeholder)
-            pragma_replace = PRAGMA_REPLACE % content
-            pre_pragma_match_r = re.compile(_RE_PRE_PRAGMA_MATCH % placeholder)
-            pre_pragma_replace = PRE_PRAGMA_REPLACE % content
-
-            # #pragma ASPIRE begin protection(prot90,parameter2), protection(prot15,parameter2), placeHolder(3)
-            # _Pragma("ASPIRE begin protection(prot90,parameter2), protection(prot15,parameter2), placeHolder(3)")
-
-            # STDOUT redirected to file, magic!
-            print 'source_file', source_file
-            replaced = 0
-            for line in fileinput.input(source_file, inplace=True):
-
-                # Check content of the line if not replacing by ID
-                if(replace_by_content):
-                    assert annotation.has_key('line_number') and annotation.has_key('line_hash') and annotation.has_key('content')
-                    if(annotation['line_number'] != fileinput.lineno()  # Works for cached sources
-                       or annotation['line_hash'] != hash(line)
-                       or annotation['content'] not in line):
-                        print line,
-                        continue
-
-                (r1, r2, r3) = (0, 0, 0)
-
-                # Match and replace
-                line, r1 = re.subn(attribute_match_r, attribute_replace, line)
-                if(preprocessed):
-                    line, r2 = re.subn(pre_pragma_match_r, pre_pragma_replace, line)
-                else:
-                    line, r3 = re.subn(pragma_match_r, pragma_replace, line)
-                # end if
-
-
-                assert (r1 + r2 + r3  in (0, 1))
-                if(r1 + r2 + r3 == 1):
-                    # Update metadata
-                    annotation['line_number'] = fileinput.lineno()
-                    annotation['line_hash'] = hash(line)
-                    annotation['content'] = content
-
-                    replaced += 1
-
-                print line,
-            # end for
-
-            # Check that the replacement succeeded
-            if(replaced != 1):
-                sys.stderr.write('WARNING, annotation rewriting failed! (replacement count=%d)\n' % replaced)
-                sys.stderr.write(str(annotation))
-                sys.exit(1)
-            # end if
-
+            contents.append((annotation, content))
         # end for
 
+        if(contents):
+            rewriteAnnotations(source_file, contents, preprocessed)
+        # end if
+
         # Create target file containing  applied annotations
         with open(applied_annotations, 'w+') as fo:
             dump([a for a in annotations if 'filtered' in a and a['filtered']], fo,
@@ -352,37 +418,157 @@ class AnnotationRewriter(AbstractPythonTool):
     def tasks(self, *args, **kwargs):
         '''
         @copydoc actc.tools.AbstractCmdTool.tasks
+
+        args[0] is the annotations file, args[1] the source files (patterns),
+        each one being rewritten in place. The applied annotations of a source
+        file are kept in the hidden file .<source>.annotated, next to it.
         '''
 
-        dst, _ = self._outputs[0]
         annotations_file = abspath(toList(args[0])[0])
 
-        yield {'name'    : self._name(self._ACTION, annotations_file),
-               'title'   : self._title,
-               'actions' : [self._python, ],
-               'params'  : [{'name'   : 'filter',
-                             'short'  : None,
-                             'default': kwargs.get('filter', None),
-                             },
-                             {'name'   : 'keep_placeholders',
-                             'short'  : None,
-                             'default': kwargs.get('keep_placeholders', False),
-                             },
-                             {'name'   : 'replace_all',
-                             'short'  : None,
-                             'default': kwargs.get('replace_all', False),
-                             },
-                             {'name'   : 'preprocessed',
-                             'short'  : None,
-                             'default': kwargs.get('preprocessed', False),
-                             },
-                            ],
-               'targets' : [dst, ],
-               'file_dep': [annotations_file, ],
-               }
-    #  end def tasks
+        sources = list()
+        for arg in toList(args[1]):
+            sources.extend(sorted(expand(arg)))
+        # end for
+
+        for source_file in sources:
+            applied_annotations = join(dirname(source_file), '.%s.annotated' % (basename(source_file),))
+
+            yield {'name'    : self._name(self._ACTION, source_file, '\nwith', annotations_file),
+                   'title'   : self._title,
+                   'actions' : [self._python, ],
+                   'params'  : [{'name'   : 'filter',
+                                 'short'  : None,
+                                 'default': kwargs.get('filter', None),
+                                 },
+                                 {'name'   : 'keep_placeholders',
+                                 'short'  : None,
+                                 'default': kwargs.get('keep_placeholders', False),
+                                 },
+                                 {'name'   : 'replace_all',
+                                 'short'  : None,
+                                 'default': kwargs.get('replace_all', False),
+                                 },
+                                 {'name'   : 'preprocessed',
+                                 'short'  : None,
+                                 'default': kwargs.get('preprocessed', False),
+                                 },
+                                 {'name'   : 'rewrites',
+                                 'short'  : None,
+                                 'default': [source_file, ],
+                                 },
+                                ],
+                   'targets' : [applied_annotations, ],
+                   'file_dep': [annotations_file, source_file, ],
+                   }
+        # end for
+    #  end def tasks
 # end class AnnotationRewriter
 
+_RE_PLACEHOLDER_ID = re.compile(r'protection\s*\(\s*placeHolder\s*,\s*id\s*\(\s*(\d+)\s*\)\s*\)')
+
+def rewriteAnnotations(source_file, rewrites, preprocessed=False):
+    """Replace the annotations of a source file in a single pass
+
+    The annotations applied by a previous run (line_number, line_hash and content
+    metadata) are matched by line number, the others by their placeholder ID.
+    The file is replaced atomically, and only when a line changed."""
+    matchers = []
+    by_line = dict()
+    by_id = dict()
+    for annotation, content in rewrites:
+
+        # Replace by line Hash in applied_annotations file
+        if(annotation.has_key('line_number') and annotation.has_key('line_hash') and annotation.has_key('content')):
+            placeholder = re.escape(annotation['content'])
+            by_line.setdefault(annotation['line_number'], []).append(len(matchers))
+        # Replace by matching against placeholder protection
+        else:
+            placeholder = (r'protection\s*\(\s*placeHolder\s*,\s*id\s*\(\s*' + str(annotation['id']) + r'\s*\)\s*\)')
+            by_id.setdefault(str(annotation['id']), []).append(len(matchers))
+        # end if
+
+        if(preprocessed):
+            matchers.append((re.compile(_RE_ATTRIBUTE_MATCH % placeholder), ATTRIBUTE_REPLACE % content,
+                             re.compile(_RE_PRE_PRAGMA_MATCH % placeholder), PRE_PRAGMA_REPLACE % content))
+        else:
+            matchers.append((re.compile(_RE_ATTRIBUTE_MATCH % placeholder), ATTRIBUTE_REPLACE % content,
+                             re.compile(_RE_PRAGMA_MATCH % placeholder), PRAGMA_REPLACE % content))
+        # end if
+    # end for
+
+    replaced = [0] * len(matchers)
+    changed = False
+    lines = []
+    with open(source_file, 'r') as fi:
+        for line_number, line in enumerate(fi, 1):
+
+            # Candidate annotations, in the order of the rewrites
+            candidates = by_line.get(line_number, [])
+            if(by_id and 'placeHolder' in line):
+                candidates = candidates + [i for match in _RE_PLACEHOLDER_ID.findall(line)
+                                             for i in by_id.get(match, [])]
+            # end if
+
+            for i in sorted(set(candidates)):
+                annotation, content = rewrites[i]
+
+                # Check content of the line if not replacing by ID
+                if(i in by_line.get(line_number, [])
+                   and (annotation['line_hash'] != hash(line)
+                        or annotation['content'] not in line)):
+                    continue
+                # end if
+
+                # Match and replace
+                attribute_match_r, attribute_replace, pragma_match_r, pragma_replace = matchers[i]
+                new_line, r1 = attribute_match_r.subn(attribute_replace, line)
+                new_line, r2 = pragma_match_r.subn(pragma_replace, new_line)
+
+                assert (r1 + r2 in (0, 1))
+                if(r1 + r2 == 1):
+                    # Update metadata
+                    annotation['line_number'] = line_number
+                    annotation['line_hash'] = hash(new_line)
+                    annotation['content'] = content
+
+                    replaced[i] += 1
+                    changed = changed or new_line != line
+                    line = new_line
+                # end if
+            # end for
+
+            lines.append(line)
+        # end for
+    # end with
+
+    # Check that the replacements succeeded
+    for i, count in enumerate(replaced):
+        if(count != 1):
+            sys.stderr.write('WARNING, annotation rewriting failed! (replacement count=%d)\n' % count)
+            sys.stderr.write(str(rewrites[i][0]))
+            sys.exit(1)
+        # end if
+    # end for
+
+    # Untouched files keep their mtime
+    if(not changed):
+        return
+    # end if
+
+    fd, tmp = mkstemp(prefix='.' + basename(source_file), dir=dirname(abspath(source_file)))
+    try:
+        with fdopen(fd, 'w') as fo:
+            fo.writelines(lines)
+        # end with
+        copymode(source_file, tmp)
+        rename(tmp, source_file)
+    except:
+        remove(tmp)
+        raise
+    # end try
+# end def rewriteAnnotations
+
 # def findPragmas(source_file):
 #     expr = nestedExpr('(', ')')
 #     with open(source_file, 'r') as sf:
@@ -414,16 +600,16 @@ def getUpdatedAnnotations(candidate_annotations, applied_annotations):
         # end for
 
 
-        candidate_id_list = []
+        candidate_id_list = set()
         # Add modified and new annotations to the list
         for a in candidate_annotations:
             
             #keep track of candidate annotation ids
             annotation_id = a['id']
-            candidate_id_list.append(annotation_id)
+            candidate_id_list.add(annotation_id)
 
             # check filtered annotation content if applied in previous run
-            if annotation_id in applied_annotations_list.keys():
+            if annotation_id in applied_annotations_list:
                 aa = applied_annotations_list[annotation_id]
 
                 # Update metadata
@@ -456,54 +642,190 @@ def getUpdatedAnnotations(candidate_annotations, applied_annotations):
     return annotations
 #end def getUpdatedAnnotations
 
-def filterAnnotations(annotation_file, source_file=None, annotation_filter=None, filtered_only=False):
-    annotations = []
+class AnnotationIndex(object):
+    '''
+    Parsed annotations file, indexed by protection technique and source file
+
+    The indexes are kept in memory and reused until the file changes (mtime,
+    size, inode): the folders suffixes and the annotation tasks share the same
+    parse.
+    '''
+    _INDEXES = dict()
 
-    # load annotations file
-    with open(annotation_file, 'r') as af:
-        annotations.extend(load(af))
+    def __init__(self, annotation_file):
+        '''
+        Constructor
 
-    # filter on source file
-    annotations = [a for a in annotations if (not source_file or ('file name' in a and a['file name'] == source_file))]
+        @param annotation_file [in] (str) annotations file (json)
+        '''
+        with open(annotation_file, 'r') as af:
+            self._annotations = load(af)
+        # end with
 
-    # filter on protection technique
-    for annotation in annotations:
-        annotation['filtered'] = {}
-        for p, a in ((p, a) for (p, a) in parseAnnotationContent(annotation['annotation content']) if (not annotation_filter) or (p in annotation_filter)):
-            if(annotation['filtered'].has_key(p)):
-                annotation['filtered'][p] += ', ' + a
-            else:
-                annotation['filtered'][p] = a
+        # Protection techniques of each annotation, and the inverted indexes
+        self._techniques = []
+        self._byTechnique = dict()
+        self._byFile = dict()
+        self._byName = dict()
+        for i, annotation in enumerate(self._annotations):
+            techniques = parseAnnotationContent(annotation['annotation content'])
+            self._techniques.append(techniques)
+
+            for technique in set(p for p, _ in techniques):
+                self._byTechnique.setdefault(technique, []).append(i)
+            # end for
+
+            if 'file name' in annotation:
+                self._byFile.setdefault(annotation['file name'], set()).add(i)
+                self._byName.setdefault(basename(annotation['file name']), set()).add(i)
             # end if
         # end for
-    # end for
+    # end def __init__
+
+    @classmethod
+    def get(cls, annotation_file):
+        '''
+        Get the index of an annotations file, parsed once per version
+
+        @param annotation_file [in] (str) annotations file (json)
+
+        @return (AnnotationIndex)
+        '''
+        path = abspath(annotation_file)
+        info = stat(path)
+        key  = (info.st_mtime, info.st_size, info.st_ino)
+
+        version, index = cls._INDEXES.get(path, (None, None))
+        if version != key:
+            index = cls(path)
+            cls._INDEXES[path] = (key, index)
+        # end if
+
+        return index
+    # end def get
+
+    def filter(self, source_file=None, annotation_filter=None, filtered_only=False, source_name=None):
+        '''
+        Select annotations
+
+        @option source_file       [in] (str)  keep the annotations of this file
+        @option annotation_filter [in] (list) protection techniques to keep
+        @option filtered_only     [in] (bool) drop the annotations without kept technique
+        @option source_name       [in] (str)  keep the annotations of the files with this base name
+
+        @return (list) copies of the annotations, with the kept techniques in 'filtered'
+        '''
+        if filtered_only:
+            techniques = annotation_filter if annotation_filter else self._byTechnique.keys()
+            indexes = sorted(set(i for p in techniques for i in self._byTechnique.get(p, ())))
+        else:
+            indexes = xrange(len(self._annotations))
+        # end if
+
+        if source_file:
+            in_file = self._byFile.get(source_file, set())
+            indexes = [i for i in indexes if i in in_file]
+        # end if
+
+        if source_name:
+            in_file = self._byName.get(source_name, set())
+            indexes = [i for i in indexes if i in in_file]
+        # end if
+
+        annotations = []
+        for i in indexes:
+            annotation = dict(self._annotations[i])
+            annotation['filtered'] = {}
+            for p, a in self._techniques[i]:
+                if (not annotation_filter) or (p in annotation_filter):
+                    if(annotation['filtered'].has_key(p)):
+                        annotation['filtered'][p] += ', ' + a
+                    else:
+                        annotation['filtered'][p] = a
+                    # end if
+                # end if
+            # end for
+            annotations.append(annotation)
+        # end for
 
-    if filtered_only:
-        # return only the filtered annotations
-        return [a for a in annotations if 'filtered' in a and a['filtered']]
-    else:
         return annotations
+    # end def filter
+
+# end class AnnotationIndex
+
+def filterAnnotations(annotation_file, source_file=None, annotation_filter=None, filtered_only=False, source_name=None):
+    return AnnotationIndex.get(annotation_file).filter(source_file, annotation_filter, filtered_only, source_name)
 # end def filterAnnotations
 
 # '#define DOBFS __attribute__((ASPIRE("protection(xor,mask(constant(35)))")))'
 
-_RE_PROTECTION_TECHNIQUE = r'protection\s*\((.*?)\s*(?=\(|\)|,)'
-_RE_PROTECTION_ANNOTATION = r'protection\s*\(.*?(?=,\s*protection|$)'
-def parseAnnotationContent(annotation_content):
-    ret = re.compile(_RE_PROTECTION_TECHNIQUE)
-    rea = re.compile(_RE_PROTECTION_ANNOTATION)
+# protection(technique, parameters...) up to the next ', protection' or the end: the
+# commas are only checked for a following protection (no lazy lookahead at every char)
+_RE_PROTECTION_ANNOTATION = re.compile(r'protection\s*\([^,\n]*(?:,(?!\s*protection)[^,\n]*)*(?=,\s*protection|$)')
+_RE_PROTECTION_TECHNIQUE = re.compile(r'protection\s*\((.*?)\s*(?=\(|\)|,)')
+
+# Protection up to its closing bracket, for up to _BRACKETS_DEPTH nested brackets
+_BRACKETS_DEPTH = 8
+_RE_BRACKETS = r'[^()]*'
+for _ in range(_BRACKETS_DEPTH):
+    _RE_BRACKETS = r'[^()]*(?:\(' + _RE_BRACKETS + r'\)[^()]*)*'
+# end for
+_RE_PROTECTION_CALL = re.compile(r'protection\s*\(' + _RE_BRACKETS + r'\)')
+
+_RE_PARAMETER_TOKEN = re.compile(r'([(),])')
+_WHITESPACES = ' \t\n\r\f\v'
+
+def parseParameters(annotation):
+    """Parse the parameters of a protection: a string for a leaf, a (name, parameters)
+    tuple for a call"""
+    stack = [[]]
+    parts = _RE_PARAMETER_TOKEN.split(annotation[annotation.index('(') + 1:])
+    for i in xrange(0, len(parts) - 1, 2):
+        item = parts[i].strip(_WHITESPACES)
+        token = parts[i + 1]
+        if(token == '('):
+            stack[-1].append((item, []))
+            stack.append(stack[-1][-1][1])
+        else:
+            if(item):
+                stack[-1].append(item)
+            # end if
+            if(token == ')'):
+                if(len(stack) == 1):
+                    break
+                # end if
+                stack.pop()
+            # end if
+        # end if
+    # end for
+
+    # Skip the technique
+    return stack[0][1:]
+# end def parseParameters
 
+def parseAnnotationContent(annotation_content):
     rv = []
-    annotations = rea.findall(annotation_content)
-    for annotation in annotations:
-        technique = ret.match(annotation).group(1)
-        annotation = matchBrackets(annotation)
-        rv.append((technique, annotation))
+    for annotation in _RE_PROTECTION_ANNOTATION.findall(annotation_content):
+        technique = _RE_PROTECTION_TECHNIQUE.match(annotation)
+        if(technique is None):
+            raise ValueError('Invalid annotation: %s' % (annotation,))
+        # end if
+
+        call = _RE_PROTECTION_CALL.match(annotation)
+        rv.append((technique.group(1), call.group() if call else matchBrackets(annotation)))
     # end for
 
     return rv
 # end def parseAnnotationContent
 
+def parseProtections(annotation_content):
+    """Parse the protections of an annotation
+
+    Returns a list of (technique, parameters, annotation), see parseParameters"""
+    return [(technique, parseParameters(annotation), annotation)
+            for technique, annotation in parseAnnotationContent(annotation_content)]
+# end def parseProtections
+
 def matchBrackets(string):
     """Remove characters after final closed bracket"""
     count = 0
@@ -525,14 +847,22 @@ def updateFolders(task_folders, annotations_file, annotations_list):
         return
     # end if
 
+    # Each folder hash chains the previous one and the annotations of its task:
+    # the suffixes only depend on the annotations, not on the Python build.
     annotations_hash = ""
+    hashes = dict()
     for task, folders in task_folders.items():
 #             # Filter annotations based on protection filter
         filter = annotations_list.get(task) if annotations_list.get(task) else ['DUMMY']
-        annotations = filterAnnotations(annotations_file, annotation_filter=filter, filtered_only=True)
 
-        if annotations:
-            annotations_hash = str(hash((annotations_hash, make_hash(annotations)))).encode('hex')
+        # Several tasks share the same filter
+        if tuple(filter) not in hashes:
+            annotations = filterAnnotations(annotations_file, annotation_filter=filter, filtered_only=True)
+            hashes[tuple(filter)] = make_digest(annotations) if annotations else None
+        # end if
+
+        if hashes[tuple(filter)] is not None:
+            annotations_hash = make_digest([annotations_hash, hashes[tuple(filter)]])
 #         print task, (len(annotations)) , annotations_hash
 
         suffix = ('-' + annotations_hash) if annotations_hash else ''
@@ -543,8 +873,8 @@ def updateFolders(task_folders, annotations_file, annotations_list):
 
 # end def updateFolders
 
-def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
-    """ Generate External annotations json file and replace annotations by placeholders in the source file"""
+def _placeholders(lines, source_file, start_id):
+    """Replace the annotations of the lines by placeholders numbered from start_id"""
     placeholder = 'protection(placeHolder, id(%s))'
     attribute_match_r = re.compile(_RE_ATTRIBUTE_MATCH % '.*')
     attribute_replace = ATTRIBUTE_REPLACE % placeholder
@@ -554,9 +884,8 @@ def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
     annotation_id = start_id
 
     replace_annotations = []
-
-    # STDOUT redirected to file, magic!
-    for line in fileinput.input(source_file, inplace=True):
+    new_lines = []
+    for line in lines:
 
         # Replace attribute or annotation with placeholders
         new_line, r1 = re.subn(attribute_match_r, attribute_replace % (annotation_id), line)
@@ -564,9 +893,6 @@ def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
 
         # If replacement happend store annotation in replace_annotations
         if(r1 + r2 == 1):
-            sys.stderr.write(line)
-            sys.stderr.write(new_line)
-
             annotations = parseAnnotationContent(line)
 
             # Create annotation entry for json file
@@ -574,18 +900,27 @@ def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
             entry['file name'] = source_file
             entry['id'] = annotation_id
             entry['annotation content'] = ', '.join([a[1] for a in annotations])
-            sys.stderr.write(str(entry))
             replace_annotations.append(entry)
 
-            sys.stderr.write('\n')
-
             annotation_id += 1
         # end if
 
-        # output to file
-        print new_line,
+        new_lines.append(new_line)
     # end for
 
+    return new_lines, replace_annotations
+# end def _placeholders
+
+def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
+    """ Generate External annotations json file and replace annotations by placeholders in the source file"""
+    with open(source_file, 'r') as fi:
+        new_lines, replace_annotations = _placeholders(fi.readlines(), source_file, start_id)
+    # end with
+
+    with open(source_file, 'w') as fo:
+        fo.writelines(new_lines)
+    # end with
+
     # write annotations to patch file
     with open(json_file, 'w') as fo:
         dump(replace_annotations, fo,
@@ -594,9 +929,288 @@ def generateExternalAnnotations(source_file, start_id, patch_file, json_file):
                 sort_keys=True)
     # end with
 
-    return replace_annotations, annotation_id
+    return replace_annotations, start_id + len(replace_annotations)
 # end def generateExternalAnnotations
 
+def _countAnnotations(job):
+    """Worker: number of annotations of a source file, job is (root, name)"""
+    root, name = job
+    with open(join(root, name), 'r') as fi:
+        return len(_placeholders(fi, name, 0)[1])
+    # end with
+# end def _countAnnotations
+
+def _diffAnnotations(job):
+    """Worker: annotations of a source file and the patch replacing them by placeholders,
+    job is (root, name, start_id), the patch paths are relative to the root (patch -p0)"""
+    root, name, start_id = job
+    with open(join(root, name), 'r') as fi:
+        lines = fi.readlines()
+    # end with
+
+    new_lines, replace_annotations = _placeholders(lines, name, start_id)
+    if(not replace_annotations):
+        return replace_annotations, ''
+    # end if
+
+    patch = []
+    for line in unified_diff(lines, new_lines, name, name):
+        patch.append(line)
+
+        # Last line without end of line
+        if(not line.endswith('\n')):
+            patch.append('\n\\ No newline at end of file\n')
+        # end if
+    # end for
+
+    return replace_annotations, ''.join(patch)
+# end def _diffAnnotations
+
+def generateTreeAnnotations(root, json_file, patch_file, start_id=0, patterns=SOURCE_PATTERNS, jobs=CFG_JOBS):
+    """ Generate the external annotations json file and the patch replacing the annotations
+    by placeholders for all the source files of a tree, the tree is left unchanged.
+
+    The files are scanned in parallel: the annotations are counted first to reserve the IDs
+    of each file, so the output is the same as a serial run over the sorted files."""
+    names = []
+    for folder, _, files in walk(root):
+        names.extend(relpath(join(folder, name), root)
+                     for name in files if any(fnmatch(name, pattern) for pattern in patterns))
+    # end for
+    names.sort()
+
+    pool = Pool(jobs)
+    try:
+        # First ID of each file
+        counts = pool.map(_countAnnotations, [(root, name) for name in names], chunksize=16)
+        starts = []
+        for count in counts:
+            starts.append(start_id)
+            start_id += count
+        # end for
+
+        results = pool.map(_diffAnnotations,
+                           [(root, name, start) for name, start, count in zip(names, starts, counts) if count],
+                           chunksize=4)
+    finally:
+        pool.close()
+        pool.join()
+    # end try
+
+    replace_annotations = [entry for entries, _ in results for entry in entries]
+
+    with open(json_file, 'w') as fo:
+        dump(replace_annotations, fo,
+                indent=2,
+                separators=(',', ': '),
+                sort_keys=True)
+    # end with
+
+    with open(patch_file, 'w') as fo:
+        fo.writelines(patch for _, patch in results)
+    # end with
+
+    return replace_annotations, start_id
+# end def generateTreeAnnotations
+
+# Preprocessed sources: line markers and annotations
+_RE_LINE_MARKER = re.compile(r'\s*#\s*(?:line\s+)?(\d+)\s+"((?:[^"\\]|\\.)*)"')
+_RE_PRAGMA_ANNOTATION = re.compile(r'\s*#\s*pragma\s+ASPIRE\s+begin\s+(.*?)\s*$')
+_RE_STRING_ANNOTATION = re.compile(r'(?:_Pragma\s*\(\s*"\s*ASPIRE\s+begin\s+'
+                                   r'|__attribute__\s*\(\s*\(\s*ASPIRE\s*\(\s*")((?:[^"\\]|\\.)*)"')
+_RE_STRING_ESCAPE = re.compile(r'\\(.)')
+
+def _scanAnnotations(lines, file_name):
+    """ Annotations of preprocessed source lines: (file name, line number, annotation type,
+    annotation content)
+
+    The file name and line number come from the line markers, the pragmas are "code"
+    annotations, the attributes "data" annotations."""
+    line_number = 0
+    for line in lines:
+        line_number += 1
+        if('#' in line):
+            marker = _RE_LINE_MARKER.match(line)
+            if(marker):
+                line_number = int(marker.group(1)) - 1
+                file_name = _RE_STRING_ESCAPE.sub(r'\1', marker.group(2))
+                continue
+            # end if
+        # end if
+
+        if('ASPIRE' not in line):
+            continue
+        # end if
+
+        pragma = _RE_PRAGMA_ANNOTATION.match(line)
+        if(pragma):
+            yield file_name, line_number, 'code', pragma.group(1)
+            continue
+        # end if
+
+        for match in _RE_STRING_ANNOTATION.finditer(line):
+            yield (file_name, line_number,
+                   'code' if match.group().startswith('_Pragma') else 'data',
+                   _RE_STRING_ESCAPE.sub(r'\1', match.group(1)).rstrip())
+        # end for
+    # end for
+# end def _scanAnnotations
+
+def extractAnnotations(source_file, json_file):
+    """ Extract the annotations of a preprocessed source file into a json file
+
+    Same entries as the external annotation extractor (see _scanAnnotations)."""
+    with open(source_file, 'r') as fi:
+        # No line marker: the preprocessed file itself
+        annotations = [{'file name': file_name,
+                        'line number': line_number,
+                        'annotation type': annotation_type,
+                        'annotation content': content}
+                       for file_name, line_number, annotation_type, content
+                       in _scanAnnotations(fi, basename(source_file))]
+    # end with
+
+    with open(json_file, 'w') as fo:
+        dump(annotations, fo,
+                indent=2,
+                separators=(',', ': '),
+                sort_keys=True)
+    # end with
+
+    return annotations
+# end def extractAnnotations
+
+def _extractAnnotations((source_file, json_file)):
+    """Worker: extractAnnotations"""
+    return len(extractAnnotations(source_file, json_file))
+# end def _extractAnnotations
+
+def extractFolderAnnotations(sources, output_folder, jobs=CFG_JOBS):
+    """ Extract the annotations of preprocessed source files (<file> --> <output_folder>/<file>.json)
+    in parallel, return the number of annotations"""
+    pool = Pool(jobs)
+    try:
+        counts = pool.map(_extractAnnotations,
+                          [(source, join(output_folder, basename(source) + '.json')) for source in sources],
+                          chunksize=4)
+    finally:
+        pool.close()
+        pool.join()
+    # end try
+
+    return sum(counts)
+# end def extractFolderAnnotations
+
+# Protection techniques of the preprocessed files: path -> ((mtime, size, inode), techniques)
+_TECHNIQUES = dict()
+
+def sourceTechniques(source_file):
+    """ Protection techniques annotated in a preprocessed source file, scanned once per
+    version of the file (mtime, size, inode)"""
+    path = abspath(source_file)
+    info = stat(path)
+    key  = (info.st_mtime, info.st_size, info.st_ino)
+
+    version, techniques = _TECHNIQUES.get(path, (None, None))
+    if version != key:
+        with open(path, 'r') as fi:
+            text = fi.read()
+        # end with
+
+        techniques = set()
+        # Most of the files are not annotated at all
+        if('ASPIRE' in text):
+            for _, _, _, content in _scanAnnotations(text.splitlines(), path):
+                techniques.update(technique.strip() for technique, _ in parseAnnotationContent(content))
+            # end for
+        # end if
+
+        techniques = frozenset(techniques)
+        _TECHNIQUES[path] = (key, techniques)
+    # end if
+
+    return techniques
+# end def sourceTechniques
+
+class Unannotated(object):
+    """ Predicate: the preprocessed source file carries none of the protection techniques
+
+    Used to pass the files through the src2src stages (see actc.tools.PassThroughCmdAction);
+    the files with an invalid annotation are processed."""
+
+    def __init__(self, techniques):
+        self._techniques = frozenset(techniques)
+    # end def __init__
+
+    def __call__(self, source_file):
+        try:
+            return not (sourceTechniques(source_file) & self._techniques)
+        except ValueError:
+            return False
+        # end try
+    # end def __call__
+
+# end class Unannotated
+
+def main():
+    """Command line: generate the external annotations of a source tree, or extract
+    the annotations of preprocessed files"""
+    parser = ArgumentParser(description='Replace the annotations of a source tree by placeholders '
+                                        '(external annotations json file and patch)')
+    parser.add_argument('root',
+                        metavar = 'DIR',
+                        help    = 'source tree')
+    parser.add_argument('-o', '--output',
+                        metavar = 'FILE',
+                        default = 'annotations.json',
+                        help    = 'external annotations file [%(default)s]')
+    parser.add_argument('-p', '--patch',
+                        metavar = 'FILE',
+                        default = 'annotations.patch',
+                        help    = 'patch file, apply with patch -p0 in the root [%(default)s]')
+    parser.add_argument('-s', '--start-id',
+                        metavar = 'N',
+                        type    = int,
+                        default = 0,
+                        help    = 'first placeholder ID [%(default)s]')
+    parser.add_argument('-j', '--jobs',
+                        metavar = 'N',
+                        type    = int,
+                        default = CFG_JOBS,
+                        help    = 'allow 1..N jobs at once [%(default)s]')
+    parser.add_argument('--pattern',
+                        action  = 'append',
+                        default = None,
+                        help    = 'source file pattern, repeat for several patterns [%s]'
+                                  % (', '.join(SOURCE_PATTERNS),))
+    parser.add_argument('-x', '--extract',
+                        metavar = 'DIR',
+                        default = None,
+                        help    = 'extract the annotations of the preprocessed files (*.i) into DIR/<file>.json')
+    args = parser.parse_args()
+
+    if args.extract is not None:
+        sources = []
+        for folder, _, files in walk(args.root):
+            sources.extend(join(folder, name)
+                           for name in files if any(fnmatch(name, pattern) for pattern in args.pattern or ['*.i']))
+        # end for
+        count = extractFolderAnnotations(sorted(sources), args.extract, jobs=args.jobs)
+        print('%d annotations: %d files into %s' % (count, len(sources), args.extract))
+        return
+    # end if
+
+    annotations, _ = generateTreeAnnotations(args.root, args.output, args.patch,
+                                             start_id=args.start_id,
+                                             patterns=args.pattern or SOURCE_PATTERNS,
+                                             jobs=args.jobs)
+    print('%d annotations: %s, %s' % (len(annotations), args.output, args.patch))
+# end def main
+
+if __name__ == '__main__':
+    main()
+# end if
+
 # ------------------------------------------------------------------------------
 # END OF FILE
 # ------------------------------------------------------------------------------
@@ -0,0 +1,598 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.tools.cache
+
+@brief   Content-addressed artifact cache
+
+@author  Ronan Le Gallic
+
+@date    2014/10/07
+'''
+# ------------------------------------------------------------------------------
+# imports
+# ------------------------------------------------------------------------------
+from contextlib                 import contextmanager
+from fcntl                      import LOCK_EX
+from fcntl                      import LOCK_NB
+from fcntl                      import LOCK_UN
+from fcntl                      import flock
+from hashlib                    import sha256
+from json                       import dump
+from json                       import load
+from multiprocessing            import Array
+from multiprocessing            import Value
+from os                         import X_OK
+from os                         import access
+from os                         import environ
+from os                         import listdir
+from os                         import makedirs
+from os                         import pathsep
+from os                         import remove
+from os                         import rename
+from os                         import stat
+from os                         import utime
+from os.path                    import basename
+from os.path                    import dirname
+from os.path                    import getsize
+from os.path                    import isdir
+from os.path                    import isfile
+from os.path                    import join
+from shutil                     import copyfile
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+import re
+
+from doit.action                import CmdAction
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+def digest(path):
+    '''
+    Compute the digest of a file content
+
+    @param path [in] (str) file
+
+    @return (str) hex digest
+    '''
+    md = sha256()
+
+    with open(path, 'rb') as fo:
+        for chunk in iter(lambda: fo.read(1 << 16), ''):
+            md.update(chunk)
+        # end for
+    # end with
+
+    return md.hexdigest()
+# end def digest
+
+
+def which(name):
+    '''
+    Locate an executable, a bare name being searched in the PATH folders
+
+    @param name [in] (str) executable
+
+    @return (str, None) path, None: not found
+    '''
+    if (basename(name) != name):
+        return name if isfile(name) else None
+    # end if
+
+    for folder in environ.get('PATH', '').split(pathsep):
+        path = join(folder or '.', name)
+
+        if (    isfile(path)
+            and access(path, X_OK)):
+            return path
+        # end if
+    # end for
+
+    return None
+# end def which
+
+
+class ArtifactCache(object):
+    '''
+    Local content-addressed store of task targets
+
+    <path>/<key[:2]>/<key>/<n> holds the n-th target of a task, the entries
+    being evicted in least recently used order when the store exceeds its size.
+
+    Paths below the relocated roots (the output folders of the modules, the
+    build folder) are not part of the keys.
+
+    The counters and the store size are shared by the jobs of a build (forked
+    after the store creation), the counters being saved once per build.
+    '''
+
+    _STATS = ('hits', 'misses', 'stores', 'evictions')
+
+    def __init__(self, path, size = 1 << 30):
+        '''
+        Constructor
+
+        @param  path [in] (str) store folder
+        @option size [in] (int) maximum store size in bytes
+        '''
+        self._path  = path
+        self._size  = size
+        self._roots = list()
+
+        # Counters not saved yet, running store size (-1: not computed)
+        self._counters = Array('l', len(self._STATS))
+        self._total    = Value('l', -1)
+
+        if (not isdir(path)):
+            makedirs(path)
+        # end if
+    # end def __init__
+
+    def relocate(self, outputs, base = None):
+        '''
+        Set the roots not part of the keys
+
+        @param  outputs [in] (list) output folders (e.g. of several modules)
+        @option base    [in] (str)  build folder (sources, configuration)
+        '''
+        self._roots = list()
+
+        for roots, name in ((outputs, '<output>'), ([base] if base else [], '<base>')):
+            roots = sorted(roots, key = len, reverse = True)
+
+            if (roots):
+                self._roots.append((re.compile('|'.join(re.escape(root) + r'(?=/|\s|"|$)'
+                                                        for root in roots)), name))
+            # end if
+        # end for
+    # end def relocate
+
+    def relocated(self, text):
+        '''
+        Replace the relocated roots by their names
+
+        @param text [in] (str) path, command line
+
+        @return (str)
+        '''
+        # Output folders first: they are below the build folder
+        for roots, name in self._roots:
+            text = roots.sub(name, text)
+        # end for
+
+        return text
+    # end def relocated
+
+    def key(self, program, command, file_dep, contents = ()):
+        '''
+        Compute the key of a task
+
+        @param  program  [in] (list) executable [script]
+        @param  command  [in] (str)  expanded command line
+        @param  file_dep [in] (list) input files
+        @option contents [in] (list) other inputs (e.g. preprocessed source), as is
+
+        @return (str) hex digest
+        '''
+        md = sha256()
+
+        # Tool path and version (executable size and time stamp)
+        for name in program:
+            md.update(self.relocated(name))
+
+            path = which(name)
+
+            if (path is not None):
+                st = stat(path)
+                md.update('%d:%d' % (st.st_size, st.st_mtime))
+            # end if
+        # end for
+
+        md.update(self.relocated(command))
+
+        for path, dep in sorted((self.relocated(dep), dep) for dep in file_dep):
+            md.update(path)
+            md.update(digest(dep))
+        # end for
+
+        for content in contents:
+            md.update(sha256(content).hexdigest())
+        # end for
+
+        return md.hexdigest()
+    # end def key
+
+    def _entry(self, key):
+        '''
+        Get entry folder
+
+        @param key [in] (str) hex digest
+
+        @return (str)
+        '''
+        return join(self._path, key[:2], key)
+    # end def _entry
+
+    @contextmanager
+    def lock(self, key, wait = True):
+        '''
+        Serialize the accesses to an entry (restore, store, eviction)
+
+        @param  key  [in] (str)  hex digest
+        @option wait [in] (bool) False: do not wait for a locked entry
+
+        @return (bool) locked (always True when waiting)
+        '''
+        folder = join(self._path, 'locks')
+
+        if (not isdir(folder)):
+            try:
+                makedirs(folder)
+            except OSError:
+                # Created by a concurrent job
+                pass
+            # end try
+        # end if
+
+        with open(join(folder, key), 'a') as fo:
+            try:
+                flock(fo, LOCK_EX if wait else LOCK_EX | LOCK_NB)
+            except IOError:
+                # Locked by a concurrent job
+                yield False
+                return
+            # end try
+
+            try:
+                yield True
+            finally:
+                flock(fo, LOCK_UN)
+            # end try
+        # end with
+    # end def lock
+
+    def restore(self, key, targets):
+        '''
+        Restore targets from the store
+
+        @param key     [in] (str)  hex digest
+        @param targets [in] (list) paths
+
+        @return (bool) hit
+        '''
+        entry = self._entry(key)
+
+        if (   not isdir(entry)
+            or not all(isfile(join(entry, str(i))) for i in range(len(targets)))):
+            self.count('misses')
+            return False
+        # end if
+
+        for i, target in enumerate(targets):
+            copyfile(join(entry, str(i)), target)
+        # end for
+
+        # Least recently used
+        utime(entry, None)
+
+        self.count('hits')
+        return True
+    # end def restore
+
+    def store(self, key, targets):
+        '''
+        Store targets
+
+        @param key     [in] (str)  hex digest
+        @param targets [in] (list) paths
+        '''
+        entry = self._entry(key)
+
+        if (   isdir(entry)
+            or not all(isfile(target) for target in targets)):
+            return
+        # end if
+
+        if (not isdir(dirname(entry))):
+            try:
+                makedirs(dirname(entry))
+            except OSError:
+                # Created by a concurrent job
+                pass
+            # end try
+        # end if
+
+        tmp = mkdtemp(prefix = '.tmp', dir = self._path)
+
+        for i, target in enumerate(targets):
+            copyfile(target, join(tmp, str(i)))
+        # end for
+
+        try:
+            rename(tmp, entry)
+        except OSError:
+            # Stored by a concurrent job
+            rmtree(tmp, ignore_errors = True)
+            return
+        # end try
+
+        self.count('stores')
+
+        size = sum(getsize(target) for target in targets)
+
+        with self._total.get_lock():
+            if (self._total.value < 0):
+                self._total.value = self._scan()[1]
+            else:
+                self._total.value += size
+            # end if
+
+            if (self._total.value > self._size):
+                self.evict()
+            # end if
+        # end with
+    # end def store
+
+    def _scan(self):
+        '''
+        List the entries
+
+        @return (tuple) (mtime, entry, size) list, total size
+        '''
+        entries = list()
+        total   = 0
+
+        for prefix in listdir(self._path):
+            folder = join(self._path, prefix)
+
+            if (   (len(prefix) != 2)
+                or not isdir(folder)):
+                continue
+            # end if
+
+            for key in listdir(folder):
+                entry = join(folder, key)
+                size  = sum(getsize(join(entry, name)) for name in listdir(entry))
+                entries.append((stat(entry).st_mtime, entry, size))
+                total += size
+            # end for
+        # end for
+
+        return entries, total
+    # end def _scan
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the store fits in 3/4 of its
+        size: the next stores do not scan the store again
+
+        The entries locked (being restored or stored) are kept.
+        '''
+        entries, total = self._scan()
+
+        for _, entry, size in sorted(entries):
+            if (total <= self._size * 3 / 4):
+                break
+            # end if
+
+            key = basename(entry)
+
+            with self.lock(key, wait = False) as locked:
+                if (not locked):
+                    continue
+                # end if
+
+                rmtree(entry, ignore_errors = True)
+
+                try:
+                    remove(join(self._path, 'locks', key))
+                except OSError:
+                    pass
+                # end try
+            # end with
+
+            total -= size
+            self.count('evictions')
+        # end for
+
+        with self._total.get_lock():
+            self._total.value = total
+        # end with
+    # end def evict
+
+    def count(self, name):
+        '''
+        Increment a counter (shared by the concurrent jobs, see save)
+
+        @param name [in] (str) counter
+        '''
+        with self._counters.get_lock():
+            self._counters[self._STATS.index(name)] += 1
+        # end with
+    # end def count
+
+    def _load(self):
+        '''
+        Get the saved counters
+
+        @return (dict) hits, misses, stores, evictions
+        '''
+        stats = dict((name, 0) for name in self._STATS)
+        path  = join(self._path, 'stats.json')
+
+        if isfile(path):
+            with open(path, 'r') as fo:
+                stats.update(load(fo))
+            # end with
+        # end if
+
+        return stats
+    # end def _load
+
+    def save(self):
+        '''
+        Add the counters of the build to the saved ones (shared by the
+        concurrent builds)
+        '''
+        with open(join(self._path, 'stats.lock'), 'a') as lock:
+            flock(lock, LOCK_EX)
+
+            stats = self._load()
+
+            with self._counters.get_lock():
+                for i, name in enumerate(self._STATS):
+                    stats[name] += self._counters[i]
+                    self._counters[i] = 0
+                # end for
+            # end with
+
+            with open(join(self._path, 'stats.json') + '.tmp', 'w') as fo:
+                dump(stats, fo)
+            # end with
+            rename(join(self._path, 'stats.json') + '.tmp', join(self._path, 'stats.json'))
+        # end with
+    # end def save
+
+    def stats(self):
+        '''
+        Get counters, saved or not
+
+        @return (dict) hits, misses, stores, evictions
+        '''
+        stats = self._load()
+
+        with self._counters.get_lock():
+            for i, name in enumerate(self._STATS):
+                stats[name] += self._counters[i]
+            # end for
+        # end with
+
+        return stats
+    # end def stats
+
+# end class ArtifactCache
+
+
+# Store used by the cacheable tools (None: disabled)
+_CACHE = [None]
+
+def setCache(cache):
+    '''
+    Enable (or disable) the artifact cache
+
+    @param cache [in] (ArtifactCache, None) store
+    '''
+    _CACHE[0] = cache
+# end def setCache
+
+
+def getCache():
+    '''
+    Get the artifact cache
+
+    @return (ArtifactCache, None)
+    '''
+    return _CACHE[0]
+# end def getCache
+
+
+class CachedCmdAction(CmdAction):
+    '''
+    "cmd-action" restoring its targets from the artifact cache
+    '''
+
+    def __init__(self, action, program, **kwargs):
+        '''
+        Constructor
+
+        @param action  [in] (str, list, callable) command
+        @param program [in] (list) executable [script]
+        @param kwargs  [in] (dict) see doit.action.CmdAction
+        '''
+        super(CachedCmdAction, self).__init__(action, **kwargs)
+        self._program = program
+    # end def __init__
+
+    def _key(self, cache):
+        '''
+        Compute the key of the task
+
+        @param cache [in] (ArtifactCache) store
+
+        @return (str, None) hex digest, None: not cached
+        '''
+        return cache.key(self._program,
+                         self.expand_action(),
+                         self.task.file_dep)
+    # end def _key
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        cache = getCache()
+
+        if (   (cache is None)
+            or not self.task.targets):
+            return super(CachedCmdAction, self).execute(out = out, err = err)
+        # end if
+
+        key = self._key(cache)
+
+        if (key is None):
+            return super(CachedCmdAction, self).execute(out = out, err = err)
+        # end if
+
+        # The command itself runs unlocked: concurrent identical jobs may both
+        # run it, the first store winning
+        with cache.lock(key):
+            hit = cache.restore(key, self.task.targets)
+        # end with
+
+        if hit:
+            return None
+        # end if
+
+        error = super(CachedCmdAction, self).execute(out = out, err = err)
+
+        if (error is None):
+            with cache.lock(key):
+                cache.store(key, self.task.targets)
+            # end with
+        # end if
+
+        return error
+    # end def execute
+
+# end class CachedCmdAction
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
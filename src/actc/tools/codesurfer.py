@@ -37,8 +37,6 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from glob                       import glob
-from os.path                    import abspath
 from os.path                    import dirname
 from os.path                    import join
 
@@ -46,6 +44,7 @@ from doit.action                import CmdAction
 
 from actc.tools                 import AbstractCmdTool
 from actc.tools                 import AbstractBasicCmdTool
+from actc.tools                 import expand
 from actc.tools                 import toList
 
 # ------------------------------------------------------------------------------
@@ -120,7 +119,7 @@ class CodeSurferInitializer(AbstractCmdTool):
         preps = list()
 
         for arg in toList(args[0]):
-            preps.extend(glob(abspath(arg)))
+            preps.extend(expand(arg))
         # end for
 
         if (not preps):
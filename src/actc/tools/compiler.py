@@ -38,20 +38,50 @@
 # imports
 # ------------------------------------------------------------------------------
 from glob                       import glob
-from glob                       import iglob
+from hashlib                    import sha256
+from json                       import dump
+from json                       import load
+from os                         import getcwd
+from os                         import getpid
+from os                         import remove
+from os                         import rename
+from os                         import stat
 from os.path                    import abspath
-from os.path                    import getsize
 from os.path                    import basename
+from os.path                    import dirname
+from os.path                    import isabs
+from os.path                    import isfile
 from os.path                    import join
-
+from os.path                    import splitext
+from shutil                     import copyfile
+from shutil                     import rmtree
+from tempfile                   import mkdtemp
+import re
+import sys
+
+from re                         import split
 from re                         import sub
-
+from shlex                      import split as shell_split
+from subprocess                 import PIPE
+from subprocess                 import Popen
 
 from doit.action                import CmdAction
+from doit.dependency            import get_file_md5
+from doit.exceptions            import TaskFailed
 
 from actc.tools                 import AbstractBasicCmdTool
 from actc.tools                 import AbstractCmdTool
+from actc.tools                 import createFolder
+from actc.tools                 import expand
+from actc.tools                 import isEmpty
+from actc.tools                 import linkFile
+from actc.tools                 import plannedBy
 from actc.tools                 import toList
+from actc.tools                 import unlinkShared
+from actc.tools.cache           import CachedCmdAction
+from actc.tools.cache           import digest
+from actc.tools.cache           import which
+from actc.tools.utils           import make_digest
 
 # ------------------------------------------------------------------------------
 # implementation
@@ -60,6 +90,908 @@ from actc.tools                 import toList
 FRONTEND = 'gcc'
 FRONTEND_FORTRAN = 'gfortran'
 
+
+def _depfile(target):
+    '''
+    Get the dependency file written by the compiler (-MMD -MF)
+
+    @param target [in] (str) compiler output
+
+    @return (str) path
+    '''
+    return target + '.d'
+# end def _depfile
+
+
+def _readDepfile(depfile):
+    '''
+    Read the headers of a compiler dependency file (-MMD -MF)
+
+    @param depfile [in] (str) compiler dependency file
+
+    @return (list) paths
+    '''
+    with open(depfile) as fo:
+        rule = fo.read().replace('\\\n', ' ')
+    # end with
+
+    # target: source header...
+    return [name.replace('\\ ', ' ')
+            for name in split(r'(?<!\\)\s+', rule.split(':', 1)[-1].strip())
+            if name]
+# end def _readDepfile
+
+
+def _fileState(path):
+    '''
+    Get the state of a file, as stored in the DoIt dependency file
+
+    @param path [in] (str) file
+
+    @return (list) mtime, size, md5
+    '''
+    st = stat(path)
+    return [st.st_mtime, st.st_size, get_file_md5(path)]
+# end def _fileState
+
+
+def _recordHeaders(source, depfile, patterns):
+    '''
+    Record the headers included by a source (python-action)
+
+    The headers are read from the compiler dependency file, then removed.
+    Without dependency file (e.g. output restored from the artifact cache),
+    all the headers matching the patterns are recorded.
+
+    @param source   [in] (str)  source file
+    @param depfile  [in] (str)  compiler dependency file
+    @param patterns [in] (list) header glob patterns
+
+    @return (dict) task values: headers, path --> (mtime, size, md5)
+    '''
+    if (isfile(depfile)):
+        paths = _readDepfile(depfile)
+        remove(depfile)
+    else:
+        paths = [path for pattern in patterns for path in glob(pattern)]
+    # end if
+
+    source = abspath(source)
+    paths  = set(abspath(path) for path in paths) - set([source])
+
+    return {'headers': dict((path, _fileState(path)) for path in paths)}
+# end def _recordHeaders
+
+
+def _headersUpToDate(task, values):                                             # pylint:disable=W0613
+    '''
+    Check the recorded headers are unchanged (uptodate callable)
+
+    @param task   [in] (Task) task
+    @param values [in] (dict) values saved by the previous execution
+
+    @return (bool)
+    '''
+    headers = values.get('headers')
+    if (headers is None):
+        return False
+    # end if
+
+    for path, (mtime, size, md5) in headers.iteritems():
+        try:
+            st = stat(path)
+        except OSError:
+            return False
+        # end try
+
+        if (st.st_mtime == mtime):
+            continue
+        # end if
+
+        if ((st.st_size != size) or (get_file_md5(path) != md5)):
+            return False
+        # end if
+    # end for
+
+    return True
+# end def _headersUpToDate
+
+
+def _headerDeps(source, target, patterns):
+    '''
+    Get the task items tracking the headers included by a source
+
+    A source only depends on the headers it includes, as reported by the
+    compiler, instead of all the headers matching the patterns. In pipeline
+    mode, the tasks creating the matching headers are still run before.
+
+    @param source   [in] (str)  source file
+    @param target   [in] (str)  compiler output
+    @param patterns [in] (list) header glob patterns
+
+    @return (dict) actions, uptodate, task_dep
+    '''
+    if (not patterns):
+        return {'actions': [], 'uptodate': [], 'task_dep': []}
+    # end if
+
+    headers = [path for pattern in patterns for path in expand(pattern)]
+
+    return {'actions' : [(_recordHeaders, [source, _depfile(target),
+                                           [abspath(pattern) for pattern in patterns]]), ],
+            'uptodate': [_headersUpToDate, ],
+            'task_dep': plannedBy(headers)}
+# end def _headerDeps
+
+
+# Options applied by the preprocessor: their effect is in the preprocessed source
+_PREPROCESSOR_OPTIONS = ('-D', '-U', '-I', '-include', '-imacros', '-isystem', '-iquote')
+
+# Options naming the outputs (or their dependency files)
+_OUTPUT_OPTIONS       = ('-o', '-MF', '-MT', '-MQ')
+_OUTPUT_FLAGS         = ('-c', '-MMD', '-MD', '-MP')
+
+# Already preprocessed sources
+_PREPROCESSED         = ('.i', '.ii', '.mi')
+
+# Shell constructions: a command not split into arguments
+_SHELL_TOKENS         = ('&&', '||', ';', '|', '`', '$(')
+
+# Line markers of a preprocessed source: the file paths (the debug information paths)
+_LINE_MARKER          = re.compile(r'^(#\s*(?:line\s+)?\d+\s+")((?:[^"\\\n]|\\.)*)"', re.M)
+
+
+def splitOptions(args, source):
+    '''
+    Split compiler options (see CompileCmdAction)
+
+    @param args   [in] (list) options, without program
+    @param source [in] (str)  input file
+
+    @return (tuple) (preprocessor options, compiler options) without outputs nor input
+    '''
+    preprocessor = list()
+    compiler     = list()
+
+    args = iter(args)
+    for arg in args:
+
+        if (   (arg == source)
+            or (arg in _OUTPUT_FLAGS)):
+            continue
+        # end if
+
+        if (arg in _OUTPUT_OPTIONS):
+            next(args, None)
+            continue
+        # end if
+
+        if (arg in _PREPROCESSOR_OPTIONS):
+            preprocessor.extend([arg, next(args, '')])
+            continue
+        # end if
+
+        if (arg.startswith(_PREPROCESSOR_OPTIONS)):
+            preprocessor.append(arg)
+            continue
+        # end if
+
+        compiler.append(arg)
+    # end for
+
+    return preprocessor, compiler
+# end def splitOptions
+
+
+def _headerFiles(patterns):
+    '''
+    Get the headers matching glob patterns
+
+    @param patterns [in] (list) header glob patterns
+
+    @return (list) sorted paths
+    '''
+    return sorted(set(path for pattern in patterns for path in glob(pattern)))
+# end def _headerFiles
+
+
+class CompileCmdAction(CachedCmdAction):
+    '''
+    "cmd-action" restoring the compiler outputs from the artifact cache
+
+    As ccache (preprocessor mode), the key is made of the compiler identity,
+    the compiler options and the preprocessed source: the macros (e.g. the
+    ASPIRE_AID of another module, unused by the source), include paths and
+    headers location are only part of the key through the code they produce.
+    The paths of the line markers and of the source are relocated (see
+    ArtifactCache.relocate), the line numbers stay in the key.
+
+    A command not preprocessable alone (shell constructions) is keyed as is,
+    with the headers matching the header patterns of the tool: they are not
+    part of the file_dep of the task (see _headerDeps).
+    '''
+
+    def __init__(self, action, program, headers = None, **kwargs):
+        '''
+        Constructor
+
+        @param  action  [in] (str, list, callable) command
+        @param  program [in] (list) executable [script]
+        @option headers [in] (list) header glob patterns
+        @param  kwargs  [in] (dict) see doit.action.CmdAction
+        '''
+        super(CompileCmdAction, self).__init__(action, program, **kwargs)
+        self._headers = headers or []
+    # end def __init__
+
+    def _commandKey(self, cache):
+        '''
+        Compute the key of the command as is, with the headers
+
+        @param cache [in] (ArtifactCache) store
+
+        @return (str) hex digest
+        '''
+        return cache.key(self._program,
+                         self.expand_action(),
+                         list(self.task.file_dep) + _headerFiles(self._headers))
+    # end def _commandKey
+
+    def _key(self, cache):
+        '''
+        @copydoc actc.tools.cache.CachedCmdAction._key
+        '''
+        source  = self.task.options['source']
+        command = self.expand_action()
+
+        # Shell constructions: the command as is
+        if any(token in command for token in _SHELL_TOKENS):
+            return self._commandKey(cache)
+        # end if
+
+        try:
+            args = shell_split(command)
+        except ValueError:
+            return self._commandKey(cache)
+        # end try
+
+        program                = args[:len(self._program)]
+        preprocessor, compiler = splitOptions(args[len(self._program):], source)
+
+        if source.endswith(_PREPROCESSED):
+            with open(source, 'rb') as fo:
+                code = fo.read()
+            # end with
+        else:
+            process = Popen(program + preprocessor + compiler + ['-E', source],
+                            stdout = PIPE,
+                            stderr = PIPE)
+            code, _ = process.communicate()
+
+            # Let the compiler report the error
+            if (process.returncode):
+                return None
+            # end if
+        # end if
+
+        # Build folder independent line markers
+        code = _LINE_MARKER.sub(lambda match: match.group(1) + cache.relocated(match.group(2)) + '"', code)
+
+        return cache.key(self._program,
+                         ' '.join(program + compiler + [source]),
+                         [],
+                         [code])
+    # end def _key
+
+# end class CompileCmdAction
+
+
+class PreprocessedStore(object):
+    '''
+    Preprocessed sources shared by the preprocessing stages of a build
+
+    As ccache (direct mode), an output is found from the source content, the
+    options and the content of the headers it includes (reported by the
+    preprocessor when stored):
+      - <path>/<key[:2]>/<key>.json: outputs of the source and options
+        (see _sourceKey), with their headers,
+      - <path>/<key[:2]>/<key>.i:    output.
+
+    The headers in the folder of a source are recorded relatively to it: the
+    copies of a source and its headers in the folders of several stages share
+    their outputs.
+
+    The outputs of a key are told apart by their include closure: the headers
+    reported by the preprocessor (depfile, system headers included), with
+    their contents. A header added to an include folder, hiding a recorded one
+    of another folder, is not detected (as ccache).
+    '''
+
+    # Output depending on the source path or on the time
+    _VOLATILE = ('__FILE__', '__BASE_FILE__', '__DATE__', '__TIME__', '__TIMESTAMP__')
+
+    # Stores by path
+    _STORES   = dict()
+
+    def __init__(self, path):
+        '''
+        Constructor
+
+        @param path [in] (str) store folder
+        '''
+        self._path = path
+    # end def __init__
+
+    @classmethod
+    def get(cls, path):
+        '''
+        Get the store of a folder
+
+        @param path [in] (str) store folder
+
+        @return (PreprocessedStore)
+        '''
+        path = abspath(path)
+
+        if (path not in cls._STORES):
+            cls._STORES[path] = cls(path)
+        # end if
+
+        return cls._STORES[path]
+    # end def get
+
+    def _entry(self, key, ext):
+        '''
+        Get entry file
+
+        @param key [in] (str) hex digest
+        @param ext [in] (str) .json, .i
+
+        @return (str)
+        '''
+        return join(self._path, key[:2], key + ext)
+    # end def _entry
+
+    def sourceKey(self, program, options, source):
+        '''
+        Compute the key of a source and its options
+
+        @param program [in] (list) frontend
+        @param options [in] (list) options, without outputs nor input
+        @param source  [in] (str)  input file
+
+        @return (str) hex digest, None: output not shareable
+        '''
+        with open(source, 'rb') as fo:
+            code = fo.read()
+        # end with
+
+        if any(macro in code for macro in self._VOLATILE):
+            return None
+        # end if
+
+        programs = list()
+        for name in program:
+            path = which(name)
+            st   = stat(path) if path else None
+            programs.append([name, st.st_size, st.st_mtime] if st else [name])
+        # end for
+
+        return make_digest([programs, options, sha256(code).hexdigest()])
+    # end def sourceKey
+
+    @staticmethod
+    def _header(source, path):
+        '''
+        Get the recorded name of a header
+
+        @param source [in] (str) input file
+        @param path   [in] (str) header
+
+        @return (list) [name, relative]
+        '''
+        folder = dirname(abspath(source))
+        path   = abspath(path)
+
+        if (dirname(path) == folder):
+            return [basename(path), True]
+        # end if
+
+        return [path, False]
+    # end def _header
+
+    @staticmethod
+    def _resolve(source, name, relative):
+        '''
+        Get the path of a recorded header
+
+        @param source   [in] (str)  input file
+        @param name     [in] (str)  recorded name
+        @param relative [in] (bool) in the folder of the source
+
+        @return (str)
+        '''
+        return join(dirname(abspath(source)), name) if relative else name
+    # end def _resolve
+
+    def lookup(self, key, source):
+        '''
+        Find the output of a source
+
+        @param key    [in] (str) see sourceKey
+        @param source [in] (str) input file
+
+        @return (tuple) (output, headers), None: not found
+        '''
+        manifest = self._entry(key, '.json')
+
+        if (not isfile(manifest)):
+            return None
+        # end if
+
+        with open(manifest) as fo:
+            outputs = load(fo)
+        # end with
+
+        folder = dirname(abspath(source))
+
+        for output in outputs:
+            paths = list()
+
+            for name, relative, content in output['headers']:
+                path = self._resolve(source, name, relative)
+
+                if (   not isfile(path)
+                    or (content != digest(path))):
+                    break
+                # end if
+
+                paths.append(path)
+            else:
+                # No header of the source folder hiding a header of another one
+                if (    not any(isfile(join(folder, basename(name)))
+                                for name, relative, _ in output['headers'] if not relative)
+                    and isfile(self._entry(output['key'], '.i'))):
+                    return self._entry(output['key'], '.i'), paths
+                # end if
+            # end for
+        # end for
+
+        return None
+    # end def lookup
+
+    def store(self, key, source, target, headers):
+        '''
+        Store the output of a source
+
+        @param key     [in] (str)  see sourceKey
+        @param source  [in] (str)  input file
+        @param target  [in] (str)  output file
+        @param headers [in] (list) included headers (include closure)
+        '''
+        for path in headers:
+            with open(path, 'rb') as fo:
+                if any(macro in fo.read() for macro in self._VOLATILE):
+                    return
+                # end if
+            # end with
+        # end for
+
+        recorded = sorted(self._header(source, path) + [digest(path)] for path in headers)
+        output   = make_digest([key, recorded])
+        manifest = self._entry(key, '.json')
+
+        createFolder(dirname(manifest))
+        createFolder(dirname(self._entry(output, '.i')))
+
+        if (not isfile(self._entry(output, '.i'))):
+            copyfile(target, self._entry(output, '.i') + '.tmp')
+            rename(self._entry(output, '.i') + '.tmp', self._entry(output, '.i'))
+        # end if
+
+        outputs = list()
+        if isfile(manifest):
+            with open(manifest) as fo:
+                outputs = load(fo)
+            # end with
+        # end if
+
+        if all(entry['key'] != output for entry in outputs):
+            outputs.append({'key': output, 'headers': recorded})
+
+            # Concurrent jobs: the last one wins, an output stored again later
+            with open(manifest + '.tmp', 'w') as fo:
+                dump(outputs, fo)
+            # end with
+            rename(manifest + '.tmp', manifest)
+        # end if
+    # end def store
+
+# end class PreprocessedStore
+
+
+class PreprocessCmdAction(CachedCmdAction):
+    '''
+    "cmd-action" restoring the preprocessor outputs from the shared store of
+    the build (see PreprocessedStore) or from the artifact cache
+
+    The headers matching the header patterns of the tool are part of the
+    artifact cache key.
+    '''
+
+    def __init__(self, action, program, headers, store = None, **kwargs):
+        '''
+        Constructor
+
+        @param  action  [in] (str, list, callable) command
+        @param  program [in] (list) executable [script]
+        @param  headers [in] (list) header glob patterns
+        @option store   [in] (PreprocessedStore) outputs shared by the stages
+        @param  kwargs  [in] (dict) see doit.action.CmdAction
+        '''
+        super(PreprocessCmdAction, self).__init__(action, program, **kwargs)
+        self._headers = headers
+        self._store   = store
+    # end def __init__
+
+    def _key(self, cache):
+        '''
+        @copydoc actc.tools.cache.CachedCmdAction._key
+        '''
+        return cache.key(self._program,
+                         self.expand_action(),
+                         list(self.task.file_dep) + _headerFiles(self._headers))
+    # end def _key
+
+    def _sourceKey(self, source):
+        '''
+        Compute the store key of the task
+
+        @param source [in] (str) input file
+
+        @return (str) hex digest, None: output not shareable
+        '''
+        command = self.expand_action()
+
+        # Shell constructions: not shared
+        if any(token in command for token in _SHELL_TOKENS):
+            return None
+        # end if
+
+        try:
+            args = shell_split(command)
+        except ValueError:
+            return None
+        # end try
+
+        preprocessor, compiler = splitOptions(args[len(self._program):], source)
+
+        return self._store.sourceKey(args[:len(self._program)], preprocessor + compiler, source)
+    # end def _sourceKey
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        if (self._store is None):
+            return super(PreprocessCmdAction, self).execute(out = out, err = err)
+        # end if
+
+        source  = self.task.options['source']
+        target  = self.task.targets[0]
+        depfile = _depfile(target)
+        key     = self._sourceKey(source)
+
+        found = self._store.lookup(key, source) if key else None
+
+        if (found is not None):
+            output, headers = found
+            linkFile(output, target)
+
+            # Headers recorded by the next action (see _recordHeaders)
+            if (self._headers):
+                with open(depfile, 'w') as fo:
+                    fo.write('%s: %s\n' % (target, ' '.join(path.replace(' ', '\\ ')
+                                                             for path in [source] + headers)))
+                # end with
+            # end if
+
+            return None
+        # end if
+
+        # Target linked from the store by a previous build
+        unlinkShared([target])
+
+        error = super(PreprocessCmdAction, self).execute(out = out, err = err)
+
+        if (    (error is None)
+            and isfile(depfile)):
+            if (key is not None):
+                headers = set(abspath(path) for path in _readDepfile(depfile)) - set([abspath(source)])
+                self._store.store(key, source, target, sorted(headers))
+            # end if
+
+            # Only read by the header tracking action
+            if (not self._headers):
+                remove(depfile)
+            # end if
+        # end if
+
+        return error
+    # end def execute
+
+# end class PreprocessCmdAction
+
+
+class PrebuiltStore(object):
+    '''
+    Objects of a fixed library source (e.g. ACCL) shared by the modules and
+    the builds
+
+    <path>/<key[:2]>/<key>.o is the object of a source compiled with the same
+    frontend (path, size and time stamp) and options, the source and the
+    headers of the library having the same contents: a changed macro (e.g.
+    the portal endpoint or the application id) gives another entry.
+    '''
+
+    # Stores by path
+    _STORES = dict()
+
+    def __init__(self, path):
+        '''
+        Constructor
+
+        @param path [in] (str) store folder
+        '''
+        self._path = path
+    # end def __init__
+
+    @classmethod
+    def get(cls, path):
+        '''
+        Get the store of a folder
+
+        @param path [in] (str) store folder
+
+        @return (PrebuiltStore)
+        '''
+        path = abspath(path)
+
+        if (path not in cls._STORES):
+            cls._STORES[path] = cls(path)
+        # end if
+
+        return cls._STORES[path]
+    # end def get
+
+    def _entry(self, key):
+        '''
+        Get entry file
+
+        @param key [in] (str) hex digest
+
+        @return (str)
+        '''
+        return join(self._path, key[:2], key + '.o')
+    # end def _entry
+
+    def key(self, program, options, sources):
+        '''
+        Compute the key of an object
+
+        @param program [in] (list) frontend
+        @param options [in] (list) options, without outputs nor input
+        @param sources [in] (list) source and headers of the library
+
+        @return (str) hex digest
+        '''
+        programs = list()
+        for name in program:
+            path = which(name)
+            st   = stat(path) if path else None
+            programs.append([name, st.st_size, st.st_mtime] if st else [name])
+        # end for
+
+        return make_digest([programs,
+                            options,
+                            [[basename(path), digest(path)] for path in sources]])
+    # end def key
+
+    def lookup(self, key):
+        '''
+        Find an object
+
+        @param key [in] (str) see key
+
+        @return (str) object, None: not found
+        '''
+        entry = self._entry(key)
+
+        return entry if isfile(entry) else None
+    # end def lookup
+
+    def store(self, key, target):
+        '''
+        Store an object
+
+        @param key    [in] (str) see key
+        @param target [in] (str) object
+        '''
+        entry = self._entry(key)
+
+        if isfile(entry):
+            return
+        # end if
+
+        createFolder(dirname(entry))
+
+        # Concurrent builds: the last one wins
+        tmp = '%s.%d.tmp' % (entry, getpid())
+        copyfile(target, tmp)
+        rename(tmp, entry)
+    # end def store
+
+# end class PrebuiltStore
+
+
+class PrebuiltCmdAction(CompileCmdAction):
+    '''
+    "cmd-action" linking its object from the prebuilt objects shared by the
+    modules and the builds (see PrebuiltStore), compiling it otherwise
+    '''
+
+    def __init__(self, action, program, store, headers, **kwargs):
+        '''
+        Constructor
+
+        @param action  [in] (str, list, callable) command
+        @param program [in] (list) executable [script]
+        @param store   [in] (PrebuiltStore) prebuilt objects
+        @param headers [in] (list) header glob patterns of the library
+        @param kwargs  [in] (dict) see doit.action.CmdAction
+        '''
+        super(PrebuiltCmdAction, self).__init__(action, program, headers, **kwargs)
+        self._store = store
+    # end def __init__
+
+    def _storeKey(self, source):
+        '''
+        Compute the store key of the task
+
+        @param source [in] (str) input file
+
+        @return (str) hex digest, None: not shareable
+        '''
+        command = self.expand_action()
+
+        # Shell constructions: not shared
+        if any(token in command for token in _SHELL_TOKENS):
+            return None
+        # end if
+
+        try:
+            args = shell_split(command)
+        except ValueError:
+            return None
+        # end try
+
+        preprocessor, compiler = splitOptions(args[len(self._program):], source)
+
+        return self._store.key(args[:len(self._program)],
+                               preprocessor + compiler,
+                               [source] + _headerFiles(self._headers))
+    # end def _storeKey
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        source = self.task.options['source']
+        target = self.task.targets[0]
+        key    = self._storeKey(source)
+        found  = self._store.lookup(key) if key else None
+
+        if (found is not None):
+            linkFile(found, target)
+
+            # Headers recorded by the next action (see _recordHeaders)
+            if (self._headers):
+                with open(_depfile(target), 'w') as fo:
+                    fo.write('%s: %s\n' % (target, ' '.join(path.replace(' ', '\\ ')
+                                                             for pattern in [source] + self._headers
+                                                             for path in sorted(glob(pattern)))))
+                # end with
+            # end if
+
+            return None
+        # end if
+
+        # Target linked from the store by a previous build
+        unlinkShared([target])
+
+        error = super(PrebuiltCmdAction, self).execute(out = out, err = err)
+
+        if (    (error is None)
+            and (key is not None)):
+            self._store.store(key, target)
+        # end if
+
+        return error
+    # end def execute
+
+# end class PrebuiltCmdAction
+
+
+# Sources by compiler process (see setBatchCompile)
+_BATCH = [0]
+
+def setBatchCompile(size):
+    '''
+    Select how the Compiler tools run the frontend
+
+    @param size [in] (int) sources by process, 0: one process (and task) by source
+    '''
+    _BATCH[0] = size
+# end def setBatchCompile
+
+
+# Path options (relative to the build working directory)
+_PATH_OPTIONS = ('-I', '-L', '-include', '-imacros', '-isystem', '-iquote', '-idirafter')
+
+def absoluteOptions(options):
+    '''
+    Make the paths of options absolute (to run the frontend in another folder)
+
+    @param options [in] (list) options
+
+    @return (list)
+    '''
+    args    = list()
+    options = iter(options)
+
+    for arg in options:
+
+        if (arg in _PATH_OPTIONS):
+            path = next(options, '')
+            args.extend([arg, path if isabs(path) else abspath(path)])
+            continue
+        # end if
+
+        for option in ('-I', '-L'):
+            if (    arg.startswith(option)
+                and not isabs(arg[len(option):])):
+                arg = option + abspath(arg[len(option):])
+            # end if
+        # end for
+
+        args.append(arg)
+    # end for
+
+    return args
+# end def absoluteOptions
+
+
+def _batchUpToDate(task, values, manifest):                                     # pylint:disable=W0613
+    '''
+    Check the headers recorded in a batch manifest are unchanged (uptodate callable)
+
+    @param task     [in] (Task) task
+    @param values   [in] (dict) values saved by the previous execution
+    @param manifest [in] (str)  batch manifest (json)
+
+    @return (bool)
+    '''
+    if (not isfile(manifest)):
+        return False
+    # end if
+
+    with open(manifest) as fo:
+        files = load(fo)['files']
+    # end with
+
+    return all(_headersUpToDate(None, entry) for entry in files.itervalues())
+# end def _batchUpToDate
+
 class Preprocessor(AbstractCmdTool):
     '''
     Preprocesor
@@ -67,17 +999,33 @@ class Preprocessor(AbstractCmdTool):
 
     def __init__(self, program = FRONTEND,
                        options = None,
-                       outputs = ('build/pre', '.i')):
+                       outputs = ('build/pre', '.i'),
+                       store   = None):
         '''
         @copydoc actc.tools.AbstractBasicCmdTool.__init__
+
+        @option store   [in] (str) folder of the outputs shared by the stages (see PreprocessedStore)
         '''
         super(Preprocessor, self).__init__(program = program,
                                            options = options,
                                            outputs = outputs)
+
+        self._store = PreprocessedStore.get(store) if store else None
     # end def __init__
 
     _ACTION = 'preprocess'
 
+    _CACHEABLE = True
+
+    def _action(self):
+        '''
+        @copydoc actc.tools.AbstractCmdTool._action
+        '''
+        return PreprocessCmdAction(self._cmd, self._program,
+                                   [abspath(pattern) for pattern in self._headers],
+                                   self._store)
+    # end def _action
+
     def _cmd(self, task, source):
         '''
         @copydoc actc.tools.AbstractBasicCmdTool._cmd
@@ -89,6 +1037,14 @@ class Preprocessor(AbstractCmdTool):
         args.append('-E')
         args.append('-P')
 
+        # header dependencies (and the include closure of the stored outputs,
+        # system headers included)
+        if self._store:
+            args.extend(['-MD', '-MF', _depfile(task.targets[0])])
+        elif self._headers:
+            args.extend(['-MMD', '-MF', _depfile(task.targets[0])])
+        # end if
+
         # output
         args.append('-o')
         args.append(task.targets[0])
@@ -107,18 +1063,15 @@ class Preprocessor(AbstractCmdTool):
         yield super(Preprocessor, self).tasks(*args, **kwargs)
 
         # Process headers
-        headers = []
-        for a in kwargs.get('header_files', []):
-            headers.extend(glob(abspath(a)))
-            # print headers
+        self._headers = kwargs.get('header_files', [])
 
         # Process Files
         path, ext = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
@@ -128,17 +1081,20 @@ class Preprocessor(AbstractCmdTool):
                     dst = sub(args[1], args[2], dst)
                 # end if
 
+                deps = _headerDeps(src, dst, self._headers)
+
                 yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
                        'title'   : self._title,
-                       'actions' : [CmdAction(self._cmd), ],
+                       'actions' : [self._action(), ] + deps['actions'],
                        # HACK, file_dep does not maintain ordering
                        'params'  : [{'name'   : 'source',
                                      'short'  : None,
                                      'default': src,
                         }],
                        'targets' : [dst, ],
-                       'file_dep': [src, ] + headers,
-                       'task_dep' : ['_createfolder_' + path]
+                       'file_dep': [src, ],
+                       'uptodate': deps['uptodate'],
+                       'task_dep': ['_createfolder_' + path] + deps['task_dep']
                        }
             # end for
         # end for
@@ -152,19 +1108,41 @@ class Compiler(AbstractCmdTool):
     Clang compiler
     '''
 
-    def __init__(self, program = FRONTEND,
-                       options = None,
-                       outputs = ('build/obj', '.o')):
+    def __init__(self, program  = FRONTEND,
+                       options  = None,
+                       outputs  = ('build/obj', '.o'),
+                       batch    = None,
+                       prebuilt = None):
         '''
         @copydoc actc.tools.AbstractBasicCmdTool.__init__
+
+        @option batch    [in] (int) sources by process, see setBatchCompile by default
+        @option prebuilt [in] (str) folder of the objects shared by the modules
+                                    and the builds (see PrebuiltStore)
         '''
         super(Compiler, self).__init__(program = program,
                                        options = options,
                                        outputs = outputs)
+
+        self._batch    = _BATCH[0] if batch is None else batch
+        self._prebuilt = PrebuiltStore.get(prebuilt) if prebuilt else None
     # end def __init__
 
     _ACTION = 'compile'
 
+    _CACHEABLE = True
+
+    def _action(self):
+        '''
+        @copydoc actc.tools.AbstractCmdTool._action
+        '''
+        if (self._prebuilt is not None):
+            return PrebuiltCmdAction(self._cmd, self._program, self._prebuilt, self._headers)
+        # end if
+
+        return CompileCmdAction(self._cmd, self._program, self._headers)
+    # end def _action
+
     def _cmd(self, task, source):
         '''
         @copydoc actc.tools.AbstractBasicCmdTool._cmd
@@ -178,6 +1156,11 @@ class Compiler(AbstractCmdTool):
         args.append('-c')
         args.append(source)
 
+        # header dependencies
+        if (self._headers):
+            args.extend(['-MMD', '-MF', _depfile(task.targets[0])])
+        # end if
+
         # output
         args.append('-o')
         args.append(task.targets[0])
@@ -185,6 +1168,199 @@ class Compiler(AbstractCmdTool):
         return ' '.join(args)
     # end def _cmd
 
+    def _stale(self, src, dst, entry):
+        '''
+        Check an object of a batch must be compiled again
+
+        @param src   [in] (str)  source
+        @param dst   [in] (str)  object
+        @param entry [in] (dict) state of the source and its headers when compiled
+
+        @return (bool)
+        '''
+        if (   (entry is None)
+            or not isfile(dst)):
+            return True
+        # end if
+
+        mtime, size, md5 = entry['source']
+        st = stat(src)
+
+        if (    (st.st_mtime != mtime)
+            and ((st.st_size != size) or (get_file_md5(src) != md5))):
+            return True
+        # end if
+
+        return not _headersUpToDate(None, entry)
+    # end def _stale
+
+    def _compileBatch(self, pairs, manifest):
+        '''
+        Compile the stale sources of a batch with one frontend process
+        (python-action)
+
+        The frontend runs in a temporary folder, as it names the objects after
+        the sources (-c without -o): the objects are then moved to the targets.
+
+        @param pairs    [in] (list) (source, object)
+        @param manifest [in] (str)  batch manifest (json): command, source --> state
+
+        @return (TaskFailed, None)
+        '''
+        command = ' '.join(self._program + self._options)
+        files   = dict()
+
+        if isfile(manifest):
+            with open(manifest) as fo:
+                previous = load(fo)
+            # end with
+
+            if (previous['command'] == command):
+                files = previous['files']
+            # end if
+        # end if
+
+        stale = [(src, dst) for src, dst in pairs if self._stale(src, dst, files.get(src))]
+
+        if (stale):
+            path, _ = self._outputs[0]
+            tmp     = mkdtemp(prefix = '.tmp', dir = path)
+
+            try:
+                # One argument by option, without a shell
+                args = list(self._program)
+                args.extend(absoluteOptions(self._options))
+
+                # Debug information: the build folder, not the temporary one
+                args.append('-fdebug-prefix-map=%s=%s' % (tmp, getcwd()))
+
+                if (self._headers):
+                    args.append('-MMD')
+                # end if
+
+                args.append('-c')
+                args.extend(abspath(src) for src, _ in stale)
+
+                process = Popen(args,
+                                cwd    = tmp,
+                                stdout = PIPE,
+                                stderr = PIPE)
+                out, err = process.communicate()
+                sys.stdout.write(out)
+                sys.stderr.write(err)
+
+                if (process.returncode):
+                    # Same message as doit.action.CmdAction (see actc.dodo._exitStatus)
+                    return TaskFailed("Command failed: '%s' returned %s"
+                                      % (' '.join(args), process.returncode))
+                # end if
+
+                for src, dst in stale:
+                    stem = join(tmp, splitext(basename(src))[0])
+
+                    rename(stem + '.o', dst)
+
+                    entry = _recordHeaders(src, stem + '.d',
+                                           [abspath(pattern) for pattern in self._headers]) \
+                            if self._headers else {'headers': dict()}
+                    entry['source'] = _fileState(src)
+                    files[src] = entry
+                # end for
+            finally:
+                rmtree(tmp, ignore_errors = True)
+            # end try
+        # end if
+
+        with open(manifest + '.tmp', 'w') as fo:
+            dump({'command': command, 'files': files}, fo)
+        # end with
+        rename(manifest + '.tmp', manifest)
+    # end def _compileBatch
+
+    def _batches(self, pairs):
+        '''
+        Group sources by batch
+
+        The objects of a batch are named after their sources: a batch has no
+        two sources with the same stem.
+
+        @param pairs [in] (list) (source, object)
+
+        @return (list) batches of (source, object)
+        '''
+        batches = list()
+        batch   = list()
+        stems   = set()
+
+        for src, dst in pairs:
+            stem = splitext(basename(src))[0]
+
+            if (   (len(batch) == self._batch)
+                or (stem in stems)):
+                batches.append(batch)
+                batch = list()
+                stems = set()
+            # end if
+
+            batch.append((src, dst))
+            stems.add(stem)
+        # end for
+
+        if (batch):
+            batches.append(batch)
+        # end if
+
+        return batches
+    # end def _batches
+
+    def _batchTasks(self, *args):
+        '''
+        Batch tasks: a frontend process compiles several sources
+
+        Each batch task records its objects in a manifest: the sources changed
+        since their compilation (or with changed headers) are the only ones
+        compiled again.
+
+        @param args [in] (list) see tasks
+
+        @return (generator)
+        '''
+        path, ext = self._outputs[0]
+        pairs     = list()
+
+        for arg in toList(args[0]):
+            for src in expand(arg):
+
+                if isEmpty(src):
+                    continue
+                # end if
+
+                dst = join(path, basename(src) + ext)
+
+                if (len(args) == 3):
+                    dst = sub(args[1], args[2], dst)
+                # end if
+
+                pairs.append((src, dst))
+            # end for
+        # end for
+
+        for batch in self._batches(pairs):
+            sources  = [src for src, _ in batch]
+            manifest = join(path, '.compile-%s.json' % (make_digest(sources)[:16],))
+            deps     = _headerDeps(sources[0], batch[0][1], self._headers)
+
+            yield {'name'    : self._name(self._ACTION, sources, '\ninto', path),
+                   'title'   : self._title,
+                   'actions' : [(self._compileBatch, [batch, manifest]), ],
+                   'targets' : [dst for _, dst in batch] + [manifest, ],
+                   'file_dep': sources,
+                   'uptodate': [(_batchUpToDate, [manifest]), ],
+                   'task_dep': ['_createfolder_' + path] + deps['task_dep']
+                   }
+        # end for
+    # end def _batchTasks
+
     def tasks(self, *args, **kwargs):
         '''
         @copydoc actc.tools.AbstractCmdTool.tasks
@@ -193,19 +1369,24 @@ class Compiler(AbstractCmdTool):
         yield super(Compiler, self).tasks(*args, **kwargs)
 
         # Process headers
-        headers = []
-        for a in kwargs.get('header_files', []):
-            headers.extend(glob(abspath(a)))
-            # print headers
+        self._headers = kwargs.get('header_files', [])
+
+        # Batch: the frontend run without a shell
+        if (    (self._batch > 1)
+            and (self._prebuilt is None)
+            and not any(token in ' '.join(self._program + self._options) for token in _SHELL_TOKENS)):
+            yield self._batchTasks(*args)
+            return
+        # end if
 
         # Process Files
         path, ext = self._outputs[0]
 
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
@@ -215,17 +1396,20 @@ class Compiler(AbstractCmdTool):
                     dst = sub(args[1], args[2], dst)
                 # end if
 
+                deps = _headerDeps(src, dst, self._headers)
+
                 yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
                        'title'   : self._title,
-                       'actions' : [CmdAction(self._cmd), ],
+                       'actions' : [self._action(), ] + deps['actions'],
                         # HACK, file_dep does not maintain ordering
                        'params'  : [{'name'   : 'source',
                                      'short'  : None,
                                      'default': src,
                         }],
                        'targets' : [dst, ],
-                       'file_dep': [src, ] + headers,
-                       'task_dep': ['_createfolder_' + path]
+                       'file_dep': [src, ],
+                       'uptodate': deps['uptodate'],
+                       'task_dep': ['_createfolder_' + path] + deps['task_dep']
                        }
             # end for
         # end for
@@ -252,6 +1436,15 @@ class CompilerSO(AbstractCmdTool):
 
     _ACTION = 'compileSO'
 
+    _CACHEABLE = True
+
+    def _action(self):
+        '''
+        @copydoc actc.tools.AbstractCmdTool._action
+        '''
+        return CompileCmdAction(self._cmd, self._program, self._headers)
+    # end def _action
+
     def _cmd(self, task, source):
         '''
         @copydoc actc.tools.AbstractBasicCmdTool._cmd
@@ -266,6 +1459,11 @@ class CompilerSO(AbstractCmdTool):
         args.append('-fPIC')
         args.append(source)
 
+        # header dependencies
+        if (self._headers):
+            args.extend(['-MMD', '-MF', _depfile(task.targets[0])])
+        # end if
+
         # output
         args.append('-o')
         args.append(task.targets[0])
@@ -281,18 +1479,15 @@ class CompilerSO(AbstractCmdTool):
         yield super(CompilerSO, self).tasks(*args, **kwargs)
 
         # Process headers
-        headers = []
-        for a in kwargs.get('header_files', []):
-            headers.extend(glob(abspath(a)))
-            # print headers
+        self._headers = kwargs.get('header_files', [])
 
         # Process Files
         path, ext = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
@@ -306,17 +1501,20 @@ class CompilerSO(AbstractCmdTool):
                     dst = sub(args[1], args[2], dst)
                 # end if
 
+                deps = _headerDeps(src, dst, self._headers)
+
                 yield {'name'    : self._name(self._ACTION, src, '\ninto', dst),
                        'title'   : self._title,
-                       'actions' : [CmdAction(self._cmd), ],
+                       'actions' : [self._action(), ] + deps['actions'],
                         # HACK, file_dep does not maintain ordering
                        'params'  : [{'name'   : 'source',
                                      'short'  : None,
                                      'default': src,
                         }],
                        'targets' : [dst, ],
-                       'file_dep': [src, ] + headers,
-                       'task_dep': ['_createfolder_' + path]
+                       'file_dep': [src, ],
+                       'uptodate': deps['uptodate'],
+                       'task_dep': ['_createfolder_' + path] + deps['task_dep']
                        }
             # end for
         # end for
@@ -324,6 +1522,217 @@ class CompilerSO(AbstractCmdTool):
 # end class CompilerSO
 
 
+# ar archive: global header, then 60 bytes member headers
+_ARMAG       = '!<arch>\n'
+_AR_HEADER   = 60
+
+
+def _normalize(content, roots):
+    '''
+    Remove the build paths from an object (e.g. DW_AT_comp_dir, DW_AT_name)
+
+    @param content [in] (str)  object content
+    @param roots   [in] (list) paths, longest first
+
+    @return (str)
+    '''
+    for root in roots:
+        content = content.replace(root, '')
+    # end for
+
+    return content
+# end def _normalize
+
+
+def objectFingerprint(path, roots = ()):
+    '''
+    Compute the digest of an object or an archive, ignoring the noise of a
+    compilation with the same result: build paths in the debug information,
+    time stamps, owner and mode of the archive members
+
+    @param  path  [in] (str)  .o, .a, .so
+    @option roots [in] (list) build paths
+
+    @return (str) hex digest
+    '''
+    roots = sorted(roots, key = len, reverse = True)
+    md    = sha256()
+
+    with open(path, 'rb') as fo:
+        content = fo.read()
+    # end with
+
+    if (not content.startswith(_ARMAG)):
+        md.update(_normalize(content, roots))
+        return md.hexdigest()
+    # end if
+
+    offset = len(_ARMAG)
+
+    while (offset + _AR_HEADER <= len(content)):
+        header = content[offset:offset + _AR_HEADER]
+        size   = int(header[48:58])
+        offset += _AR_HEADER
+
+        # name, then member (mtime, uid, gid and mode ignored)
+        md.update(header[:16])
+        md.update(sha256(_normalize(content[offset:offset + size], roots)).hexdigest())
+
+        # Members aligned on 2 bytes
+        offset += size + (size & 1)
+    # end while
+
+    return md.hexdigest()
+# end def objectFingerprint
+
+
+def _fingerprintFile(target):
+    '''
+    Get the fingerprint file of a linker output
+
+    @param target [in] (str) linker output
+
+    @return (str) path
+    '''
+    return target + '.fingerprint'
+# end def _fingerprintFile
+
+
+# Libraries found by the frontends: (frontend, file) -> path, None
+_LIBRARIES = dict()
+
+def _library(frontend, name, folders):
+    '''
+    Locate a -l library as the linker does: in the -L folders, then in the
+    search path of the frontend (-print-file-name)
+
+    @param frontend [in] (str)  compiler driver
+    @param name     [in] (str)  library (-l<name>)
+    @param folders  [in] (list) -L folders
+
+    @return (str, None) path, None: not found
+    '''
+    files = ['lib%s%s' % (name, ext) for ext in ('.so', '.a')]
+
+    for folder in folders:
+        paths = [join(folder, lib) for lib in files if isfile(join(folder, lib))]
+
+        if (paths):
+            return paths[0]
+        # end if
+    # end for
+
+    for lib in files:
+        if ((frontend, lib) not in _LIBRARIES):
+            try:
+                process = Popen([frontend, '-print-file-name=' + lib], stdout = PIPE, stderr = PIPE)
+                path    = process.communicate()[0].strip()
+            except OSError:
+                path    = ''
+            # end try
+
+            # The name itself when not found
+            _LIBRARIES[(frontend, lib)] = path if (isabs(path) and isfile(path)) else None
+        # end if
+
+        if (_LIBRARIES[(frontend, lib)] is not None):
+            return _LIBRARIES[(frontend, lib)]
+        # end if
+    # end for
+
+    return None
+# end def _library
+
+
+class LinkCmdAction(CmdAction):
+    '''
+    "cmd-action" leaving its output untouched when linked from the same
+    objects, libraries and options
+
+    The objects (or archives) are compared with objectFingerprint: a source
+    compiled again with the same result (e.g. touched) does not invalidate
+    the binary and the tasks depending on it (the bin2bin steps).
+    '''
+
+    def _fingerprint(self):
+        '''
+        Compute the fingerprint of the link
+
+        @return (str) hex digest
+        '''
+        command = self.expand_action()
+        objs    = [obj for obj in self.task.options['objs'] if not obj.endswith('.json')]
+        roots   = [getcwd()] + sorted(set(dirname(abspath(obj)) for obj in objs))
+
+        # -l libraries found in the -L folders, then in the frontend ones
+        args    = shell_split(command)
+        folders = [arg[2:] for arg in args if arg.startswith('-L') and (len(arg) > 2)]
+        libs    = list()
+
+        for name in (arg[2:] for arg in args if arg.startswith('-l') and (len(arg) > 2)):
+            lib = _library(args[0], name, folders)
+
+            if (lib is not None):
+                libs.append(lib)
+            # end if
+        # end for
+
+        programs = list()
+        for name in args[:1]:
+            path = which(name)
+            st   = stat(path) if path else None
+            programs.append([name, st.st_size, st.st_mtime] if st else [name])
+        # end for
+
+        return make_digest([programs,
+                            command,
+                            [objectFingerprint(obj, roots) for obj in objs],
+                            [[lib, digest(lib)] for lib in libs]])
+    # end def _fingerprint
+
+    def execute(self, out = None, err = None):
+        '''
+        @copydoc doit.action.CmdAction.execute
+        '''
+        target = self.task.targets[0]
+        stamp  = _fingerprintFile(target)
+
+        try:
+            fingerprint = self._fingerprint()
+        except (IOError, OSError, ValueError):
+            # Let the linker report the error
+            fingerprint = None
+        # end try
+
+        if (    (fingerprint is not None)
+            and isfile(target)
+            and isfile(stamp)):
+            with open(stamp) as fo:
+                if (fo.read() == fingerprint):
+                    return None
+                # end if
+            # end with
+        # end if
+
+        if isfile(stamp):
+            remove(stamp)
+        # end if
+
+        error = super(LinkCmdAction, self).execute(out = out, err = err)
+
+        # Empty fingerprint (target of the task) when not computed: never equal
+        if (error is None):
+            with open(stamp, 'w') as fo:
+                fo.write(fingerprint or '')
+            # end with
+        # end if
+
+        return error
+    # end def execute
+
+# end class LinkCmdAction
+
+
 class Linker(AbstractCmdTool):
     '''
     Linker
@@ -342,6 +1751,13 @@ class Linker(AbstractCmdTool):
 
     _ACTION = 'link'
 
+    def _action(self):
+        '''
+        @copydoc actc.tools.AbstractCmdTool._action
+        '''
+        return LinkCmdAction(self._cmd)
+    # end def _action
+
     def _cmd(self, task, objs):                                                 # pylint:disable=W0221
         '''
         @copydoc actc.tools.AbstractCmdTool._cmd
@@ -375,7 +1791,7 @@ class Linker(AbstractCmdTool):
         objs = list()
 
         for arg in toList(args[0]):
-            objs.extend(sorted(glob(abspath(arg))))
+            objs.extend(sorted(expand(arg)))
         # end for
 
         if not objs:
@@ -389,13 +1805,13 @@ class Linker(AbstractCmdTool):
 
         yield {'name'    : self._name(self._ACTION, objs, '\ninto', dst),
                'title'   : self._title,
-               'actions' : [CmdAction(self._cmd),],
+               'actions' : [self._action(),],
                # Hack to preserve objects order
                'params'  : [{'name'   : 'objs',
                              'short'  : None,
                              'default': objs,
                              }],
-               'targets' : dst,
+               'targets' : dst + [_fingerprintFile(dst[0])],
                'file_dep': objs,
                'task_dep' : ['_createfolder_' + path]
                }
@@ -422,6 +1838,8 @@ class Archiver(AbstractCmdTool):
 
     _ACTION = 'archive'
 
+    _CACHEABLE = True
+
     def _cmd(self, task, objs):  # pylint:disable=W0221
         '''
         @copydoc actc.tools.AbstractCmdTool._cmd
@@ -454,7 +1872,7 @@ class Archiver(AbstractCmdTool):
         objs = list()
 
         for arg in toList(args[0]):
-            objs.extend(sorted(glob(abspath(arg))))
+            objs.extend(sorted(expand(arg)))
         # end for
 
         if not objs:
@@ -465,7 +1883,7 @@ class Archiver(AbstractCmdTool):
 
         yield {'name'    : self._name(self._ACTION, objs, '\ninto', dst),
                'title'   : self._title,
-               'actions' : [CmdAction(self._cmd), ],
+               'actions' : [self._action(), ],
                # Hack to preserve objects order
                'params'  : [{'name'   : 'objs',
                              'short'  : None,
@@ -37,8 +37,6 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from glob                       import iglob
-from os.path                    import abspath
 from os.path                    import basename
 from os.path                    import dirname
 from os.path                    import join
@@ -46,6 +44,7 @@ from os.path                    import join
 from doit.action                import CmdAction
 
 from actc.tools                 import AbstractCmdTool
+from actc.tools                 import expand
 from actc.tools                 import toList
 from actc.tools.codesurfer      import CSURF
 
@@ -107,7 +106,7 @@ class SplitterProcess(AbstractCmdTool):
         path, ext = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
                 dst  = join(path, basename(src) + ext)
 
@@ -196,7 +195,7 @@ class SplitterCodeTransformation(AbstractCmdTool):
         path, ext = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
                 dst  = join(path, basename(src) + ext)
 
@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.tools.test.testannotation
+
+@brief   Annotation rewriting tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/28
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from json                       import dumps
+from json                       import load
+from os                         import stat
+from os                         import remove
+from os                         import utime
+from os.path                    import isfile
+from os.path                    import join
+from random                     import Random
+from subprocess                 import check_call
+
+from actc.bench.benchannotation  import CASES
+from actc.bench.benchannotation  import referenceParse
+from actc.tools.annotation      import AnnotationIndex
+from actc.tools.annotation      import AnnotationMerger
+from actc.tools.annotation      import AnnotationRewriter
+from actc.tools.annotation      import extractAnnotations
+from actc.tools.annotation      import extractFolderAnnotations
+from actc.tools.annotation      import filterAnnotations
+from actc.tools.annotation      import generateExternalAnnotations
+from actc.tools.annotation      import generateTreeAnnotations
+from actc.tools.annotation      import parseAnnotationContent
+from actc.tools.annotation      import parseProtections
+from actc.tools.annotation      import rewriteAnnotations
+from actc.tools.test.basetest   import BaseTestCase
+from actc.tools.test.basetest   import DoItTestCase
+from actc.tools.utils           import Copier
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class AnnotationRewriterTestCase(BaseTestCase):
+    '''
+    Annotation rewriting tests
+    '''
+
+    def test_rewrite(self):
+        '''
+        Test: placeholders are rewritten in one pass, then matched by line
+        '''
+        source = self.createTmpFile('foo.c',
+                                    'int a __attribute__((ASPIRE("protection(placeHolder, id(1))")));\n'
+                                    'int b;\n'
+                                    '_Pragma("ASPIRE begin protection(placeHolder, id(2))")\n')
+        first  = {'id': 1}
+        second = {'id': 2}
+
+        rewriteAnnotations(source, [(first,  'protection(xor, mask(constant(3)))'),
+                                    (second, 'protection(obfuscations)')])
+
+        self.assertTmpFile('foo.c',
+                           'int a __attribute__((ASPIRE("protection(xor, mask(constant(3)))")));\n'
+                           'int b;\n'
+                           '_Pragma("ASPIRE begin protection(obfuscations)")\n')
+        self.assertEqual(1, first['line_number'])
+        self.assertEqual(3, second['line_number'])
+
+        # Applied annotation: matched by line number and hash
+        rewriteAnnotations(source, [(second, 'protection(placeHolder, id(2))')])
+
+        self.assertTmpFile('foo.c',
+                           'int a __attribute__((ASPIRE("protection(xor, mask(constant(3)))")));\n'
+                           'int b;\n'
+                           '_Pragma("ASPIRE begin protection(placeHolder, id(2))")\n')
+
+        # Unchanged content: the file is not rewritten
+        mtime = stat(source).st_mtime
+        rewriteAnnotations(source, [(first, first['content'])])
+        self.assertEqual(mtime, stat(source).st_mtime)
+    # end def test_rewrite
+
+    def test_index(self):
+        '''
+        Test: the annotations file is parsed once per version
+        '''
+        annotations = [{'id': 1, 'file name': 'foo.c',
+                        'annotation content': 'protection(xor, mask(constant(3))), protection(softvm)'},
+                       {'id': 2, 'file name': 'bar.c',
+                        'annotation content': 'protection(softvm, mobile)'}]
+        path = self.createTmpFile('annotations.json', dumps(annotations))
+
+        index = AnnotationIndex.get(path)
+        self.assertIs(index, AnnotationIndex.get(path))
+
+        self.assertEqual([{'xor': 'protection(xor, mask(constant(3)))'}],
+                         [a['filtered'] for a in filterAnnotations(path, annotation_filter=['xor'],
+                                                                   filtered_only=True)])
+        self.assertEqual([1], [a['id'] for a in filterAnnotations(path, source_file='foo.c')])
+        self.assertEqual([2], [a['id'] for a in filterAnnotations(path, source_file='bar.c',
+                                                                  annotation_filter=['softvm'],
+                                                                  filtered_only=True)])
+        self.assertEqual([{}, {}], [a['filtered'] for a in filterAnnotations(path, annotation_filter=['wbc'])])
+
+        # Copies: the callers add their own metadata
+        filterAnnotations(path)[0]['line_number'] = 1
+        self.assertNotIn('line_number', filterAnnotations(path)[0])
+
+        self.createTmpFile('annotations.json', dumps(annotations[1:]))
+        self.assertIsNot(index, AnnotationIndex.get(path))
+        self.assertEqual([2], [a['id'] for a in filterAnnotations(path)])
+    # end def test_index
+
+    def test_tree(self):
+        '''
+        Test: a tree scanned in parallel gives the same annotations as a serial run,
+        the same basename in two folders is patched apart
+        '''
+        sources = {'foo.c': 'int a __attribute__((ASPIRE("protection(xor, mask(constant(3)))")));\n'
+                            'int b;\n',
+                   'sub/bar.c': '_Pragma("ASPIRE begin protection(softvm)")\n'
+                                'int c __attribute__((ASPIRE("protection(xor)")));',
+                   'sub/baz.h': 'int d;\n',
+                   'sub/foo.c': 'int e __attribute__((ASPIRE("protection(xor)")));\n'}
+        for name, content in sources.items():
+            self.createTmpFile(join('tree', name), content)
+            self.createTmpFile(join('serial', name), content)
+        # end for
+
+        annotations, next_id = generateTreeAnnotations(join(self.tmpDir, 'tree'),
+                                                       join(self.tmpDir, 'tree.json'),
+                                                       join(self.tmpDir, 'tree.patch'),
+                                                       start_id = 10, jobs = 2)
+        self.assertEqual(14, next_id)
+        self.assertEqual([('foo.c', 10), ('sub/bar.c', 11), ('sub/bar.c', 12), ('sub/foo.c', 13)],
+                         [(a['file name'], a['id']) for a in annotations])
+
+        # The tree is unchanged, the patch gives the serial run sources
+        self.assertTmpFile('tree/sub/baz.h', 'int d;\n')
+        check_call('patch -s -p0 -d %s < %s' % (join(self.tmpDir, 'tree'), join(self.tmpDir, 'tree.patch')),
+                   shell = True)
+
+        start_id = 10
+        for name in sorted(sources):
+            _, start_id = generateExternalAnnotations(join(self.tmpDir, 'serial', name), start_id, None,
+                                                      join(self.tmpDir, 'serial.json'))
+            with open(join(self.tmpDir, 'serial', name)) as fi:
+                self.assertTmpFile(join('tree', name), fi.read())
+            # end with
+        # end for
+
+        with open(join(self.tmpDir, 'tree.json')) as fi:
+            self.assertEqual(annotations, load(fi))
+        # end with
+    # end def test_tree
+
+# end class AnnotationRewriterTestCase
+
+
+class AnnotationRewriterTasksTestCase(DoItTestCase):
+    '''
+    Annotation rewriting tasks tests
+    '''
+
+    def task_copy(self):
+        '''
+        Task: copy the sources to SC05
+
+        @return (Task)
+        '''
+        for name, i in (('foo.c', 1), ('bar.c', 2)):
+            self.createTmpFile(join('SC02', name),
+                               'int a __attribute__((ASPIRE("protection(placeHolder, id(%d))")));\n' % (i,))
+        # end for
+
+        tool = Copier(outputs = (join(self.tmpDir, 'SC05'), ''))
+        yield tool.tasks(join(self.tmpDir, 'SC02', '*.c'))
+    # end def task_copy
+
+    def task_annotate(self):
+        '''
+        Task: rewrite the annotations of each source (not yet copied)
+
+        @return (Task)
+        '''
+        annotations = [{'id': 1, 'file name': 'foo.c',
+                        'annotation content': 'protection(xor, mask(constant(3)))'},
+                       {'id': 2, 'file name': 'src/bar.c',
+                        'annotation content': 'protection(softvm)'}]
+        src = self.createTmpFile('annotations.json', dumps(annotations))
+        dst = join(self.tmpDir, 'SC05')
+
+        tool = AnnotationRewriter(outputs = (dst, ''))
+        yield tool.tasks(src, join(dst, '*.c'),
+                         filter = ['xor', 'softvm'],
+                         preprocessed = False)
+    # end def task_annotate
+
+    def task_next(self):
+        '''
+        Task: copy the rewritten sources to SC06
+
+        @return (Task)
+        '''
+        tool = Copier(outputs = (join(self.tmpDir, 'SC06'), ''))
+        yield tool.tasks(join(self.tmpDir, 'SC05', '*.c'))
+    # end def task_next
+
+    def test_pipeline(self):
+        '''
+        Test: each source rewritten before the next task reads it
+        '''
+        try:
+            self.build(jobs = 2, pipeline = True)
+        finally:
+            if isfile('.actc.db'):
+                remove('.actc.db')
+            # end if
+        # end try
+
+        self.assertTmpFile('SC06/foo.c',
+                           'int a __attribute__((ASPIRE("protection(xor, mask(constant(3)))")));\n')
+        self.assertTmpFile('SC06/bar.c',
+                           'int a __attribute__((ASPIRE("protection(softvm)")));\n')
+        self.assertTrue(isfile(join(self.tmpDir, 'SC05', '.foo.c.annotated')))
+    # end def test_pipeline
+
+# end class AnnotationRewriterTasksTestCase
+
+
+class AnnotationMergerTestCase(DoItTestCase):
+    '''
+    Annotation merger tests
+    '''
+
+    def task_merge(self):
+        '''
+        Task: merge the annotations files
+
+        @return (Task)
+        '''
+        dst = join(self.tmpDir, 'D01')
+
+        tool = AnnotationMerger(outputs = (dst, '.json'))
+        yield tool.tasks(join(self.tmpDir, '*.i.json'), join(dst, 'annotations.json'))
+    # end def task_merge
+
+    def assertMerged(self, *contents):
+        '''
+        Assert the merged file is the dump of the inputs annotations
+
+        @param contents [in] (list) annotations of each input
+        '''
+        self.assertTmpFile('D01/annotations.json',
+                           dumps([annotation for content in contents for annotation in content],
+                                 indent     = 2,
+                                 separators = (',', ': '),
+                                 sort_keys  = True))
+    # end def assertMerged
+
+    def test_merge(self):
+        '''
+        Test: only the changed inputs are serialized again
+        '''
+        foo = [{'id': 1, 'annotation content': 'protection(xor)'}]
+        bar = [{'id': 2, 'annotation content': 'protection(softvm)'},
+               {'id': 3, 'annotation content': 'protection(wbc)'}]
+        self.createTmpFile('a.i.json', dumps(foo))
+        self.createTmpFile('b.i.json', dumps([]))
+        self.createTmpFile('c.i.json', dumps(bar))
+
+        self.doIt('merge')
+        self.assertMerged(foo, bar)
+
+        # Changed segment: the other segments are copied from the sidecar offsets
+        foo = [{'id': 4, 'annotation content': 'protection(anti_debugging, x(1))'}] * 3
+        self.createTmpFile('a.i.json', dumps(foo))
+        self.doIt('merge')
+        self.assertMerged(foo, bar)
+
+        self.createTmpFile('b.i.json', dumps(bar))
+        self.createTmpFile('c.i.json', dumps([]))
+        utime(join(self.tmpDir, 'a.i.json'), (1, 1))
+        self.doIt('merge')
+        self.assertMerged(foo, bar)
+
+        # Same size and time stamp, other content: compared by digest
+        foo = [{'id': 5, 'annotation content': 'protection(anti_debugging, x(1))'}] * 3
+        self.createTmpFile('a.i.json', dumps(foo))
+        utime(join(self.tmpDir, 'a.i.json'), (1, 1))
+        self.createTmpFile('c.i.json', dumps(bar))
+        self.doIt('merge')
+        self.assertMerged(foo, bar, bar)
+    # end def test_merge
+
+# end class AnnotationMergerTestCase
+
+
+class NativeAnnotationExtractorTestCase(BaseTestCase):
+    '''
+    In process annotation extraction tests
+    '''
+
+    def test_extract(self):
+        '''
+        Test: pragmas and attributes of a preprocessed file, at their source line
+        '''
+        source = self.createTmpFile('foo.i',
+                                    '# 1 "foo.c"\n'
+                                    '# 1 "<built-in>"\n'
+                                    '# 1 "foo.c"\n'
+                                    '# 1 "foo.h" 1\n'
+                                    'int key __attribute__((ASPIRE("protection(xor, mask(constant(3)))")));\n'
+                                    '# 3 "foo.c" 2\n'
+                                    '\n'
+                                    '#pragma ASPIRE begin protection(softvm)\n'
+                                    'int f() { return 0; }\n'
+                                    '#pragma ASPIRE end\n'
+                                    '_Pragma("ASPIRE begin protection(obfuscations, label(\\"L\\"))") int g;\n')
+
+        self.assertEqual([('foo.h', 1, 'data', 'protection(xor, mask(constant(3)))'),
+                          ('foo.c', 4, 'code', 'protection(softvm)'),
+                          ('foo.c', 7, 'code', 'protection(obfuscations, label("L"))')],
+                         [(a['file name'], a['line number'], a['annotation type'], a['annotation content'])
+                          for a in extractAnnotations(source, join(self.tmpDir, 'foo.json'))])
+
+        # Batch: same output files as the tasks
+        self.createTmpFile('bar.i', '#pragma ASPIRE begin protection(wbc)\n')
+        self.assertEqual(4, extractFolderAnnotations([source, join(self.tmpDir, 'bar.i')],
+                                                     self.mkTmpDir('D01'), jobs = 2))
+        with open(join(self.tmpDir, 'D01', 'bar.i.json')) as fi:
+            self.assertEqual([{'file name': 'bar.i', 'line number': 1,
+                               'annotation type': 'code', 'annotation content': 'protection(wbc)'}],
+                             load(fi))
+        # end with
+    # end def test_extract
+
+# end class NativeAnnotationExtractorTestCase
+
+
+class AnnotationParserTestCase(BaseTestCase):
+    '''
+    Annotation parser tests
+    '''
+
+    ## Annotations parsed as by the regular expressions parser
+    CORPUS = ['protection(xor, mask(constant(35)))',
+              'protection(xor,mask(constant(35))), protection(softvm)',
+              'protection( softvm , mobile=1)',
+              'protection(obfuscations, enable_obfuscation(opaque_predicates:percent_apply=25)) trailing',
+              'protection(call_stack_check),protection(anti_debugging)\n',
+              'protection(xor, label(protection)), protections(x)',
+              'protection(xor\n), protection(softvm)',
+              'protection\n(xor)',
+              'protection(xor, ((((((((((deep))))))))))), protection(wbc, a(b(c)',
+              'placeHolder, protection(codeguard, attestator(x)) protection(ignored)',
+              'no protection here']
+
+    def test_corpus(self):
+        '''
+        Test: same techniques and annotations as the regular expressions parser
+        '''
+        for content in self.CORPUS + CASES.values():
+            self.assertEqual(referenceParse(content), parseAnnotationContent(content), content)
+        # end for
+
+        # Random sequences of the grammar symbols
+        random = Random(0)
+        symbols = ['protection', 'protection (', '(', ')', ',', ', protection(', ' ', '\n', 'xor', 'a=1']
+        for _ in xrange(5000):
+            content = ''.join(random.choice(symbols) for _ in xrange(random.randint(1, 12)))
+            try:
+                expected = referenceParse(content)
+            except AttributeError:
+                self.assertRaises(ValueError, parseAnnotationContent, content)
+                continue
+            # end try
+            self.assertEqual(expected, parseAnnotationContent(content), repr(content))
+        # end for
+    # end def test_corpus
+
+    def test_parameters(self):
+        '''
+        Test: parameter trees
+        '''
+        self.assertEqual([('xor', [('mask', [('constant', ['35'])])], 'protection(xor, mask(constant(35)))'),
+                          (' softvm', ['mobile=1', 'x'], 'protection( softvm , mobile=1, x)')],
+                         parseProtections('protection(xor, mask(constant(35))), protection( softvm , mobile=1, x)'))
+    # end def test_parameters
+
+# end class AnnotationParserTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.tools.test.testcache
+
+@brief   Artifact cache tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/14
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from os                         import chmod
+from os                         import environ
+from os                         import utime
+from os.path                    import isdir
+from os.path                    import isfile
+from os.path                    import join
+
+from actc.tools.cache           import ArtifactCache
+from actc.tools.test.basetest   import BaseTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class ArtifactCacheTestCase(BaseTestCase):
+    '''
+    ArtifactCache tests
+    '''
+
+    def test_restore(self):
+        '''
+        Test: restore stored targets
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'))
+        src   = self.createTmpFile('foo.c', 'foo')
+        dst   = self.createTmpFile('foo.o', 'bar')
+
+        key = cache.key(['cc'], 'cc -c foo.c -o foo.o', [src])
+
+        self.assertFalse(cache.restore(key, [dst]))
+        cache.store(key, [dst])
+
+        self.createTmpFile('foo.o', '')
+        self.assertTrue(cache.restore(key, [dst]))
+        self.assertTmpFile('foo.o', 'bar')
+
+        # Input content is part of the key
+        self.createTmpFile('foo.c', 'FOO')
+        self.assertNotEqual(key, cache.key(['cc'], 'cc -c foo.c -o foo.o', [src]))
+
+        self.assertEqual({'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0},
+                         cache.stats())
+    # end def test_restore
+
+    def test_evict(self):
+        '''
+        Test: least recently used entries are evicted
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'), size = 4)
+        dst   = self.createTmpFile('foo.o', 'bar')
+
+        cache.store('%064x' % 1, [dst])
+        cache.store('%064x' % 2, [dst])
+
+        self.assertFalse(cache.restore('%064x' % 1, [dst]))
+        self.assertTrue(cache.restore('%064x' % 2, [dst]))
+        self.assertEqual(1, cache.stats()['evictions'])
+    # end def test_evict
+
+    def test_lock(self):
+        '''
+        Test: entries locked per key, locked entries not evicted
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'), size = 4)
+        dst   = self.createTmpFile('foo.o', 'bar')
+
+        cache.store('%064x' % 1, [dst])
+
+        with cache.lock('%064x' % 1):
+            # Same key prefix, other key
+            with cache.lock('%064x' % 0x10) as locked:
+                self.assertTrue(locked)
+            # end with
+
+            with cache.lock('%064x' % 1, wait = False) as locked:
+                self.assertFalse(locked)
+            # end with
+
+            cache.store('%064x' % 2, [dst])
+        # end with
+
+        # The least recently used entry being locked, the other one is evicted
+        self.assertTrue(isdir(join(self.tmpDir, 'CACHE', '00', '%064x' % 1)))
+        self.assertFalse(isdir(join(self.tmpDir, 'CACHE', '00', '%064x' % 2)))
+    # end def test_lock
+
+    def test_program(self):
+        '''
+        Test: version of a tool found in the PATH part of the key
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'))
+        tool  = self.createTmpFile(join('bin', 'cc'), '#!/bin/sh')
+        path  = environ.get('PATH', '')
+        chmod(tool, 0755)
+
+        try:
+            environ['PATH'] = join(self.tmpDir, 'bin')
+            key = cache.key(['cc'], 'cc -c foo.c -o foo.o', [])
+
+            utime(tool, (0, 0))
+            self.assertNotEqual(key, cache.key(['cc'], 'cc -c foo.c -o foo.o', []))
+        finally:
+            environ['PATH'] = path
+        # end try
+    # end def test_program
+
+    def test_relocate(self):
+        '''
+        Test: same key for another module or another build folder
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'))
+        keys  = list()
+
+        for base, module in (('A', 'foo'), ('A', 'bar'), ('B', 'foo')):
+            root   = join(self.tmpDir, base)
+            output = join(root, 'build', module)
+            src    = self.createTmpFile(join(base, 'foo.c'), 'foo')
+
+            cache.relocate([output], root)
+            keys.append(cache.key(['cc'], 'cc -c %s -o %s/foo.o' % (src, output), [src]))
+        # end for
+
+        self.assertEqual(1, len(set(keys)))
+    # end def test_relocate
+
+    def test_save(self):
+        '''
+        Test: counters saved once per build
+        '''
+        cache = ArtifactCache(join(self.tmpDir, 'CACHE'))
+        dst   = self.createTmpFile('foo.o', 'bar')
+
+        cache.restore('%064x' % 1, [dst])
+        self.assertFalse(isfile(join(self.tmpDir, 'CACHE', 'stats.json')))
+
+        cache.save()
+        cache.restore('%064x' % 1, [dst])
+        self.assertEqual(1, ArtifactCache(join(self.tmpDir, 'CACHE')).stats()['misses'])
+        self.assertEqual(2, cache.stats()['misses'])
+    # end def test_save
+
+# end class ArtifactCacheTestCase
+
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
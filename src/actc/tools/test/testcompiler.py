@@ -0,0 +1,596 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+# Copyright (c) 2014-2016 Nagravision S.A.
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the Nagravision S.A., nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL NAGRAVISION S.A. BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ------------------------------------------------------------------------------
+''' @package  actc.tools.test.testcompiler
+
+@brief   Compiler header dependency tests
+
+@author  Ronan Le Gallic
+
+@date    2014/10/14
+'''
+# ------------------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------------------
+from os                         import remove
+from glob                       import glob
+from json                       import load
+from os                         import stat
+from os                         import utime
+from os.path                    import isfile
+from os.path                    import join
+from subprocess                 import check_call
+
+from actc.dodo                  import _exitStatus
+from actc.tools.cache           import ArtifactCache
+from actc.tools.cache           import getCache
+from actc.tools.cache           import setCache
+from actc.tools.compiler        import Compiler
+from actc.tools.compiler        import Linker
+from actc.tools.compiler        import Preprocessor
+from actc.tools.compiler        import _headersUpToDate
+from actc.tools.compiler        import _library
+from actc.tools.compiler        import _recordHeaders
+from actc.tools.compiler        import objectFingerprint
+from actc.tools.compiler        import splitOptions
+from actc.tools.test.basetest   import BaseTestCase
+from actc.tools.test.basetest   import DoItTestCase
+
+# ------------------------------------------------------------------------------
+# implementation
+# ------------------------------------------------------------------------------
+
+class HeaderDepsTestCase(BaseTestCase):
+    '''
+    Compiler header dependency tests
+    '''
+
+    def test_depfile(self):
+        '''
+        Test: only the headers listed in the dependency file are recorded
+        '''
+        src  = self.createTmpFile('foo.c', '#include "foo bar.h"')
+        foo  = self.createTmpFile('foo bar.h', 'foo')
+        bar  = self.createTmpFile('bar.h', 'bar')
+        rule = self.createTmpFile('foo.c.o.d', 'foo.c.o: %s \\\n %s\n'
+                                  % (src, foo.replace(' ', '\\ ')))
+
+        values = _recordHeaders(src, rule, [join(self.tmpDir, '*.h')])
+
+        self.assertFalse(isfile(rule))
+        self.assertEqual([foo], values['headers'].keys())
+        self.assertTrue(_headersUpToDate(None, values))
+
+        self.createTmpFile('foo bar.h', 'FOO BAR')
+        self.assertFalse(_headersUpToDate(None, values))
+
+        # Without dependency file, all the headers are recorded
+        values = _recordHeaders(src, rule, [join(self.tmpDir, '*.h')])
+        self.assertEqual(sorted([foo, bar]), sorted(values['headers']))
+    # end def test_depfile
+
+# end class HeaderDepsTestCase
+
+
+class CompileCacheTestCase(DoItTestCase):
+    '''
+    Compiler artifact cache tests
+    '''
+
+    _aid = 'A'
+
+    def task_compile(self):
+        '''
+        Task: compile foo.c
+
+        @return (Task)
+        '''
+        dst = join(self.tmpDir, 'BC08')
+
+        tool = Compiler(program = 'gcc',
+                        options = ['-I', self.tmpDir, '-D', 'ASPIRE_AID=%s' % (self._aid,)],
+                        outputs = (dst, '.o'))
+        yield tool.tasks(join(self.tmpDir, '*.c'))
+    # end def task_compile
+
+    def test_splitOptions(self):
+        '''
+        Test: preprocessor options and outputs out of the compiler options
+        '''
+        self.assertEqual((['-I', 'inc', '-DX=1', '-include', 'x.h'], ['-O2', '-g']),
+                         splitOptions(['-I', 'inc', '-O2', '-DX=1', '-c', 'foo.c', '-include', 'x.h',
+                                       '-MMD', '-MF', 'foo.o.d', '-g', '-o', 'foo.o'], 'foo.c'))
+    # end def test_splitOptions
+
+    def test_cache(self):
+        '''
+        Test: the key is the preprocessed source, not the unused macros
+        '''
+        self.createTmpFile('foo.c', '#include "foo.h"\nint f(void) { return FOO; }\n')
+        self.createTmpFile('foo.h', '#define FOO 1\n')
+
+        cache = getCache()
+        setCache(ArtifactCache(join(self.tmpDir, 'CACHE')))
+        try:
+            self.doIt('compile')
+            self.assertEqual((0, 1), (getCache().stats()['hits'], getCache().stats()['misses']))
+
+            # Other module
+            remove(join(self.tmpDir, 'BC08', 'foo.c.o'))
+            self._aid = 'B'
+            self.doIt('compile')
+            self.assertEqual((1, 1), (getCache().stats()['hits'], getCache().stats()['misses']))
+
+            # Changed header
+            remove(join(self.tmpDir, 'BC08', 'foo.c.o'))
+            self.createTmpFile('foo.h', '#define FOO 2\n')
+            self.doIt('compile')
+            self.assertEqual((1, 2), (getCache().stats()['hits'], getCache().stats()['misses']))
+            self.assertTrue(isfile(join(self.tmpDir, 'BC08', 'foo.c.o')))
+        finally:
+            setCache(cache)
+        # end try
+    # end def test_cache
+
+    def task_shell(self):
+        '''
+        Task: compile foo.c with a shell construction
+
+        @return (Task)
+        '''
+        tool = Compiler(program = 'gcc',
+                        options = ['-I', self.tmpDir, '$(echo -O0)'],
+                        outputs = (join(self.tmpDir, 'SHELL'), '.o'))
+        yield tool.tasks(join(self.tmpDir, '*.c'),
+                         header_files = [join(self.tmpDir, '*.h')])
+    # end def task_shell
+
+    def test_shell(self):
+        '''
+        Test: the headers are part of the key of a command keyed as is
+        '''
+        self.createTmpFile('foo.c', '#include "foo.h"\nint f(void) { return FOO; }\n')
+        self.createTmpFile('foo.h', '#define FOO 1\n')
+
+        cache = getCache()
+        setCache(ArtifactCache(join(self.tmpDir, 'CACHE')))
+        try:
+            self.doIt('shell')
+
+            # Changed header
+            self.createTmpFile('foo.h', '#define FOO 2\n')
+            self.doIt('shell')
+            self.assertEqual((0, 2), (getCache().stats()['hits'], getCache().stats()['misses']))
+        finally:
+            setCache(cache)
+        # end try
+    # end def test_shell
+
+    _root = 'A'
+
+    def task_relocate(self):
+        '''
+        Task: compile <root>/foo.c with debug information
+
+        @return (Task)
+        '''
+        root = join(self.tmpDir, self._root)
+
+        tool = Compiler(program = 'gcc',
+                        options = ['-g', '-I', root],
+                        outputs = (join(root, 'BC08'), '.o'))
+        yield tool.tasks(join(root, '*.c'))
+    # end def task_relocate
+
+    def test_relocate(self):
+        '''
+        Test: the line markers of another build folder give the same key, not another line
+        '''
+        for root in ('A', 'B', 'C'):
+            self.createTmpFile(join(root, 'foo.c'), '#include "foo.h"\nint f(void) { return FOO; }\n')
+            self.createTmpFile(join(root, 'foo.h'), '#define FOO 1\n')
+        # end for
+        self.createTmpFile(join('C', 'foo.c'), '#include "foo.h"\n\nint f(void) { return FOO; }\n')
+
+        cache = getCache()
+        setCache(ArtifactCache(join(self.tmpDir, 'CACHE')))
+        try:
+            for root in ('A', 'B', 'C'):
+                self._root = root
+                getCache().relocate([join(self.tmpDir, root, 'BC08')], join(self.tmpDir, root))
+                self.doIt('relocate')
+            # end for
+            self.assertEqual((1, 2), (getCache().stats()['hits'], getCache().stats()['misses']))
+        finally:
+            setCache(cache)
+        # end try
+    # end def test_relocate
+
+# end class CompileCacheTestCase
+
+
+class BatchCompileTestCase(DoItTestCase):
+    '''
+    Batch compilation tests
+    '''
+
+    def task_batch(self):
+        '''
+        Task: compile the sources by 2
+
+        @return (Task)
+        '''
+        dst = join(self.tmpDir, 'BC08')
+
+        tool = Compiler(program = 'gcc',
+                        options = ['-I', self.tmpDir, '-g'],
+                        outputs = (dst, '.o'),
+                        batch   = 2)
+        yield tool.tasks(join(self.tmpDir, '*.c'),
+                         header_files = [join(self.tmpDir, '*.h')])
+    # end def task_batch
+
+    def _inodes(self):
+        '''
+        Get the inodes of the objects
+
+        @return (list)
+        '''
+        return [stat(join(self.tmpDir, 'BC08', name)).st_ino
+                for name in ('a.c.o', 'b.c.o', 'c.c.o')]
+    # end def _inodes
+
+    def test_batch(self):
+        '''
+        Test: objects named after the targets, only the stale ones compiled again
+        '''
+        self.createTmpFile('a.c', '#include "foo.h"\nint a(void) { return FOO; }\n')
+        self.createTmpFile('b.c', 'int b(void) { return 2; }\n')
+        self.createTmpFile('c.c', 'int c(void) { return 3; }\n')
+        self.createTmpFile('foo.h', '#define FOO 1\n')
+
+        self.doIt('batch')
+        inodes = self._inodes()
+
+        self.createTmpFile('b.c', 'int b(void) { return 4; }\n')
+        self.doIt('batch')
+        self.assertEqual([True, False, True], [x == y for x, y in zip(inodes, self._inodes())])
+
+        # Header of a.c
+        inodes = self._inodes()
+        self.createTmpFile('foo.h', '#define FOO 2\n')
+        self.doIt('batch')
+        self.assertEqual([False, True, True], [x == y for x, y in zip(inodes, self._inodes())])
+    # end def test_batch
+
+    def task_argv(self):
+        '''
+        Task: compile the sources of a folder with a space, by 2
+
+        @return (Task)
+        '''
+        src = join(self.tmpDir, 'with space')
+
+        tool = Compiler(program = 'gcc',
+                        options = ['-I', src],
+                        outputs = (join(self.tmpDir, 'ARGV'), '.o'),
+                        batch   = 2)
+        yield tool.tasks(join(src, '*.c'),
+                         header_files = [join(src, '*.h')])
+    # end def task_argv
+
+    def test_argv(self):
+        '''
+        Test: paths passed as is to the frontend, exit status of a failed batch
+        '''
+        self.createTmpFile('with space/a.c', '#include "foo.h"\nint a(void) { return FOO; }\n')
+        self.createTmpFile('with space/b.c', 'int b(void) { return 2; }\n')
+        self.createTmpFile('with space/foo.h', '#define FOO 1\n')
+
+        self.doIt('argv')
+        self.assertTrue(isfile(join(self.tmpDir, 'ARGV', 'a.c.o')))
+        self.assertTrue(isfile(join(self.tmpDir, 'ARGV', 'b.c.o')))
+
+        # Failure reported as a doit command failure
+        self.createTmpFile('with space/b.c', 'int b(void) { return }\n')
+
+        def flatten(tasks):
+            for task in tasks:
+                if isinstance(task, dict):
+                    yield task
+                else:
+                    for subtask in flatten(task):
+                        yield subtask
+                    # end for
+                # end if
+            # end for
+        # end def flatten
+
+        action, args = [task for task in flatten(self.task_argv())
+                        if task['name'].startswith('compile')][0]['actions'][0]
+        self.assertEqual(1, _exitStatus(action(*args)))
+    # end def test_argv
+
+# end class BatchCompileTestCase
+
+
+class PreprocessedStoreTestCase(DoItTestCase):
+    '''
+    Preprocessed outputs shared by the stages tests
+    '''
+
+    def task_preprocess(self):
+        '''
+        Task: preprocess the copies of a source in 2 stages
+
+        @return (Task)
+        '''
+        for stage in ('SC02', 'SC04'):
+            tool = Preprocessor(program = 'gcc',
+                                options = ['-D', 'BAR=2'],
+                                outputs = (join(self.tmpDir, stage + '.i'), '.i'),
+                                store   = join(self.tmpDir, 'STORE'))
+            yield tool.tasks(join(self.tmpDir, stage, '*.c'),
+                             header_files = [join(self.tmpDir, stage, '*.h')])
+        # end for
+    # end def task_preprocess
+
+    def test_store(self):
+        '''
+        Test: identical source, headers and options preprocessed once
+        '''
+        for stage in ('SC02', 'SC04'):
+            self.mkTmpDir(stage)
+            self.createTmpFile(join(stage, 'foo.c'), '#include "foo.h"\nint foo = FOO + BAR;\n')
+            self.createTmpFile(join(stage, 'foo.h'), '#define FOO 1\n')
+        # end for
+        self.createTmpFile('SC04/foo.h', '#define FOO 3\n')
+
+        self.doIt('preprocess')
+        self.assertEqual(2, len(glob(join(self.tmpDir, 'STORE', '*', '*.i'))))
+        self.assertTmpFile('SC04.i/foo.c.i', 'int foo = 3 + 2;\n')
+
+        # Same header: SC04 output linked from the SC02 one
+        self.createTmpFile('SC04/foo.h', '#define FOO 1\n')
+        self.doIt('preprocess')
+        self.assertTmpFile('SC04.i/foo.c.i', 'int foo = 1 + 2;\n')
+        self.assertEqual(2, len(glob(join(self.tmpDir, 'STORE', '*', '*.i'))))
+        self.assertFalse(isfile(join(self.tmpDir, 'SC04.i', 'foo.c.i.d')))
+    # end def test_store
+
+    def task_stages(self):
+        '''
+        Task: preprocess a source in 3 stages, 2 of them with the same options
+
+        @return (Task)
+        '''
+        for stage, options in (('SC04.03', ['-D', 'ASPIRE_AID=A']),
+                               ('SC04',    ['-D', 'ASPIRE_AID=A']),
+                               ('SC05',    ['-D', 'ASPIRE_AID=A', '-std=c99'])):
+            tool = Preprocessor(program = 'gcc',
+                                options = options,
+                                outputs = (join(self.tmpDir, 'I', stage), '.i'),
+                                store   = join(self.tmpDir, 'STORE'))
+            yield tool.tasks(join(self.tmpDir, stage, '*.c'),
+                             header_files = [join(self.tmpDir, stage, '*.h')])
+        # end for
+    # end def task_stages
+
+    def test_stages(self):
+        '''
+        Test: an output only shared with the same options and include closure
+        '''
+        for stage in ('SC04.03', 'SC04', 'SC05'):
+            self.createTmpFile(join(stage, 'foo.c'), '#include <stddef.h>\n#include "foo.h"\n'
+                                                     'size_t foo = FOO;\n')
+            self.createTmpFile(join(stage, 'foo.h'), '#define FOO 1\n')
+        # end for
+
+        self.doIt('stages')
+        self.assertEqual(2, len(glob(join(self.tmpDir, 'STORE', '*', '*.json'))))
+        self.assertEqual(2, len(glob(join(self.tmpDir, 'STORE', '*', '*.i'))))
+
+        # System headers recorded (depfile of -MD)
+        manifests = glob(join(self.tmpDir, 'STORE', '*', '*.json'))
+        with open(manifests[0]) as fo:
+            headers = [name for name, _, _ in load(fo)[0]['headers']]
+        # end with
+        self.assertIn('foo.h', headers)
+        self.assertTrue(any(name.endswith('/stddef.h') for name in headers))
+    # end def test_stages
+
+# end class PreprocessedStoreTestCase
+
+
+class PrebuiltTestCase(DoItTestCase):
+    '''
+    Prebuilt objects shared by the modules tests
+    '''
+
+    def task_compile(self):
+        '''
+        Task: compile the same library source for 2 modules
+
+        @return (Task)
+        '''
+        for module in ('A', 'B'):
+            tool = Compiler(program  = 'gcc',
+                            options  = ['-DPORT=%s' % (self.port,)],
+                            outputs  = (join(self.tmpDir, module), '.o'),
+                            prebuilt = join(self.tmpDir, 'PREBUILT'))
+            yield tool.tasks(join(self.tmpDir, 'lib', '*.c'),
+                             header_files = [join(self.tmpDir, 'lib', '*.h')])
+        # end for
+    # end def task_compile
+
+    def test_prebuilt(self):
+        '''
+        Test: an object compiled once for the modules with the same options
+        '''
+        self.mkTmpDir('lib')
+        self.createTmpFile('lib/lib.c', '#include "lib.h"\nint port = PORT + BASE;\n')
+        self.createTmpFile('lib/lib.h', '#define BASE 1\n')
+
+        self.port = 80
+        self.doIt('compile')
+
+        objects = glob(join(self.tmpDir, 'PREBUILT', '*', '*.o'))
+        self.assertEqual(1, len(objects))
+        self.assertEqual(stat(objects[0]).st_ino, stat(join(self.tmpDir, 'B', 'lib.c.o')).st_ino)
+
+        # Other define: new object
+        self.port = 443
+        self.doIt('compile')
+        self.assertEqual(2, len(glob(join(self.tmpDir, 'PREBUILT', '*', '*.o'))))
+
+        # Other header: new object
+        self.createTmpFile('lib/lib.h', '#define BASE 2\n')
+        self.doIt('compile')
+        self.assertEqual(3, len(glob(join(self.tmpDir, 'PREBUILT', '*', '*.o'))))
+    # end def test_prebuilt
+
+# end class PrebuiltTestCase
+
+class LinkTestCase(DoItTestCase):
+    '''
+    Link avoidance tests
+    '''
+
+    def task_compile(self):
+        '''
+        Task: compile the sources
+
+        @return (Task)
+        '''
+        tool = Compiler(program = 'gcc',
+                        options = ['-g'],
+                        outputs = (join(self.tmpDir, 'BC08'), '.o'))
+        yield tool.tasks(join(self.tmpDir, '*.c'))
+    # end def task_compile
+
+    def task_link(self):
+        '''
+        Task: link the objects and the library
+
+        @return (Task)
+        '''
+        tool = Linker(program = 'gcc',
+                      outputs = (join(self.tmpDir, 'BC02'), ''))
+        yield tool.tasks([join(self.tmpDir, 'BC08', 'main.c.o'), join(self.tmpDir, 'lib.a')],
+                         join(self.tmpDir, 'BC02', 'a.out'))
+    # end def task_link
+
+    def _build(self, mtime):
+        '''
+        Compile, archive the library, then link
+
+        @param mtime [in] (int) time stamp of the library member
+        '''
+        self.doIt('compile')
+
+        if isfile(join(self.tmpDir, 'lib.a')):
+            remove(join(self.tmpDir, 'lib.a'))
+        # end if
+
+        utime(join(self.tmpDir, 'BC08', 'lib.c.o'), (mtime, mtime))
+        check_call(['ar', 'rcsU', join(self.tmpDir, 'lib.a'), join(self.tmpDir, 'BC08', 'lib.c.o')])
+
+        self.doIt('link')
+    # end def _build
+
+    def test_link(self):
+        '''
+        Test: binary untouched when linked from the same objects
+        '''
+        binary = join(self.tmpDir, 'BC02', 'a.out')
+
+        self.createTmpFile('lib.c', 'int lib(void) { return 0; }\n')
+        self.createTmpFile('main.c', 'int lib(void);\nint main(void) { return lib(); }\n')
+        self._build(1)
+        utime(binary, (0, 0))
+
+        # Library archived again: other member time stamp
+        self._build(2)
+        self.assertEqual(0, stat(binary).st_mtime)
+
+        # Other object
+        self.createTmpFile('main.c', 'int lib(void);\nint main(void) { return lib() + 1; }\n')
+        self._build(2)
+        self.assertNotEqual(0, stat(binary).st_mtime)
+    # end def test_link
+
+    def test_fingerprint(self):
+        '''
+        Test: fingerprint target of the link, libraries of the frontend search path
+        '''
+        binary = join(self.tmpDir, 'BC02', 'a.out')
+
+        self.createTmpFile('lib.c', 'int lib(void) { return 0; }\n')
+        self.createTmpFile('main.c', 'int lib(void);\nint main(void) { return lib(); }\n')
+        self._build(1)
+        utime(binary, (0, 0))
+
+        # Fingerprint removed: linked again
+        remove(binary + '.fingerprint')
+        self._build(1)
+        self.assertNotEqual(0, stat(binary).st_mtime)
+        self.assertTrue(isfile(binary + '.fingerprint'))
+
+        self.assertTrue(isfile(_library('gcc', 'c', [])))
+        self.assertEqual(None, _library('gcc', 'nosuchlibrary', []))
+    # end def test_fingerprint
+
+    def test_archive(self):
+        '''
+        Test: archive members time stamps ignored
+        '''
+        member = 'int a;\n'
+        for name, mtime in (('a.a', 1), ('b.a', 2)):
+            self.createTmpFile(name, '!<arch>\n'
+                                     + '%-16s%-12d%-6d%-6d%-8o%-10d`\n'
+                                       % ('a.o/', mtime, 0, 0, 0644, len(member))
+                                     + member + '\n')
+        # end for
+
+        self.assertEqual(objectFingerprint(join(self.tmpDir, 'a.a')),
+                         objectFingerprint(join(self.tmpDir, 'b.a')))
+
+        self.createTmpFile('c.a', '!<arch>\n'
+                                  + '%-16s%-12d%-6d%-6d%-8o%-10d`\n'
+                                    % ('a.o/', 1, 0, 0, 0644, len(member))
+                                  + 'int b;\n\n')
+        self.assertNotEqual(objectFingerprint(join(self.tmpDir, 'a.a')),
+                            objectFingerprint(join(self.tmpDir, 'c.a')))
+    # end def test_archive
+
+# end class LinkTestCase
+
+# ------------------------------------------------------------------------------
+# END OF FILE
+# ------------------------------------------------------------------------------
+
@@ -37,12 +37,17 @@
 # ------------------------------------------------------------------------------
 # import
 # ------------------------------------------------------------------------------
+from os                         import stat
+from os                         import utime
 from os.path                    import join
 from shutil                     import copyfile
 
 from actc.tools                 import AbstractTool
+from actc.tools                 import AbstractBasicCmdTool
 from actc.tools                 import AbstractBasicPythonTool
+from actc.tools                 import expand
 from actc.tools                 import toList
+from actc.tools.annotation      import Unannotated
 from actc.tools.test.basetest   import DoItTestCase
 
 # ------------------------------------------------------------------------------
@@ -67,6 +72,28 @@ class ToolTestCase(DoItTestCase):
         self.assertEqual(['two', 2], toList(['two', 2]))
     # end def test_toList
 
+    def test_expand(self):
+        '''
+        Test: folder listing reused until the folder changes
+        '''
+        folder = self.mkTmpDir('src')
+        self.createTmpFile(join('src', 'a.c'))
+        self.createTmpFile(join('src', '.b.c'))
+        utime(folder, (1, 1))
+
+        self.assertEqual([join(folder, 'a.c')], expand(join(folder, '*.c')))
+        self.assertEqual([join(folder, '.b.c')], expand(join(folder, '.*.c')))
+
+        # Added file, same folder time stamp: listing reused
+        self.createTmpFile(join('src', 'c.c'))
+        utime(folder, (1, 1))
+        self.assertEqual([join(folder, 'a.c')], expand(join(folder, '*.c')))
+
+        utime(folder, (2, 2))
+        self.assertEqual([join(folder, 'a.c'), join(folder, 'c.c')],
+                         sorted(expand(join(folder, '*.c'))))
+    # end def test_expand
+
     def task_tool(self):
         '''
         Task: create folder
@@ -129,6 +156,48 @@ class ToolTestCase(DoItTestCase):
         self.assertTmpFile('BASIC_PYTHON_TOOL/bar', 'foo')
     # end def test_basicPythonTool
 
+    def task_passThrough(self):
+        '''
+        Task: upper case the files annotated with xor
+
+        @return (Task)
+        '''
+
+        class Upper(AbstractBasicCmdTool):
+            '''
+            Upper case
+            '''
+            def _cmd(self, task):
+                '''
+                @copydoc actc.tools.AbstractBasicCmdTool._cmd
+                '''
+                return 'tr a-z A-Z < %s > %s' % (list(task.file_dep)[0], task.targets[0])
+            # end def _cmd
+        # end class Upper
+
+        self.createTmpFile('foo.i', 'int a __attribute__((ASPIRE("protection(xor)")));\n')
+        self.createTmpFile('bar.i', '#pragma ASPIRE begin protection(softvm)\n')
+        self.createTmpFile('baz.i', 'int c;\n')
+
+        dst = join(self.tmpDir, 'PASS_THROUGH')
+
+        tool = Upper(program = 'tr', outputs = (dst, ''))
+        yield tool.tasks(join(self.tmpDir, '*.i'), skip = Unannotated(['xor']))
+    # end def task_passThrough
+
+    def test_passThrough(self):
+        '''
+        Test: the files without annotation of the techniques are linked
+        '''
+        self.doIt('passThrough')
+        self.assertTmpFile('PASS_THROUGH/foo.i', 'INT A __ATTRIBUTE__((ASPIRE("PROTECTION(XOR)")));\n')
+        self.assertTmpFile('PASS_THROUGH/bar.i', '#pragma ASPIRE begin protection(softvm)\n')
+        self.assertTmpFile('PASS_THROUGH/baz.i', 'int c;\n')
+
+        self.assertEqual(stat(join(self.tmpDir, 'baz.i')).st_ino,
+                         stat(join(self.tmpDir, 'PASS_THROUGH', 'baz.i')).st_ino)
+    # end def test_passThrough
+
 
 # end class ToolTestCase
 
@@ -37,9 +37,13 @@
 # ------------------------------------------------------------------------------
 # import
 # ------------------------------------------------------------------------------
+from os                         import stat
 from os.path                    import join
+from unittest                   import TestCase
 
+from actc.tools                 import linkFile
 from actc.tools.utils           import Copier
+from actc.tools.utils           import make_digest
 from actc.tools.test.basetest   import DoItTestCase
 
 # ------------------------------------------------------------------------------
@@ -94,9 +98,82 @@ class CopierTestCase(DoItTestCase):
         self.assertTmpFile('EXT/bar.x', 'foo')
     # end def test_pattern
 
+    def task_batch(self):
+        '''
+        Task: copy a folder
+
+        @return (Task)
+        '''
+        dst = join(self.tmpDir, 'BATCH')
+
+        tool = Copier(outputs = (dst, ''), inplace = True, batch = True)
+        yield tool.tasks(join(self.tmpDir, '*.c'))
+    # end def task_batch
+
+    def test_batch(self):
+        '''
+        Test: only the changed files are copied again
+        '''
+        self.createTmpFile('foo.c', 'foo')
+        self.createTmpFile('bar.c', 'bar')
+        self.doIt('batch')
+        self.assertTmpFile('BATCH/foo.c', 'foo')
+        self.assertTmpFile('BATCH/bar.c', 'bar')
+
+        foo = stat(join(self.tmpDir, 'BATCH', 'foo.c')).st_ino
+
+        self.createTmpFile('bar.c', 'baz')
+        self.doIt('batch')
+        self.assertTmpFile('BATCH/bar.c', 'baz')
+        self.assertEqual(foo, stat(join(self.tmpDir, 'BATCH', 'foo.c')).st_ino)
+    # end def test_batch
+
+    def test_link(self):
+        '''
+        Test: hard links, unless updated in place, never written through
+        '''
+        src = self.createTmpFile('bar', 'foo')
+        dst = join(self.tmpDir, 'baz')
+
+        linkFile(src, dst, 'hardlink')
+        self.assertEqual(stat(src).st_ino, stat(dst).st_ino)
+
+        linkFile(src, dst, 'hardlink', inplace = True)
+        self.assertNotEqual(stat(src).st_ino, stat(dst).st_ino)
+
+        linkFile(src, dst, 'auto')
+        self.assertTmpFile('baz', 'foo')
+
+        # Copy over a previous link
+        linkFile(src, dst, 'hardlink')
+        self.createTmpFile('qux', 'bar')
+        linkFile(join(self.tmpDir, 'qux'), dst, 'copy')
+        self.assertTmpFile('bar', 'foo')
+        self.assertTmpFile('baz', 'bar')
+    # end def test_link
+
 
 # end class CopierTestCase
 
+
+class DigestTestCase(TestCase):
+    '''
+    make_digest tests
+    '''
+
+    def test_canonical(self):
+        '''
+        Test: the digest does not depend on the keys order nor the string types
+        '''
+        self.assertEqual(make_digest({'id': 1, 'filtered': {'xor': 'mask(3)', 'softvm': ''}}),
+                         make_digest({u'filtered': {u'softvm': u'', u'xor': u'mask(3)'}, u'id': 1}))
+        self.assertEqual('4f53cda18c2baa0c0354bb5f9a3ecbe5ed12ab4d8e11ba873c2f11161202b945',
+                         make_digest([]))
+        self.assertNotEqual(make_digest([1, 2]), make_digest([2, 1]))
+    # end def test_canonical
+
+# end class DigestTestCase
+
 # ------------------------------------------------------------------------------
 # END OF FILE
 # ------------------------------------------------------------------------------
@@ -37,52 +37,154 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
+from hashlib                    import sha256
+from json                       import dump
+from json                       import dumps
+from json                       import load
+from os                         import rename
+from os                         import stat
 from os.path                    import dirname
 from os.path                    import isdir
-from shutil                     import copyfile
-import copy
+from os.path                    import isfile
+from os.path                    import join
 
 from actc.tools                 import AbstractBasicPythonTool
+from actc.tools                 import linkFile
+from actc.tools                 import toList
 
 # ------------------------------------------------------------------------------
 # implementation
 # ------------------------------------------------------------------------------
 
+# Folder copies by default (see setBatchCopy)
+_BATCH = [False]
+
+def setBatchCopy(batch):
+    '''
+    Select how the Copier tools schedule their copies
+
+    @param batch [in] (bool) a task by folder, else by file
+    '''
+    _BATCH[0] = batch
+# end def setBatchCopy
+
+
 class Copier(AbstractBasicPythonTool):
     '''
     Copy files from src to dest[.ext]
+
+    The copies share the content of the files when possible (see
+    actc.tools.linkFile and actc.tools.setLinkMode).
+
+    In batch mode, a single task copies the whole folder: a manifest
+    (dest/.copy-<digest>.json: dst --> [src, mtime, size]) records the copied
+    files, only the new or changed ones being copied again.
     '''
 
+    def __init__(self, outputs = None,
+                       inplace = False,
+                       batch   = None):
+        '''
+        Constructor
+
+        @option outputs [in] (tuple, list) (dir, ext)
+        @option inplace [in] (bool) the copies are updated in place later: no hard link
+        @option batch   [in] (bool) a task by folder, see setBatchCopy by default
+        '''
+        super(Copier, self).__init__(outputs = outputs)
+
+        self._inplace = inplace
+        self._batch   = _BATCH[0] if batch is None else batch
+    # end def __init__
+
     _ACTION = 'copy'
 
     def _python(self, task):
         '''
         @copydoc actc.tools.AbstractPythonTool._python
         '''
-        copyfile(list(task.file_dep)[0], task.targets[0])
+        linkFile(list(task.file_dep)[0], task.targets[0], inplace = self._inplace)
     # end def _python
 
+    def _folder(self, pairs, manifest):
+        '''
+        Copy the new or changed files
+
+        @param pairs    [in] (list) (src, dst)
+        @param manifest [in] (str)  copied files (json)
+        '''
+        copied = dict()
+
+        if isfile(manifest):
+            with open(manifest, 'r') as fo:
+                copied = load(fo)
+            # end with
+        # end if
+
+        files = dict()
+
+        for src, dst in pairs:
+            info  = stat(src)
+            state = [src, info.st_mtime, info.st_size]
+
+            if (   (copied.get(dst) != state)
+                or not isfile(dst)):
+                linkFile(src, dst, inplace = self._inplace)
+            # end if
+
+            files[dst] = state
+        # end for
+
+        with open(manifest + '.tmp', 'w') as fo:
+            dump(files, fo)
+        # end with
+        rename(manifest + '.tmp', manifest)
+    # end def _folder
+
+    def tasks(self, *args, **kwargs):
+        '''
+        @copydoc actc.tools.AbstractBasicPythonTool.tasks
+        '''
+        if (not self._batch):
+            yield super(Copier, self).tasks(*args, **kwargs)
+            return
+        # end if
+
+        # Create Folders
+        yield super(AbstractBasicPythonTool, self).tasks(*args, **kwargs)
+
+        # Process Folder
+        path, _ = self._outputs[0]
+        pairs   = list(self._pairs(*args, **kwargs))
+
+        if (not pairs):
+            return
+        # end if
+
+        sources  = toList(args[0])
+        manifest = join(path, '.copy-%s.json' % (make_digest(sources)[:16],))
+
+        yield {'name'    : self._name(self._ACTION, sources, '\ninto', path),
+               'title'   : self._title,
+               'actions' : [(self._folder, (pairs, manifest)),],
+               'targets' : [dst for _, dst in pairs] + [manifest,],
+               'file_dep': [src for src, _ in pairs],
+               'task_dep': ['_createfolder_' + path]
+               }
+    # end def tasks
+
 # end class Copier
 
 
 
-def make_hash(o):
+def make_digest(o):
     """
-    Makes a hash from a dictionary, list, tuple or set to any level, that contains
-    only other hashable types (including any lists, tuples, sets, and
-    dictionaries).
+    Makes a sha256 hex digest from JSON serializable data (dictionaries, lists,
+    strings, numbers). The serialization is canonical (sorted keys, no
+    whitespace), so the digest is the same across Python builds and hosts.
     """
 
-    if isinstance(o, (set, tuple, list)):
-        return hash(tuple([make_hash(e) for e in o]))
-
-    elif not isinstance(o, dict):
-        return hash(o)
-
-    new_o = copy.deepcopy(o)
-    for k, v in new_o.items():
-        new_o[k] = make_hash(v)
-    return hash(tuple(frozenset(sorted(new_o.items()))))
+    return sha256(dumps(o, sort_keys=True, separators=(',', ':'))).hexdigest()
 
 # ------------------------------------------------------------------------------
 # END OF FILE
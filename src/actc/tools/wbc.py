@@ -37,12 +37,9 @@
 # ------------------------------------------------------------------------------
 # imports
 # ------------------------------------------------------------------------------
-from glob                       import iglob
-from os.path                    import abspath
 from os.path                    import basename
 from os.path                    import dirname
 from os.path                    import join
-from os.path                    import getsize
 from os.path                    import isdir
 from shutil                     import copyfile
 
@@ -52,6 +49,8 @@ from actc.tools                 import toList
 from actc.tools                 import AbstractCmdTool
 from actc.tools                 import AbstractBasicCmdTool
 from actc.tools                 import AbstractPythonTool
+from actc.tools                 import expand
+from actc.tools                 import isEmpty
 
 import os
 import stat
@@ -347,7 +346,7 @@ class WbcHeaderIncluder(AbstractPythonTool):
         path, _ = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
                 dst = join(path, basename(src).replace('client_headers_', '') \
                                               .replace('.txt', '.h'))
@@ -719,9 +718,9 @@ fi
         path, _ = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 
@@ -880,9 +879,9 @@ fi
         path, _ = self._outputs[0]
 
         for arg in toList(args[0]):
-            for src in iglob(abspath(arg)):
+            for src in expand(arg):
 
-                if not getsize(src):
+                if isEmpty(src):
                     continue
                 # end if
 